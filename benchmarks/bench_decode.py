@@ -0,0 +1,95 @@
+import atexit
+import os
+import random
+import tempfile
+
+from benchmarks.bench_encode import bench_session
+from benchmarks.harness import benchmark
+from benchmarks.workloads import make_prompt, make_secret, make_vault
+from sentinel.prompt_sentinel import StreamDecoder, decode_text
+
+try:
+    from cryptography.fernet import Fernet  # The vault snapshot benchmarks require it
+except ImportError:
+    Fernet = None
+
+_snapshots = {}
+
+
+def _decode_bench(vault_size: int, n_placeholders: int):
+    def setup():
+        session = bench_session()
+        session.vault = make_vault(vault_size)
+        rng = random.Random(1)
+        placeholders = [session.vault.add_secret_and_get_placeholder(make_secret(rng))
+                        for _ in range(n_placeholders)]
+        text = make_prompt(500) + " " + " ".join(placeholders)
+        return (lambda: decode_text(text, session)), len(text)
+    return setup
+
+
+for _size in (10, 1_000, 100_000):
+    benchmark(f"decode_text[vault={_size},placeholders=5]", group="decode")(_decode_bench(_size, 5))
+benchmark("decode_text[vault=1000,placeholders=0]", group="decode")(_decode_bench(1_000, 0))
+
+
+def _snapshot(vault_size: int):
+    """A snapshot of a vault of `vault_size` entries, written once per process."""
+    if vault_size not in _snapshots:
+        from sentinel.vault_snapshot import write_snapshot
+        if not _snapshots:
+            directory = tempfile.TemporaryDirectory(prefix="sentinel-bench-")
+            atexit.register(directory.cleanup)
+            _snapshots["dir"] = directory.name
+        path = os.path.join(_snapshots["dir"], f"vault-{vault_size}.snap")
+        key = Fernet.generate_key()
+        write_snapshot(path, make_vault(vault_size).secret_mapping, key)
+        _snapshots[vault_size] = path, key
+    return _snapshots[vault_size]
+
+
+def _mapped_decode_bench(vault_size: int):
+    def setup():
+        # A restarted worker decoding placeholders issued before the restart.
+        from sentinel.vault_snapshot import MappedVault
+        path, key = _snapshot(vault_size)
+        session = bench_session()
+        session.vault = MappedVault(path, key)
+        placeholders = list(make_vault(vault_size).secret_mapping)[:5]
+        text = make_prompt(500) + " " + " ".join(placeholders)
+        return (lambda: decode_text(text, session)), len(text)
+    return setup
+
+
+def _mapped_open_bench(vault_size: int):
+    def setup():
+        from sentinel.vault_snapshot import MappedVault
+        path, key = _snapshot(vault_size)
+        return lambda: MappedVault(path, key)
+    return setup
+
+
+if Fernet is not None:
+    benchmark("decode_text[mapped vault=100000,placeholders=5]", group="decode")(_mapped_decode_bench(100_000))
+    benchmark("MappedVault()[entries=100000]", group="decode")(_mapped_open_bench(100_000))
+
+
+def _stream_decode_bench(chunk_size: int):
+    def setup():
+        # A streamed completion of ~4-character tokens, with placeholders split across chunks.
+        session = bench_session()
+        rng = random.Random(2)
+        placeholders = [session.vault.add_secret_and_get_placeholder(make_secret(rng)) for _ in range(5)]
+        text = make_prompt(500) + " " + " ".join(placeholders)
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+        def op():
+            decoder = StreamDecoder(session)
+            for chunk in chunks:
+                decoder.feed(chunk)
+            decoder.flush()
+        return op, len(chunks)
+    return setup
+
+
+benchmark("StreamDecoder.feed[chunk=4]", group="decode")(_stream_decode_bench(4))
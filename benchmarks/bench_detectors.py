@@ -0,0 +1,101 @@
+import itertools
+
+from benchmarks.harness import benchmark
+from benchmarks.workloads import (
+    StubTrustableLLM, make_pattern_set, make_prompt, make_prompt_with_secrets, patterns_to_yaml,
+)
+from sentinel.incremental import IncrementalDetector
+from sentinel.negative_cache import NegativeCacheDetector
+from sentinel.sentinel_detectors import LLMSecretDetector, RegexSecretDetector, find_secret_positions
+from sentinel.windows import WindowedDetector
+
+
+def _regex_bench(n_patterns: int, n_words: int):
+    def setup():
+        detector = RegexSecretDetector(yaml_string=patterns_to_yaml(make_pattern_set(n_patterns)))
+        text = make_prompt(n_words, 0.01)
+        return (lambda: detector.detect(text)), len(text)
+    return setup
+
+
+def _regex_construction_bench(n_patterns: int):
+    def setup():
+        yaml_string = patterns_to_yaml(make_pattern_set(n_patterns))
+        return lambda: RegexSecretDetector(yaml_string=yaml_string)
+    return setup
+
+
+def _llm_bench(latency: float, cached: bool):
+    def setup():
+        detector = LLMSecretDetector(StubTrustableLLM(latency))
+        text = make_prompt(300, 0.01)
+        counter = itertools.count()
+        if cached:
+            return lambda: detector.detect(text)
+        return lambda: detector.detect(f"{next(counter)} {text}")  # Defeat the text-keyed cache
+    return setup
+
+
+def _find_positions_bench(n_secrets: int):
+    def setup():
+        text, secrets = make_prompt_with_secrets(5_000, n_secrets)
+        return (lambda: find_secret_positions(text, secrets)), len(text)
+    return setup
+
+
+def _incremental_bench(n_words: int):
+    def setup():
+        # An agent scratchpad that grows by one step per call, detected by a slow LLM.
+        detector = IncrementalDetector(LLMSecretDetector(StubTrustableLLM(0.001)))
+        text = make_prompt(n_words, 0.01)
+        detector.detect(text)
+        counter = itertools.count()
+
+        def op():
+            nonlocal text
+            text += f" step {next(counter)} AKIA{next(counter):016d}"
+            return detector.detect(text)
+        return op
+    return setup
+
+
+def _clean_pool_bench(negative_cache: bool):
+    def setup():
+        # 1,000 distinct clean templates cycled: more than the LLM detector's exact-text cache holds.
+        detector = LLMSecretDetector(StubTrustableLLM(0.0))
+        if negative_cache:
+            detector = NegativeCacheDetector(detector)
+        texts = [f"template {i}: {make_prompt(300, seed=i)}" for i in range(1_000)]
+        for text in texts:
+            detector.detect(text)
+        cycle = itertools.cycle(texts)
+        return lambda: detector.detect(next(cycle))
+    return setup
+
+
+def _windowed_bench(windowed: bool):
+    def setup():
+        # A long document with a few secrets, sent whole or as candidate windows.
+        detector = LLMSecretDetector(StubTrustableLLM(0.0))
+        if windowed:
+            detector = WindowedDetector(detector)
+        text, _ = make_prompt_with_secrets(5_000, 5)
+        counter = itertools.count()
+        return (lambda: detector.detect(f"{next(counter)} {text}")), len(text)
+    return setup
+
+
+for _n in (3, 30, 300):
+    benchmark(f"RegexSecretDetector.detect[patterns={_n}]", group="detectors")(_regex_bench(_n, 5_000))
+    benchmark(f"RegexSecretDetector()[patterns={_n}]", group="detectors")(_regex_construction_bench(_n))
+benchmark("LLMSecretDetector.detect[stub 0ms,miss]", group="detectors")(_llm_bench(0.0, False))
+benchmark("LLMSecretDetector.detect[stub 5ms,miss]", group="detectors", min_time=0.2)(_llm_bench(0.005, False))
+benchmark("LLMSecretDetector.detect[hit]", group="detectors")(_llm_bench(0.0, True))
+for _n in (10, 100):
+    benchmark(f"find_secret_positions[secrets={_n}]", group="detectors")(_find_positions_bench(_n))
+for _n in (2_000, 20_000):
+    benchmark(f"IncrementalDetector.detect[append,words={_n}]", group="detectors")(_incremental_bench(_n))
+benchmark("LLMSecretDetector.detect[1000 clean templates]", group="detectors")(_clean_pool_bench(False))
+benchmark("NegativeCacheDetector.detect[1000 clean templates]", group="detectors")(_clean_pool_bench(True))
+benchmark("LLMSecretDetector.detect[5000 words,5 secrets]", group="detectors")(_windowed_bench(False))
+benchmark("WindowedDetector.detect[5000 words,5 secrets]", group="detectors")(_windowed_bench(True))
@@ -0,0 +1,41 @@
+from benchmarks.harness import benchmark
+from benchmarks.workloads import make_pattern_set, make_prompt, patterns_to_yaml
+from sentinel.prompt_sentinel import detect_and_encode_text
+from sentinel.sentinel_detectors import RegexSecretDetector
+from sentinel.session_context import ScopedSessionContext
+
+
+def bench_session() -> ScopedSessionContext:
+    """A session context of its own, so benchmarks neither share nor alter the process-wide one."""
+    return ScopedSessionContext(app_id="bench")
+
+
+def _encode_bench(n_words: int, density: float):
+    def setup():
+        session = bench_session()
+        detector = RegexSecretDetector(yaml_string=patterns_to_yaml(make_pattern_set(3)))
+        text = make_prompt(n_words, density)
+        return (lambda: detect_and_encode_text(text, session, detector)), len(text)
+    return setup
+
+
+for _words, _density, _label in [
+    (200, 0.0, "clean-200w"),
+    (200, 0.01, "sparse-200w"),
+    (5_000, 0.01, "sparse-5kw"),
+    (5_000, 0.2, "dense-5kw"),
+    (50_000, 0.2, "logdump-50kw"),
+]:
+    benchmark(f"detect_and_encode_text[{_label}]", group="encode")(_encode_bench(_words, _density))
+
+
+def _detect_bench(n_words: int, density: float):
+    def setup():
+        # Detection alone: its peak memory is dominated by one result object per match.
+        detector = RegexSecretDetector(yaml_string=patterns_to_yaml(make_pattern_set(3)))
+        text = make_prompt(n_words, density)
+        return (lambda: detector.detect(text)), len(text)
+    return setup
+
+
+benchmark("RegexSecretDetector.detect[logdump-50kw]", group="encode")(_detect_bench(50_000, 0.2))
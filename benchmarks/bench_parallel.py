@@ -0,0 +1,43 @@
+"""
+Throughput of `ParallelDetector` on a multi-megabyte log dump as the number of worker
+processes grows, against the same detector in a single process. Process counts above
+the machine's CPU count are skipped.
+"""
+import os
+from functools import partial
+
+from benchmarks.harness import benchmark
+from benchmarks.workloads import make_pattern_set, make_prompt, patterns_to_yaml
+from sentinel.parallel import ParallelDetector
+from sentinel.sentinel_detectors import RegexSecretDetector
+
+_factory = partial(RegexSecretDetector, yaml_string=patterns_to_yaml(make_pattern_set(30)))
+_pools = {}
+
+
+def _log_dump() -> str:
+    return make_prompt(400_000, 0.01)  # ~3 MB
+
+
+def _serial_bench():
+    detector = _factory()
+    text = _log_dump()
+    return (lambda: detector.detect(text)), len(text)
+
+
+def _parallel_bench(processes: int):
+    def setup():
+        detector = _pools.get(processes)
+        if detector is None:
+            detector = _pools[processes] = ParallelDetector(_factory, processes=processes)
+        text = _log_dump()
+        detector.detect(text)  # Start the workers outside the timed rounds
+        return (lambda: detector.detect(text)), len(text)
+    return setup
+
+
+benchmark("RegexSecretDetector.detect[3MB,serial]", group="parallel", min_time=1.0)(_serial_bench)
+for _processes in (1, 2, 4, 8, 16):
+    if _processes <= (os.cpu_count() or 1):
+        benchmark(f"ParallelDetector.detect[3MB,processes={_processes}]", group="parallel",
+                  min_time=1.0)(_parallel_bench(_processes))
@@ -0,0 +1,84 @@
+"""
+Latency overhead of the sanitizing proxy: the same chat completion request sent straight
+to a local stub upstream, and through the proxy in front of it. Both servers run on an
+event loop in a background thread; the client reuses one keep-alive connection. Skipped
+if aiohttp is not installed.
+"""
+import asyncio
+import http.client
+import json
+import threading
+
+from benchmarks.harness import benchmark
+from benchmarks.workloads import BASE_PATTERNS, make_openai_response, make_prompt, patterns_to_yaml
+from sentinel.sentinel_detectors import RegexSecretDetector
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+_servers = {}
+
+
+def _stub_upstream() -> "web.Application":
+    async def completions(request):
+        body = await request.json()
+        return web.json_response(make_openai_response(body["messages"][-1]["content"][:200], n_tool_calls=0))
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    return app
+
+
+def _start_servers():
+    """Starts the stub upstream and the proxy once; returns their ports."""
+    if _servers:
+        return _servers["ports"]
+    from sentinel.proxy import SanitizingProxy
+
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    ports = []
+
+    async def start(app):
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+    async def main():
+        ports.append(await start(_stub_upstream()))
+        detector = RegexSecretDetector(yaml_string=patterns_to_yaml(BASE_PATTERNS))
+        ports.append(await start(SanitizingProxy(detector, f"http://127.0.0.1:{ports[0]}").build_app()))
+        ready.set()
+
+    threading.Thread(target=lambda: (loop.run_until_complete(main()), loop.run_forever()), daemon=True).start()
+    ready.wait()
+    _servers["ports"] = tuple(ports)
+    return _servers["ports"]
+
+
+def _request_bench(through_proxy: bool, density: float):
+    def setup():
+        upstream_port, proxy_port = _start_servers()
+        connection = http.client.HTTPConnection("127.0.0.1", proxy_port if through_proxy else upstream_port)
+        body = json.dumps({"model": "gpt-4o", "messages": [
+            {"role": "system", "content": make_prompt(300)},
+            {"role": "user", "content": make_prompt(200, density, seed=3)},
+        ]}).encode()
+        headers = {"Content-Type": "application/json"}
+
+        def op():
+            connection.request("POST", "/v1/chat/completions", body, headers)
+            response = connection.getresponse()
+            return response.read()
+        return op
+    return setup
+
+
+if web is not None:
+    for _density, _label in [(0.0, "clean"), (0.05, "secrets")]:
+        benchmark(f"chat.completions[direct,{_label}]", group="proxy")(_request_bench(False, _density))
+        benchmark(f"chat.completions[proxy,{_label}]", group="proxy")(_request_bench(True, _density))
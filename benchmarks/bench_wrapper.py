@@ -0,0 +1,37 @@
+from benchmarks.bench_encode import bench_session
+from benchmarks.harness import benchmark
+from benchmarks.workloads import make_deep_response, make_pattern_set, make_prompt, patterns_to_yaml
+from sentinel.prompt_sentinel import decode_response, sentinel
+from sentinel.sentinel_detectors import RegexSecretDetector
+
+
+def _wrapper_bench(density: float, depth: int):
+    def setup():
+        session = bench_session()
+        detector = RegexSecretDetector(yaml_string=patterns_to_yaml(make_pattern_set(3)))
+        response = make_deep_response(make_prompt(100), depth)
+
+        @sentinel(detector=detector, session_context=session)
+        def call_llm(messages):
+            return response
+
+        messages = [{"role": "system", "content": make_prompt(300)},
+                    {"role": "user", "content": make_prompt(100, density, seed=2)}]
+        return lambda: call_llm(messages)
+    return setup
+
+
+def _decode_response_bench(depth: int):
+    def setup():
+        session = bench_session()
+        session.vault.add_secret_and_get_placeholder("hunter2")
+        response = make_deep_response(make_prompt(100), depth)
+        return lambda: decode_response(response, session)
+    return setup
+
+
+for _density, _label in [(0.0, "clean"), (0.05, "secrets")]:
+    for _depth in (0, 20):
+        benchmark(f"sentinel-call[{_label},depth={_depth}]", group="wrapper")(_wrapper_bench(_density, _depth))
+for _depth in (0, 20, 100):
+    benchmark(f"decode_response[depth={_depth}]", group="wrapper")(_decode_response_bench(_depth))
@@ -0,0 +1,166 @@
+"""
+A small, dependency-free benchmark harness.
+
+Benchmarks are registered with the `benchmark` decorator. A benchmark function is a
+setup step: it builds its workload and returns the operation to time, optionally along
+with the number of items (texts, bytes, ...) one operation processes. The runner
+measures wall-clock latency per operation (p50/p99), throughput and allocations (via
+tracemalloc, in a separate pass so tracing does not skew the timings), and can save
+results as a baseline JSON file or compare against one.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+Operation = Callable[[], object]
+SetupResult = Union[Operation, Tuple[Operation, int]]
+
+
+@dataclass
+class Benchmark:
+    name: str
+    group: str
+    setup: Callable[[], SetupResult]
+    min_time: float = 0.5
+    max_rounds: int = 10_000
+
+
+@dataclass
+class Result:
+    name: str
+    group: str
+    rounds: int
+    items_per_op: int
+    p50_us: float
+    p99_us: float
+    mean_us: float
+    ops_per_s: float
+    items_per_s: float
+    alloc_peak_kib: float
+    alloc_blocks: int
+    extra: Dict[str, float] = field(default_factory=dict)
+
+
+_REGISTRY: List[Benchmark] = []
+
+
+def benchmark(name: str, group: str, min_time: float = 0.5, max_rounds: int = 10_000):
+    """Registers a benchmark setup function."""
+    def decorator(setup: Callable[[], SetupResult]) -> Callable[[], SetupResult]:
+        _REGISTRY.append(Benchmark(name, group, setup, min_time, max_rounds))
+        return setup
+    return decorator
+
+
+def registered(pattern: Optional[str] = None) -> List[Benchmark]:
+    return [b for b in _REGISTRY if not pattern or pattern in f"{b.group}/{b.name}"]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_benchmark(bench: Benchmark, quick: bool = False) -> Result:
+    setup_result = bench.setup()
+    op, items = setup_result if isinstance(setup_result, tuple) else (setup_result, 1)
+    min_time = 0.0 if quick else bench.min_time
+    max_rounds = 1 if quick else bench.max_rounds
+
+    op()  # Warm-up (caches, lazy imports, JIT-less but still branchy first calls)
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    timings: List[float] = []
+    started = time.perf_counter()
+    try:
+        while len(timings) < max_rounds and (not timings or time.perf_counter() - started < min_time):
+            t0 = time.perf_counter_ns()
+            op()
+            timings.append((time.perf_counter_ns() - t0) / 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # The peak and the new blocks are measured in two passes, so that the snapshots'
+    # own allocations are not part of the peak (`tracemalloc.reset_peak` is Python 3.9+).
+    tracemalloc.start()
+    try:
+        op()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        op()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(max(0, stat.count_diff) for stat in after.compare_to(before, "filename"))
+
+    timings.sort()
+    mean = statistics.fmean(timings)
+    return Result(
+        name=bench.name,
+        group=bench.group,
+        rounds=len(timings),
+        items_per_op=items,
+        p50_us=_percentile(timings, 50),
+        p99_us=_percentile(timings, 99),
+        mean_us=mean,
+        ops_per_s=1e6 / mean if mean else float("inf"),
+        items_per_s=items * 1e6 / mean if mean else float("inf"),
+        alloc_peak_kib=peak / 1024,
+        alloc_blocks=blocks,
+    )
+
+
+def save_baseline(results: List[Result], name: str) -> str:
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = os.path.join(BASELINE_DIR, f"{name}.json")
+    payload = {
+        "machine": {"python": sys.version.split()[0], "platform": platform.platform(),
+                    "cpu_count": os.cpu_count()},
+        "results": [asdict(r) for r in results],
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+def load_baseline(name: str) -> Dict[str, dict]:
+    path = name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+    with open(path) as f:
+        return {f"{r['group']}/{r['name']}": r for r in json.load(f)["results"]}
+
+
+def format_results(results: List[Result], baseline: Optional[Dict[str, dict]] = None,
+                   threshold: float = 0.10) -> Tuple[str, List[str]]:
+    """Renders a results table; returns it with the keys that regressed beyond `threshold`."""
+    header = f"{'benchmark':<48} {'p50 us':>10} {'p99 us':>10} {'items/s':>12} {'peak KiB':>9} {'blocks':>7}"
+    if baseline:
+        header += f" {'vs base':>8}"
+    lines, regressions = [header, "-" * len(header)], []
+    for r in results:
+        key = f"{r.group}/{r.name}"
+        line = (f"{key:<48} {r.p50_us:>10.1f} {r.p99_us:>10.1f} {r.items_per_s:>12.0f}"
+                f" {r.alloc_peak_kib:>9.1f} {r.alloc_blocks:>7}")
+        base = (baseline or {}).get(key)
+        if base:
+            ratio = r.p50_us / base["p50_us"] if base["p50_us"] else 1.0
+            line += f" {ratio:>7.2f}x"
+            if ratio > 1 + threshold:
+                regressions.append(key)
+                line += "  REGRESSION"
+        lines.append(line)
+    return "\n".join(lines), regressions
@@ -0,0 +1,241 @@
+"""
+A concurrent load test of `@sentinel`, for sizing deployments.
+
+Many threads or asyncio tasks send chat requests through a sanitized stub chat model.
+Detection is done by `LLMSecretDetector` in front of a stub trusted LLM, or by
+`RegexSecretDetector`. Reports can go to a local stub report server. The stubs have
+configurable latency, and the prompts have a configurable secret density. The run
+reports throughput, latency percentiles, errors, and two correctness checks:
+  - leaks: requests whose sanitized messages still contained a raw secret;
+  - unrestored: responses in which some placeholder was not restored.
+
+    python -m benchmarks.loadtest --driver threads --concurrency 32 --requests 2000
+    python -m benchmarks.loadtest --driver asyncio --concurrency 256 --llm-latency 0.05 --report-server
+    python -m benchmarks.loadtest --detector regex --scope request --json
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+
+from benchmarks.workloads import (
+    BASE_PATTERNS, StubChatModel, StubTrustableLLM, make_prompt, patterns_to_yaml,
+)
+from sentinel.prompt_sentinel import sentinel
+from sentinel.reporting import Reporter
+from sentinel.sentinel_detectors import LLMSecretDetector, RegexSecretDetector, SecretDetector
+from sentinel.session_context import ScopedSessionContext
+
+
+class StubReportServer:
+    """A local HTTP server accepting batches of reports, with optional latency per batch."""
+
+    def __init__(self, latency: float = 0.0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                reports = json.loads(body)
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    server.reports += len(reports) if isinstance(reports, list) else 1
+                    server.requests += 1
+                    server.bytes += int(self.headers.get("Content-Length", 0))
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.reports = 0
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@dataclass
+class LoadTestResult:
+    driver: str
+    concurrency: int
+    requests: int
+    seconds: float
+    throughput: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    errors: int
+    leaks: int
+    unrestored: int
+    llm_calls: int
+    reports: int
+    error_samples: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.errors or self.leaks or self.unrestored)
+
+
+class LoadTest:
+    """
+    One configured load test. `scope="shared"` sends every request through one session
+    context, like the process-wide `SessionContext` singleton; `scope="request"` gives
+    each request its own `ScopedSessionContext`.
+    """
+
+    def __init__(self, detector: str = "llm", llm_latency: float = 0.01, model_latency: float = 0.01,
+                 density: float = 0.05, prompt_words: int = 200, distinct_prompts: int = 100,
+                 scope: str = "shared", report_url: Optional[str] = None):
+        self.model = StubChatModel(model_latency)
+        self.llm = StubTrustableLLM(llm_latency)
+        if detector == "llm":
+            self.detector: SecretDetector = LLMSecretDetector(self.llm)
+        else:
+            self.detector = RegexSecretDetector(yaml_string=patterns_to_yaml(BASE_PATTERNS))
+        self.prompts = [make_prompt(prompt_words, density, seed=i) for i in range(distinct_prompts)]
+        self.scope = scope
+        self.report_url = report_url
+        self.reporter = Reporter(report_url) if report_url else None
+        self._shared = self._wrap(self._context())
+
+    def _context(self) -> ScopedSessionContext:
+        return ScopedSessionContext(app_id="loadtest", server_url=self.report_url, reporter=self.reporter)
+
+    def _wrap(self, context: ScopedSessionContext):
+        return (sentinel(self.detector, session_context=context)(self.model.invoke),
+                sentinel(self.detector, session_context=context)(self.model.ainvoke))
+
+    def _calls(self):
+        return self._shared if self.scope == "shared" else self._wrap(self._context())
+
+    def _messages(self, i: int) -> List[dict]:
+        return [{"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": self.prompts[i % len(self.prompts)]}]
+
+    def run_threads(self, requests: int, concurrency: int) -> "LoadTestResult":
+        def one(i: int):
+            messages = self._messages(i)
+            start = time.perf_counter()
+            response = self._calls()[0](messages)
+            return time.perf_counter() - start, response["content"] == messages[-1]["content"]
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return self._measure("threads", requests, concurrency,
+                                 lambda: [pool.submit(one, i) for i in range(requests)], lambda f: f.result())
+
+    def run_asyncio(self, requests: int, concurrency: int) -> "LoadTestResult":
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(i: int):
+                messages = self._messages(i)
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await self._calls()[1](messages)
+                    return time.perf_counter() - start, response["content"] == messages[-1]["content"]
+
+            return await asyncio.gather(*(one(i) for i in range(requests)), return_exceptions=True)
+
+        return self._measure("asyncio", requests, concurrency, lambda: asyncio.run(main()), lambda r: r)
+
+    def _measure(self, driver: str, requests: int, concurrency: int, launch: Callable, result_of: Callable):
+        llm_calls, leaks = self.llm.calls, self.model.leaks
+        start = time.perf_counter()
+        outcomes = []
+        for item in launch():
+            try:
+                outcome = result_of(item)
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                outcomes.append(outcome)
+            except Exception as e:
+                outcomes.append(e)
+        seconds = time.perf_counter() - start
+
+        latencies = sorted(o[0] * 1000 for o in outcomes if isinstance(o, tuple))
+        errors = [o for o in outcomes if not isinstance(o, tuple)]
+
+        def pct(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] if latencies else 0.0
+
+        return LoadTestResult(
+            driver=driver, concurrency=concurrency, requests=requests, seconds=round(seconds, 3),
+            throughput=round(len(latencies) / seconds, 1) if seconds else 0.0,
+            p50_ms=round(statistics.median(latencies), 2) if latencies else 0.0,
+            p90_ms=round(pct(90), 2), p99_ms=round(pct(99), 2), max_ms=round(latencies[-1], 2) if latencies else 0.0,
+            errors=len(errors), leaks=self.model.leaks - leaks,
+            unrestored=sum(1 for o in outcomes if isinstance(o, tuple) and not o[1]),
+            llm_calls=self.llm.calls - llm_calls, reports=0,
+            error_samples=[repr(e) for e in errors[:3]],
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="prompt-sentinel concurrent load test")
+    parser.add_argument("--driver", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--concurrency", type=int, default=16, help="threads, or concurrent asyncio tasks")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--detector", choices=["llm", "regex"], default="llm",
+                        help="llm: LLMSecretDetector with a stub trusted LLM; regex: RegexSecretDetector")
+    parser.add_argument("--llm-latency", type=float, default=0.01, help="seconds per trusted LLM call")
+    parser.add_argument("--model-latency", type=float, default=0.01, help="seconds per chat model call")
+    parser.add_argument("--density", type=float, default=0.05, help="fraction of prompt words that are secrets")
+    parser.add_argument("--prompt-words", type=int, default=200)
+    parser.add_argument("--distinct-prompts", type=int, default=100,
+                        help="size of the prompt pool; repeats exercise the detector caches")
+    parser.add_argument("--scope", choices=["shared", "request"], default="shared",
+                        help="one session context for all requests, or one per request")
+    parser.add_argument("--report-server", action="store_true", help="report every detection to a stub server")
+    parser.add_argument("--report-latency", type=float, default=0.0, help="seconds per report")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    server = StubReportServer(args.report_latency) if args.report_server else None
+    try:
+        test = LoadTest(args.detector, args.llm_latency, args.model_latency, args.density, args.prompt_words,
+                        args.distinct_prompts, args.scope, server.url if server else None)
+        run = test.run_threads if args.driver == "threads" else test.run_asyncio
+        result = run(args.requests, args.concurrency)
+        if test.reporter is not None:
+            test.reporter.close()
+        result.reports = server.reports if server else 0
+    finally:
+        if server:
+            server.close()
+
+    if args.json:
+        print(json.dumps(asdict(result), indent=2))
+    else:
+        for key, value in asdict(result).items():
+            if key != "error_samples" or value:
+                print(f"{key:>14}: {value}")
+    if not result.ok:
+        print("\nFAILED: errors, leaked secrets or unrestored placeholders (see above)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
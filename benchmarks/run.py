@@ -0,0 +1,59 @@
+"""
+Runs the benchmark suite.
+
+    python -m benchmarks.run                      # run everything
+    python -m benchmarks.run -k decode            # only benchmarks whose group/name contains "decode"
+    python -m benchmarks.run --save main          # store results in benchmarks/baselines/main.json
+    python -m benchmarks.run --compare main       # compare against a stored baseline
+    python -m benchmarks.run --quick              # one round each (smoke test)
+"""
+import argparse
+import importlib
+import sys
+
+from benchmarks.harness import format_results, load_baseline, registered, run_benchmark, save_baseline
+
+BENCHMARK_MODULES = [
+    "benchmarks.bench_encode",
+    "benchmarks.bench_decode",
+    "benchmarks.bench_wrapper",
+    "benchmarks.bench_detectors",
+    "benchmarks.bench_parallel",
+    "benchmarks.bench_proxy",
+]
+
+
+def load_benchmarks():
+    for module in BENCHMARK_MODULES:
+        importlib.import_module(module)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="prompt-sentinel benchmark suite")
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose group/name contains this")
+    parser.add_argument("--save", metavar="NAME", help="save results as a named baseline")
+    parser.add_argument("--compare", metavar="NAME", help="compare p50 latency against a baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative p50 slowdown reported as a regression (default 0.10)")
+    parser.add_argument("--quick", action="store_true", help="a single round per benchmark")
+    args = parser.parse_args(argv)
+
+    load_benchmarks()
+    results = []
+    for bench in registered(args.pattern):
+        results.append(run_benchmark(bench, quick=args.quick))
+        print(f"  ran {bench.group}/{bench.name}", file=sys.stderr)
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    table, regressions = format_results(results, baseline, args.threshold)
+    print(table)
+    if args.save:
+        print(f"\nSaved baseline to {save_baseline(results, args.save)}")
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Synthetic, deterministic workloads shared by the benchmarks and the load-test harness.
+"""
+import random
+import string
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sentinel.sentinel_detectors import TrustableLLM
+from sentinel.vault import Vault
+
+_WORDS = (
+    "the model should summarize deployment logs for the billing service and report "
+    "any failing health checks together with the request ids and latency figures"
+).split()
+
+_SECRET_KINDS = {
+    "aws": lambda rng: "AKIA" + "".join(rng.choices(string.ascii_uppercase + string.digits, k=16)),
+    "openai": lambda rng: "sk-" + "".join(rng.choices(string.ascii_letters + string.digits, k=24)),
+    "password": lambda rng: "password=" + "".join(rng.choices(string.ascii_letters + string.digits + "!@#", k=12)),
+}
+
+# Patterns matching the secrets generated above, plus filler patterns for larger sets.
+BASE_PATTERNS = {
+    "aws_api_key": r"AKIA[A-Z0-9]{16}",
+    "openai_api_key": r"sk-[A-Za-z0-9]{24}",
+    "password": r"password=[A-Za-z0-9!@#]{12}",
+}
+
+
+def make_secret(rng: random.Random, kind: Optional[str] = None) -> str:
+    kind = kind or rng.choice(sorted(_SECRET_KINDS))
+    return _SECRET_KINDS[kind](rng)
+
+
+def make_prompt(n_words: int, secret_density: float = 0.0, seed: int = 0) -> str:
+    """
+    A prompt of `n_words` filler words where roughly `secret_density` of the words are
+    replaced by synthetic secrets (0.0 = clean, 0.2 = log-dump dense).
+    """
+    rng = random.Random(seed)
+    words = []
+    for _ in range(n_words):
+        if secret_density and rng.random() < secret_density:
+            words.append(make_secret(rng))
+        else:
+            words.append(rng.choice(_WORDS))
+    return " ".join(words)
+
+
+def make_prompt_with_secrets(n_words: int, n_secrets: int, seed: int = 0) -> Tuple[str, List[str]]:
+    """A prompt with exactly `n_secrets` secrets spread evenly; returns it and the secrets."""
+    rng = random.Random(seed)
+    words = [rng.choice(_WORDS) for _ in range(n_words)]
+    secrets = [make_secret(rng) for _ in range(n_secrets)]
+    for i, secret in enumerate(secrets):
+        words[(i + 1) * n_words // (n_secrets + 1)] = secret
+    return " ".join(words), secrets
+
+
+def make_vault(n_entries: int, seed: int = 0) -> Vault:
+    rng = random.Random(seed)
+    vault = Vault()
+    for _ in range(n_entries):
+        vault.add_secret_and_get_placeholder(make_secret(rng))
+    return vault
+
+
+def make_pattern_set(n_patterns: int) -> Dict[str, str]:
+    """The base patterns plus distinct filler patterns, `n_patterns` in total."""
+    patterns = dict(BASE_PATTERNS)
+    for i in range(max(0, n_patterns - len(patterns))):
+        patterns[f"vendor_{i}_token"] = rf"v{i}tok_[A-Za-z0-9]{{20,40}}"
+    return dict(list(patterns.items())[:n_patterns])
+
+
+def patterns_to_yaml(patterns: Dict[str, str]) -> str:
+    return "\n".join(f"{name}: '{pattern}'" for name, pattern in patterns.items())
+
+
+def make_openai_response(content: str, n_choices: int = 1, n_tool_calls: int = 2) -> dict:
+    """A chat.completions response body, as a plain dict."""
+    return {
+        "id": "chatcmpl-123",
+        "object": "chat.completion",
+        "model": "gpt-4o",
+        "choices": [
+            {
+                "index": i,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": content,
+                    "tool_calls": [
+                        {"id": f"call_{j}", "type": "function",
+                         "function": {"name": "lookup", "arguments": f'{{"query": "{content[:64]}"}}'}}
+                        for j in range(n_tool_calls)
+                    ],
+                },
+            }
+            for i in range(n_choices)
+        ],
+        "usage": {"prompt_tokens": 512, "completion_tokens": 128, "total_tokens": 640},
+    }
+
+
+def make_deep_response(content: str, depth: int) -> dict:
+    """A response nested `depth` levels deep, e.g. agent traces wrapping model outputs."""
+    response = make_openai_response(content)
+    for level in range(depth):
+        response = {"step": level, "metadata": {"tags": ["a", "b"], "score": 0.5}, "inner": [response]}
+    return response
+
+
+class StubTrustableLLM(TrustableLLM):
+    """
+    A stand-in for a trusted LLM: waits `latency` seconds, then "finds" every token of the
+    prompt that matches one of the synthetic secret patterns. `chars` counts the prompt
+    characters it was sent, a proxy for the tokens a real LLM would bill.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        import re
+        self.latency = latency
+        self.calls = 0
+        self.chars = 0
+        self._secret_re = re.compile("|".join(f"(?:{p})" for p in BASE_PATTERNS.values()))
+
+    def predict(self, text: str, **kwargs) -> str:
+        import json
+        self.calls += 1
+        self.chars += len(text)
+        if self.latency:
+            time.sleep(self.latency)
+        return json.dumps({"secrets": sorted(set(self._secret_re.findall(text)))})
+
+
+class StubChatModel:
+    """
+    A stand-in for the chat model behind `@sentinel`: waits `latency` seconds, then echoes
+    the last message. Every message it receives is checked for raw synthetic secrets,
+    which must never get past sanitization; `leaks` counts the messages that had one.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        import re
+        import threading
+        self.latency = latency
+        self.calls = 0
+        self.leaks = 0
+        self._lock = threading.Lock()
+        self._secret_re = re.compile("|".join(f"(?:{p})" for p in BASE_PATTERNS.values()))
+
+    def _respond(self, messages: List[dict]) -> dict:
+        leaked = any(self._secret_re.search(message["content"]) for message in messages)
+        with self._lock:
+            self.calls += 1
+            self.leaks += leaked
+        return {"role": "assistant", "content": messages[-1]["content"]}
+
+    def invoke(self, messages: List[dict]) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def ainvoke(self, messages: List[dict]) -> dict:
+        import asyncio
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
@@ -8,7 +8,7 @@ secret = 'AKIA1234567890ABCDEFGHIJKLM'
 class FakeChatModel:
     def invoke(self, messages):
         assert secret not in messages[0]["content"]
-        return {"role": "assistant", "content": f"aws_provision_ec2({Vault._hash_secret(secret)})."}
+        return {"role": "assistant", "content": f"aws_provision_ec2({Vault().add_secret_and_get_placeholder(secret, 'aws_api_key')})."}
 
 
 if __name__ == '__main__':
@@ -1,29 +1,101 @@
 # sentinel/__init__.py
+#
+# The public API is resolved lazily (PEP 562): ``import sentinel`` only loads
+# this file, and each submodule is imported the first time one of its names is
+# accessed. This keeps cold starts cheap for callers that only need, e.g.,
+# ``RegexSecretDetector`` and never touch the LLM/LangChain integrations.
 
-# Import all public symbols from each module
-from .prompt_sentinel import *
-from .sentinel_detectors import *
-from .utils import *
-from .wrappers import *
+import importlib
 
-# Optionally, define __all__ to explicitly state your public API.
-# If your individual modules already define __all__, you can combine them like so:
-__all__ = []
+# Maps each public name to the submodule that defines it.
+_LAZY_ATTRS = {
+    # prompt_sentinel
+    "sentinel": "prompt_sentinel",
+    "detect_and_encode_text": "prompt_sentinel",
+    "decode_text": "prompt_sentinel",
+    "decode_response": "prompt_sentinel",
+    "StreamDecoder": "prompt_sentinel",
+    # sentinel_detectors
+    "find_secret_positions": "sentinel_detectors",
+    "SecretDetector": "sentinel_detectors",
+    "TrustableLLM": "sentinel_detectors",
+    "DEFAULT_PROMPT_TEMPLATE": "sentinel_detectors",
+    "LLMSecretDetector": "sentinel_detectors",
+    "PythonStringDataDetector": "sentinel_detectors",
+    "RegexSecretDetector": "sentinel_detectors",
+    "DummyDetector": "sentinel_detectors",
+    "CollectingDetector": "sentinel_detectors",
+    "PrecomputedDetector": "sentinel_detectors",
+    "LangchainLLMSecretDetector": "sentinel_detectors",
+    # incremental
+    "IncrementalDetector": "incremental",
+    # known_secrets
+    "KnownSecretIndex": "known_secrets",
+    "KnownSecretsDetector": "known_secrets",
+    # negative_cache
+    "NegativeCache": "negative_cache",
+    "NegativeCacheDetector": "negative_cache",
+    # parallel
+    "ParallelDetector": "parallel",
+    # pattern_pack
+    "PatternPack": "pattern_pack",
+    "PatternSpec": "pattern_pack",
+    # response_adapters
+    "register_response_adapter": "response_adapters",
+    "fields_adapter": "response_adapters",
+    # spans
+    "Span": "spans",
+    # windows
+    "CandidateSelector": "windows",
+    "WindowedDetector": "windows",
+    # utils
+    "extract_secrets_json": "utils",
+    # wrappers
+    "instrument_model_class": "wrappers",
+    # trustable_client
+    "ResilientTrustableLLM": "trustable_client",
+    "CircuitBreaker": "trustable_client",
+    "TrustableLLMError": "trustable_client",
+    "CircuitOpenError": "trustable_client",
+    # singleflight
+    "SingleFlight": "singleflight",
+    "CoalescedTimeout": "singleflight",
+    # instrumentation
+    "Instrumentation": "instrumentation",
+    "MetricsSink": "instrumentation",
+    "LoggingSink": "instrumentation",
+    "InMemorySink": "instrumentation",
+    "PrometheusSink": "instrumentation",
+    "OpenTelemetrySink": "instrumentation",
+    # reporting
+    "Reporter": "reporting",
+    # tracing
+    "TraceRecorder": "tracing",
+    # pipeline
+    "sanitize_file": "pipeline",
+    "sanitize_stream": "pipeline",
+    "PipelineStats": "pipeline",
+    # session_context / vault
+    "SessionContext": "session_context",
+    "ScopedSessionContext": "session_context",
+    "Vault": "vault",
+    # vault_snapshot
+    "MappedVault": "vault_snapshot",
+    "VaultCheckpointer": "vault_snapshot",
+    "write_snapshot": "vault_snapshot",
+}
 
-# Helper to extend __all__ from a module if it defines one,
-# otherwise include all names not starting with an underscore.
-def _get_public_names(module):
-    if hasattr(module, "__all__"):
-        return module.__all__
-    else:
-        return [name for name in dir(module) if not name.startswith("_")]
+__all__ = list(_LAZY_ATTRS)
 
-import sentinel.session_context
-import sentinel.vault
-import sentinel.prompt_sentinel
-import sentinel.sentinel_detectors
-import sentinel.wrappers
 
-__all__.extend(_get_public_names(prompt_sentinel))
-__all__.extend(_get_public_names(sentinel_detectors))
-__all__.extend(_get_public_names(wrappers))
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value  # Cache so __getattr__ is only hit once per name
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
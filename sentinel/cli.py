@@ -0,0 +1,217 @@
+"""
+The `sentinel` command line tool.
+
+    sentinel sanitize chats.jsonl -o chats.sanitized.jsonl --vault-out chats.vault
+    sentinel sanitize corpus.txt --format text -o corpus.sanitized.txt --processes 8
+    sentinel sanitize chats.jsonl -o chats.sanitized.jsonl --resume
+    sentinel keygen
+    sentinel pack patterns.yaml -o patterns.pack.json
+    sentinel proxy --upstream https://api.openai.com --port 8080 --workers 4
+    sentinel replay traces/llm.jsonl --patterns old.yaml --patterns new.yaml
+"""
+import argparse
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+from functools import partial
+from typing import List, Optional
+
+from sentinel.sentinel_detectors import SecretDetector
+
+VAULT_KEY_ENV = "SENTINEL_VAULT_KEY"
+
+
+def _regex_detector(yaml_path: Optional[str]) -> SecretDetector:
+    from sentinel.sentinel_detectors import RegexSecretDetector
+    return RegexSecretDetector(yaml_path=yaml_path)
+
+
+def _factory_from_spec(spec: str) -> SecretDetector:
+    """Builds a detector from a 'package.module:callable' spec (a class or a factory)."""
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Detector spec must look like 'package.module:callable', got {spec!r}")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+def _has_cryptography(feature: str) -> bool:
+    """Whether `cryptography` is installed; if not, prints an error naming the extra to install."""
+    if importlib.util.find_spec("cryptography") is None:
+        print(f"error: {feature} requires cryptography: pip install prompt-sentinel[crypto]", file=sys.stderr)
+        return False
+    return True
+
+
+def _sanitize(args: argparse.Namespace) -> int:
+    from sentinel.pipeline import VaultConflictError, checkpoint_path, sanitize_file
+    from sentinel.vault import Vault
+
+    if args.detector:
+        detector_factory = partial(_factory_from_spec, args.detector)
+    else:
+        detector_factory = partial(_regex_detector, args.patterns)
+
+    vault = key = None
+    if args.vault_out:
+        if not _has_cryptography("--vault-out"):
+            return 2
+        key = os.environ.get(args.vault_key_env)
+        if not key:
+            print(f"error: --vault-out requires a Fernet key in ${args.vault_key_env} "
+                  f"(create one with `sentinel keygen`)", file=sys.stderr)
+            return 2
+        resuming_vault = args.resume and os.path.exists(args.vault_out)
+        vault = Vault.load_encrypted(args.vault_out, key) if resuming_vault else Vault()
+
+    def save_vault(_stats):
+        if vault is not None:
+            vault.save_encrypted(args.vault_out, key)
+
+    if args.resume and not os.path.exists(checkpoint_path(args.output)):
+        print("warning: no checkpoint found, starting from the beginning", file=sys.stderr)
+
+    options = {"fields": tuple(args.fields)} if args.fields else {}
+    try:
+        stats = sanitize_file(
+            args.input, args.output, detector_factory,
+            resume=args.resume,
+            on_checkpoint=save_vault,
+            fmt=args.format,
+            processes=args.processes,
+            batch_size=args.batch_size,
+            vault=vault,
+            checkpoint_every=args.checkpoint_every,
+            **options,
+        )
+    except VaultConflictError as e:
+        print(f"error: {e} The vault file holds the mapping of the last checkpoint.", file=sys.stderr)
+        return 1
+    print(stats.summary(), file=sys.stderr)
+    if stats.invalid_lines:
+        print(f"{stats.invalid_lines} lines were not valid JSON and were sanitized as text", file=sys.stderr)
+    return 0
+
+
+def _keygen(_args: argparse.Namespace) -> int:
+    if not _has_cryptography("sentinel keygen"):
+        return 2
+    from cryptography.fernet import Fernet
+    print(Fernet.generate_key().decode())
+    return 0
+
+
+def _pack(args: argparse.Namespace) -> int:
+    from sentinel.pattern_pack import PatternPack
+    pack = PatternPack.load(args.patterns)
+    pack.save(args.output)
+    print(f"{len(pack)} patterns, fingerprint {pack.fingerprint}", file=sys.stderr)
+    return 0
+
+
+def _proxy(args: argparse.Namespace) -> int:
+    from sentinel.proxy import serve
+    factory = partial(_factory_from_spec, args.detector) if args.detector else partial(_regex_detector, args.patterns)
+    serve(factory, args.upstream, host=args.host, port=args.port, workers=args.workers,
+          max_concurrency=args.max_concurrency, max_connections=args.max_connections,
+          upstream_api_key=os.environ.get(args.upstream_key_env) if args.upstream_key_env else None)
+    return 0
+
+
+def _replay(args: argparse.Namespace) -> int:
+    from dataclasses import asdict
+    from sentinel.tracing import format_comparison, read_trace, recorded, replay, trace_files
+
+    paths = [file for path in args.traces for file in (trace_files(path) or [path])]
+    calls = list(read_trace(paths))
+    if not calls:
+        print("error: the trace contains no calls", file=sys.stderr)
+        return 1
+    results = [recorded(calls)]
+    for kind, value in args.configs or [("patterns", None)]:
+        factory = partial(_factory_from_spec, value) if kind == "detector" else partial(_regex_detector, value)
+        label = value or "built-in patterns"
+        # Best of `repeat` passes, each with a new detector and new session contexts.
+        passes = [replay(calls, factory(), label) for _ in range(max(1, args.repeat))]
+        results.append(min(passes, key=lambda result: result.seconds))
+    if args.json:
+        print(json.dumps([{k: v for k, v in asdict(r).items() if k != "call_ms"} for r in results], indent=2))
+    else:
+        print(format_comparison(results))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sentinel", description="Prompt Sentinel command line tools")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sanitize = commands.add_parser("sanitize", help="sanitize a JSONL chat log or a text corpus")
+    sanitize.add_argument("input", help="input file, or '-' for stdin")
+    sanitize.add_argument("-o", "--output", required=True, help="output file")
+    sanitize.add_argument("--format", choices=["jsonl", "text"], default="jsonl",
+                          help="jsonl: sanitize selected fields of each record; text: sanitize whole lines")
+    sanitize.add_argument("--field", dest="fields", action="append",
+                          help="JSONL key whose string values are sanitized, at any depth (repeatable; "
+                               "default: content, text, prompt, completion)")
+    detector = sanitize.add_mutually_exclusive_group()
+    detector.add_argument("--patterns", help="YAML file of regex patterns (default: built-in patterns)")
+    detector.add_argument("--detector", help="'package.module:callable' returning a SecretDetector")
+    sanitize.add_argument("--processes", type=int, default=None,
+                          help="worker processes (default: CPU count; 0 = in-process)")
+    sanitize.add_argument("--batch-size", type=int, default=512, help="lines per worker task")
+    sanitize.add_argument("--vault-out", help="write the placeholder-secret mapping to this encrypted file "
+                                                       "(requires cryptography)")
+    sanitize.add_argument("--vault-key-env", default=VAULT_KEY_ENV,
+                          help=f"environment variable holding the Fernet key (default: {VAULT_KEY_ENV})")
+    sanitize.add_argument("--resume", action="store_true",
+                          help="continue from the last checkpoint of a previous run with the same output")
+    sanitize.add_argument("--checkpoint-every", type=float, default=10.0,
+                          help="seconds between checkpoints (default: 10)")
+    sanitize.set_defaults(handler=_sanitize)
+
+    keygen = commands.add_parser("keygen", help="print a new key for encrypted vault files (requires cryptography)")
+    keygen.set_defaults(handler=_keygen)
+
+    pack = commands.add_parser("pack", help="validate a YAML pattern set and write it as a precompiled pattern pack")
+    pack.add_argument("patterns", help="YAML file of regex patterns")
+    pack.add_argument("-o", "--output", required=True, help="output JSON pack, loadable with --patterns")
+    pack.set_defaults(handler=_pack)
+
+    proxy = commands.add_parser("proxy", help="run an OpenAI-compatible sanitizing proxy (requires aiohttp)")
+    proxy.add_argument("--upstream", required=True, help="base URL of the OpenAI-compatible API")
+    proxy.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    proxy.add_argument("--port", type=int, default=8080, help="port to listen on (default: 8080)")
+    proxy.add_argument("--workers", type=int, default=1, help="worker processes sharing the port")
+    proxy.add_argument("--max-concurrency", type=int, default=64, help="requests handled at once per worker")
+    proxy.add_argument("--max-connections", type=int, default=100, help="upstream connection pool size per worker")
+    proxy.add_argument("--upstream-key-env", help="environment variable holding an API key that replaces "
+                                                  "the clients' Authorization header")
+    proxy_detector = proxy.add_mutually_exclusive_group()
+    proxy_detector.add_argument("--patterns", help="YAML file or pattern pack (default: built-in patterns)")
+    proxy_detector.add_argument("--detector", help="'package.module:callable' returning a SecretDetector")
+    proxy.set_defaults(handler=_proxy)
+
+    replay = commands.add_parser("replay", help="replay a workload trace against detector configurations")
+    replay.add_argument("traces", nargs="+", help="trace files; rotated files (trace.jsonl.1, ...) are included")
+    replay.add_argument("--patterns", dest="configs", action="append", type=lambda value: ("patterns", value),
+                        help="replay with a RegexSecretDetector on this YAML file or pattern pack (repeatable)")
+    replay.add_argument("--detector", dest="configs", action="append", type=lambda value: ("detector", value),
+                        help="replay with the detector of a 'package.module:callable' spec (repeatable)")
+    replay.add_argument("--repeat", type=int, default=3, help="passes per configuration; the fastest is reported")
+    replay.add_argument("--json", action="store_true", help="print the results as JSON")
+    replay.set_defaults(handler=_replay)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Incremental detection for prompts that are resent with small edits.
+
+`IncrementalDetector` wraps any detector. It keeps the spans of recently seen texts
+and diffs each new text against the most similar of them. Spans in unchanged
+regions are reused at their shifted offsets, and only the changed regions (plus a
+safety margin) are sent to the wrapped detector, so cost follows the edit size
+rather than the document size.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sentinel.sentinel_detectors import FallbackResult, SecretDetector, find_secret_positions
+from sentinel.spans import Span
+
+# A region of the new text copied unchanged from the base text: (base_start, new_start, length).
+Match = Tuple[int, int, int]
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    # Binary search over slice comparisons: O(n log n) character compares, all in C.
+    lo, hi = 0, min(len(a), len(b))
+    if a[:hi] == b[:hi]:
+        return hi  # Pure append or truncation, the common case
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def diff_matches(base: str, text: str, block_size: int = 64,
+                 max_unmatched: Optional[int] = None) -> Optional[List[Match]]:
+    """
+    Returns the regions of `text` copied unchanged from `base`, ordered by position, or
+    None once more than `max_unmatched` characters of `text` are left unmatched.
+
+    The common prefix and suffix are found first. The middle of `base` is then cut
+    into fixed-size blocks, indexed by their content, and the middle of `text` is
+    scanned once: at each position, the text block starting there is looked up in the
+    index, and a match skips ahead by a whole block. Matched base blocks only move
+    forward, and adjacent ones are coalesced. This finds any number of edits in time
+    linear in the text size, as long as the unchanged regions keep their order.
+    """
+    prefix = _common_prefix_length(base, text)
+    suffix = _common_suffix_length(base, text, min(len(base), len(text)) - prefix)
+    matches: List[Match] = [(0, 0, prefix)] if prefix else []
+
+    base_end, text_end = len(base) - suffix, len(text) - suffix
+    blocks: Dict[str, List[int]] = {}
+    for block_start in range(prefix, base_end - block_size + 1, block_size):
+        blocks.setdefault(base[block_start:block_start + block_size], []).append(block_start)
+    if max_unmatched is None:
+        max_unmatched = len(text)
+
+    base_cursor, position, unmatched = prefix, prefix, 0
+    last = text_end - block_size if blocks else prefix - 1
+    while position <= last:
+        starts = blocks.get(text[position:position + block_size])
+        i = bisect_left(starts, base_cursor) if starts else 0
+        if starts and i < len(starts):
+            block_start = starts[i]
+            previous = matches[-1] if matches else None
+            if previous and previous[0] + previous[2] == block_start and previous[1] + previous[2] == position:
+                matches[-1] = (previous[0], previous[1], previous[2] + block_size)
+            else:
+                matches.append((block_start, position, block_size))
+            base_cursor = block_start + block_size
+            position += block_size
+            continue
+        unmatched += 1
+        if unmatched > max_unmatched:
+            return None
+        position += 1
+    if unmatched + text_end - position > max_unmatched:
+        return None
+
+    if suffix:
+        matches.append((base_end, text_end, suffix))
+    return matches
+
+
+def _merge_windows(windows: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _overlapping(windows: List[Tuple[int, int]], starts: List[int], start: int, end: int) -> int:
+    """Index of a window in the sorted, disjoint `windows` that overlaps [start, end), or -1."""
+    i = bisect_left(starts, end) - 1
+    return i if i >= 0 and windows[i][1] > start else -1
+
+
+class IncrementalDetector(SecretDetector):
+    """
+    Wraps a detector so that re-sending an edited text only re-detects what changed.
+
+    Example:
+    -------
+    ```python
+    detector = IncrementalDetector(LLMSecretDetector(trusted_llm))
+    detector.detect(scratchpad)             # full detection
+    detector.detect(scratchpad + new_step)  # only `new_step` (plus a margin) is detected
+    ```
+    """
+
+    def __init__(self, detector: SecretDetector, margin: int = 256, block_size: int = 64,
+                 max_history: int = 8, full_scan_ratio: float = 0.5, min_length: int = 1024):
+        """
+        :param detector: The detector run on changed regions.
+        :param margin: Characters of unchanged context detected around every change, so
+                       secrets that straddle an edit boundary are found whole.
+        :param block_size: Granularity of the diff; edits are located to within a block.
+        :param max_history: Number of recently seen texts (and their spans) kept for diffing.
+        :param full_scan_ratio: Run a full detection when the regions to re-detect cover
+                                more than this fraction of the text.
+        :param min_length: Texts shorter than this are always detected in full.
+        """
+        self.detector = detector
+        self.margin = margin
+        self.block_size = block_size
+        self.max_history = max_history
+        self.full_scan_ratio = full_scan_ratio
+        self.min_length = min_length
+        self._history: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.full_scans = 0
+        self.incremental_scans = 0
+        self.detected_chars = 0  # Characters sent to the wrapped detector
+
+    def detect(self, text: str) -> List[Span]:
+        plan = self._plan(text)
+        if plan is None:
+            return self._remember(text, self._shift(self.detector.detect(text), 0), len(text), full=True)
+        spans, windows = plan
+        found = [self._shift(self.detector.detect(text[start:end]), start) for start, end in windows]
+        return self._complete(text, spans, windows, found)
+
+    async def adetect(self, text: str) -> List[Span]:
+        import asyncio
+        plan = self._plan(text)
+        if plan is None:
+            return self._remember(text, self._shift(await self.detector.adetect(text), 0), len(text), full=True)
+        spans, windows = plan
+        found = await asyncio.gather(*(self.detector.adetect(text[start:end]) for start, end in windows))
+        found = [self._shift(window_spans, start) for (start, _), window_spans in zip(windows, found)]
+        return self._complete(text, spans, windows, found)
+
+    def _plan(self, text: str) -> Optional[Tuple[List[Span], List[Tuple[int, int]]]]:
+        """
+        Returns the reused spans and the windows to re-detect, or None for a full detection.
+        """
+        with self._lock:
+            if text in self._history:
+                self._history.move_to_end(text)
+                return list(self._history[text]), []
+            history = list(self._history.items())
+        if len(text) < self.min_length or not history:
+            return None
+
+        # The base is the recent text sharing the longest prefix and suffix with this one;
+        # the most recent text is tried first and taken outright if it differs by a block.
+        base, base_spans, best = "", [], -1
+        for candidate, candidate_spans in reversed(history):
+            prefix = _common_prefix_length(candidate, text)
+            shared = prefix + _common_suffix_length(candidate, text, min(len(candidate), len(text)) - prefix)
+            if shared > best:
+                base, base_spans, best = candidate, candidate_spans, shared
+            if shared >= min(len(candidate), len(text)) - self.block_size:
+                break
+        # Unmatched text is re-detected, so past this much a full detection is cheaper.
+        matches = diff_matches(base, text, self.block_size, int(self.full_scan_ratio * len(text)))
+        if matches is None:
+            return None
+
+        # Every stretch of `text` not covered by a match is new, and every point where base
+        # text was deleted is an edit too; both are re-detected with a margin.
+        changed, base_position, position = [], 0, 0
+        for base_start, new_start, length in matches:
+            if new_start > position or base_start != base_position:
+                changed.append((position, new_start))
+            base_position, position = base_start + length, new_start + length
+        if position < len(text) or base_position != len(base):
+            changed.append((position, len(text)))
+        windows = [(max(0, start - self.margin), min(len(text), end + self.margin)) for start, end in changed]
+
+        # Shift the base spans that lie inside a match; spans cut by an edit are dropped.
+        shifted = []
+        match_starts = [base_start for base_start, _, _ in matches]
+        for span in base_spans:
+            i = bisect_right(match_starts, span.start) - 1
+            if i >= 0 and span.end <= matches[i][0] + matches[i][2]:
+                delta = matches[i][1] - matches[i][0]
+                shifted.append(span.shifted(delta))
+
+        # Windows grow to cover any reused span they touch, which is then detected again whole.
+        windows = _merge_windows([(start, end) for start, end in windows if end > start])
+        while True:
+            starts = [start for start, _ in windows]
+            partial = [(span.start, span.end) for span in shifted
+                       if _overlapping(windows, starts, span.start, span.end) >= 0]
+            grown = _merge_windows(windows + partial)
+            if grown == windows:
+                break
+            windows = grown
+
+        if sum(end - start for start, end in windows) > self.full_scan_ratio * len(text):
+            return None
+        reused = [span for span in shifted if _overlapping(windows, starts, span.start, span.end) < 0]
+        return reused, windows
+
+    def _complete(self, text: str, spans: List[Span], windows: List[Tuple[int, int]],
+                  found: List[List[Span]]) -> List[Span]:
+        new_secrets = {span.secret for window_spans in found for span in window_spans} - \
+                      {span.secret for span in spans}
+        for window_spans in found:
+            spans.extend(window_spans)
+        if new_secrets:
+            # A full detection reports every occurrence of a secret, including occurrences
+            # in unchanged text that were not flagged before; do the same here.
+            seen = {(span.start, span.end) for span in spans}
+            spans.extend(span for span in find_secret_positions(text, sorted(new_secrets))
+                         if (span.start, span.end) not in seen)
+        if any(isinstance(window_spans, FallbackResult) for window_spans in found):
+            spans = FallbackResult(spans)
+        return self._remember(text, spans, sum(end - start for start, end in windows))
+
+    @staticmethod
+    def _shift(spans: List[Span], offset: int) -> List[Span]:
+        shifted = [Span.coerce(span) for span in spans]  # Custom detectors may return dicts
+        if offset:
+            shifted = [span.shifted(offset) for span in shifted]
+        return FallbackResult(shifted) if isinstance(spans, FallbackResult) else shifted
+
+    def _remember(self, text: str, spans: List[Span], detected_chars: int,
+                  full: bool = False) -> List[Span]:
+        spans.sort(key=lambda span: (span.start, span.end))
+        with self._lock:
+            if full:
+                self.full_scans += 1
+            elif detected_chars:
+                self.incremental_scans += 1
+            self.detected_chars += detected_chars
+            if isinstance(spans, FallbackResult):
+                # Not a definitive answer: never reused, neither as is nor for diffing.
+                return FallbackResult(spans)
+            self._history[text] = spans
+            self._history.move_to_end(text)
+            while len(self._history) > self.max_history:
+                self._history.popitem(last=False)
+        return list(spans)
@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stages timed on the hot path.
+STAGE_DETECT = "detect"
+STAGE_ENCODE = "encode"
+STAGE_REPORT = "report"
+STAGE_DECODE = "decode"
+
+# Counters.
+SECRETS_FOUND = "secrets_found"
+CACHE_HITS = "cache_hits"
+PLACEHOLDERS_DECODED = "placeholders_decoded"
+
+
+class MetricsSink:
+    """
+    Receives the measurements of an `Instrumentation`.
+
+    Subclasses override `record_timing` and/or `record_count`; both are called
+    synchronously on the hot path and should be cheap.
+    """
+
+    def record_timing(self, stage: str, seconds: float, start_time_ns: int) -> None:
+        pass
+
+    def record_count(self, name: str, value: int) -> None:
+        pass
+
+
+class LoggingSink(MetricsSink):
+    """Logs every measurement to the `sentinel.instrumentation` logger."""
+
+    def __init__(self, level: int = logging.DEBUG):
+        self.level = level
+
+    def record_timing(self, stage: str, seconds: float, start_time_ns: int) -> None:
+        logger.log(self.level, "stage=%s duration_ms=%.3f", stage, seconds * 1000)
+
+    def record_count(self, name: str, value: int) -> None:
+        logger.log(self.level, "counter=%s value=%d", name, value)
+
+
+class InMemorySink(MetricsSink):
+    """Aggregates totals in memory; handy for tests, benchmarks and ad-hoc inspection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def record_timing(self, stage: str, seconds: float, start_time_ns: int) -> None:
+        with self._lock:
+            self.timings[stage] += seconds
+            self.calls[stage] += 1
+
+    def record_count(self, name: str, value: int) -> None:
+        with self._lock:
+            self.counts[name] += value
+
+
+class PrometheusSink(MetricsSink):
+    """
+    Exports stage latencies as a histogram and counters as a counter, both labelled,
+    through `prometheus_client` (imported when the sink is created).
+    """
+
+    def __init__(self, namespace: str = "sentinel", registry=None):
+        from prometheus_client import REGISTRY, Counter, Histogram
+
+        registry = registry or REGISTRY
+        self._stage_seconds = Histogram(
+            "stage_seconds", "Time spent in each Prompt Sentinel stage",
+            ["stage"], namespace=namespace, registry=registry,
+        )
+        self._events = Counter(
+            "events_total", "Prompt Sentinel event counters",
+            ["name"], namespace=namespace, registry=registry,
+        )
+
+    def record_timing(self, stage: str, seconds: float, start_time_ns: int) -> None:
+        self._stage_seconds.labels(stage=stage).observe(seconds)
+
+    def record_count(self, name: str, value: int) -> None:
+        self._events.labels(name=name).inc(value)
+
+
+class OpenTelemetrySink(MetricsSink):
+    """
+    Emits one span per timed stage (parented to the current span, e.g. the request)
+    and adds counters to OpenTelemetry metrics. Uses the `opentelemetry-api` package.
+    """
+
+    def __init__(self, tracer=None, meter=None):
+        from opentelemetry import metrics, trace
+
+        self._tracer = tracer or trace.get_tracer("prompt-sentinel")
+        self._meter = meter or metrics.get_meter("prompt-sentinel")
+        self._counters = {}
+
+    def record_timing(self, stage: str, seconds: float, start_time_ns: int) -> None:
+        span = self._tracer.start_span(f"sentinel.{stage}", start_time=start_time_ns)
+        span.end(end_time=start_time_ns + int(seconds * 1e9))
+
+    def record_count(self, name: str, value: int) -> None:
+        counter = self._counters.get(name)
+        if counter is None:
+            counter = self._counters[name] = self._meter.create_counter(f"sentinel.{name}")
+        counter.add(value)
+
+
+class _Timer:
+    __slots__ = ("_instrumentation", "_stage", "_start_ns", "_start_perf")
+
+    def __init__(self, instrumentation: "Instrumentation", stage: str):
+        self._instrumentation = instrumentation
+        self._stage = stage
+        self._start_ns = 0
+        self._start_perf = 0.0
+
+    def __enter__(self):
+        self._start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start_perf
+        for sink in self._instrumentation.sinks:
+            sink.record_timing(self._stage, seconds, self._start_ns)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Instrumentation:
+    """
+    Per-stage timers and counters for the sanitization hot path, fanned out to sinks.
+
+    With no sinks (the default) instrumentation is disabled: `timer` returns a shared
+    no-op context manager and `count` returns immediately, so the cost is a method call.
+
+    Example:
+    -------
+    ```python
+    metrics = InMemorySink()
+    @sentinel(detector, instrumentation=Instrumentation([metrics, LoggingSink()]))
+    def call_llm(messages): ...
+    ```
+    """
+
+    def __init__(self, sinks: Optional[Iterable[MetricsSink]] = None):
+        self.sinks = list(sinks or [])
+        self.enabled = bool(self.sinks)
+
+    def timer(self, stage: str):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled or not value:
+            return
+        for sink in self.sinks:
+            sink.record_count(name, value)
+
+
+NULL_INSTRUMENTATION = Instrumentation()
@@ -0,0 +1,222 @@
+"""
+A literal index of the secrets a vault already holds, and a detector stage using it.
+
+Once a secret has been detected, e.g. by an `LLMSecretDetector`, it is in the vault. The
+next prompt containing it is new text, so detector caches miss and the secret would be
+detected again. `KnownSecretIndex` finds every known secret in one regex pass instead:
+the secrets are compiled into a trie-shaped pattern (``ab(?:c|d)`` for "abc" and "abd"),
+which the regex engine matches in time roughly linear in the text, however many
+secrets there are.
+
+The index is updated incrementally as secrets are added, without recompiling all of
+them every time (see `KnownSecretIndex`).
+"""
+import re
+import threading
+from operator import attrgetter
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from sentinel.sentinel_detectors import FallbackResult, SecretDetector
+from sentinel.spans import Span
+
+if TYPE_CHECKING:
+    from sentinel.vault import Vault
+
+_START = attrgetter("start")
+
+
+def trie_pattern(words: List[str]) -> Optional["re.Pattern"]:
+    """
+    Compiles literal strings into one pattern that matches the longest of them starting
+    at each position. Returns None for an empty list.
+    """
+    if not words:
+        return None
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # End of a word
+    return re.compile(_node_pattern(trie))
+
+
+def _node_pattern(node: Dict[str, dict]) -> str:
+    parts = []
+    # Chains of single-child nodes become plain literals, without recursion.
+    while len(node) == 1 and "" not in node:
+        (char, node), = node.items()
+        parts.append(re.escape(char))
+    branches = [re.escape(char) + _node_pattern(child) for char, child in node.items() if char]
+    if branches:
+        group = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # A word ends here: longer words are tried first (greedy), then this one.
+            group = ("(?:" + group + ")" if len(branches) == 1 else group) + "?"
+        parts.append(group)
+    return "".join(parts)
+
+
+class KnownSecretIndex:
+    """
+    Finds the secrets of a vault in a text. Created by `Vault.known_secrets`, and kept up
+    to date as secrets are added to the vault or the vault is cleared.
+
+    The index is log-structured. The newest secrets form a small delta, scanned with
+    `str.find`. Full deltas become compiled segments, and a segment is merged with the
+    one before it while that one is less than `FANOUT` times larger. A text is scanned
+    by O(log n) patterns, and each secret is recompiled O(log n) times in total.
+    """
+
+    DELTA_LIMIT = 32
+    FANOUT = 4
+
+    def __init__(self, vault: "Vault", min_length: int = 4):
+        """
+        :param vault: The vault whose secrets are indexed.
+        :param min_length: Shorter secrets are not indexed: they are too likely to occur
+                           in unrelated text.
+        """
+        self.min_length = min_length
+        self._lock = threading.Lock()
+        self._types: Dict[str, Optional[str]] = {}
+        # The segments, (secrets, compiled pattern) oldest and largest first, and the delta.
+        # Published together as one tuple, replaced under the lock and never mutated, so
+        # `find` never sees a flushed delta without the segment it went into.
+        self._state: Tuple[List[Tuple[List[str], "re.Pattern"]], List[str]] = ([], [])
+        for secret, secret_type in vault.secrets():
+            self.secret_added(secret, secret_type)
+        vault.add_listener(self)
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def secret_added(self, secret: str, secret_type: Optional[str] = None):
+        if len(secret) < self.min_length or secret in self._types:
+            return
+        with self._lock:
+            self._types[secret] = secret_type
+            segments, delta = self._state
+            delta = delta + [secret]  # Copied: `find` may be iterating the old list
+            if len(delta) >= self.DELTA_LIMIT:
+                segments, delta = self._flushed(segments, delta), []
+            self._state = segments, delta
+
+    def _flushed(self, segments: List[Tuple[List[str], "re.Pattern"]], secrets: List[str]):
+        """The segments with the delta `secrets` compiled into them, merged as needed."""
+        segments = list(segments)
+        while segments and len(segments[-1][0]) < self.FANOUT * len(secrets):
+            secrets = segments.pop()[0] + secrets
+        segments.append((secrets, trie_pattern(secrets)))
+        return segments
+
+    def cleared(self):
+        with self._lock:
+            self._types = {}
+            self._state = ([], [])
+
+    def find(self, text: str) -> List[Span]:
+        """The known secrets in the text, with the type they were first detected with."""
+        types = self._types
+        if not types:
+            return []
+        segments, delta = self._state
+        spans = []
+        for _, pattern in segments:
+            spans.extend(Span(match.group(), match.start(), match.end(), types.get(match.group()))
+                         for match in pattern.finditer(text))
+        for secret in delta:
+            start = text.find(secret)
+            while start != -1:
+                spans.append(Span(secret, start, start + len(secret), types.get(secret)))
+                start = text.find(secret, start + len(secret))
+        if len(segments) + (1 if delta else 0) > 1:
+            spans.sort(key=_START)
+        return spans
+
+
+def blank_spans(text: str, spans: List[Span]) -> str:
+    """Replaces the spans, sorted by start, with spaces of the same length."""
+    parts, last = [], 0
+    for span in spans:
+        start = max(span.start, last)
+        if span.end <= start:
+            continue
+        parts.append(text[last:start])
+        parts.append(" " * (span.end - start))
+        last = span.end
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+class KnownSecretsDetector(SecretDetector):
+    """
+    Finds the secrets already in a vault with its `KnownSecretIndex`, then runs the wrapped
+    detector on the rest of the text, with the known secrets blanked out.
+
+    A secret the LLM found once is then found again in microseconds, in any text, and the
+    trusted LLM never sees it again. A text consisting only of known secrets skips the
+    wrapped detector. Combine with `NegativeCacheDetector` so that the rest of a text,
+    once found clean, also skips it.
+
+    Example:
+    -------
+    ```python
+    session = SessionContext(app_id="my-app")
+    detector = KnownSecretsDetector(LLMSecretDetector(trusted_llm), session.vault)
+    ```
+    """
+
+    def __init__(self, detector: SecretDetector, vault: "Vault"):
+        """
+        :param detector: The detector for everything that is not a known secret.
+        :param vault: The vault of the session context the detector is used with.
+        """
+        self.detector = detector
+        self.vault = vault
+        self.index = vault.known_secrets()
+
+    def _split(self, text: str):
+        known = self.index.find(text)
+        if not known:
+            return known, text
+        return known, blank_spans(text, known)
+
+    @staticmethod
+    def _combine(known: List[Span], spans: List) -> List[Span]:
+        combined = known + [Span.coerce(span) for span in spans]
+        # A fallback result stays one, so that caches around this detector do not remember it.
+        return FallbackResult(combined) if isinstance(spans, FallbackResult) else combined
+
+    def detect(self, text: str) -> List[Span]:
+        known, rest = self._split(text)
+        if known and rest.isspace():
+            return known
+        return self._combine(known, self.detector.detect(rest))
+
+    async def adetect(self, text: str) -> List[Span]:
+        known, rest = self._split(text)
+        if known and rest.isspace():
+            return known
+        return self._combine(known, await self.detector.adetect(rest))
+
+    def _split_batch(self, texts: Sequence[str]):
+        splits = [self._split(text) for text in texts]
+        pending = [i for i, (known, rest) in enumerate(splits) if not (known and rest.isspace())]
+        return splits, pending
+
+    def detect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        splits, pending = self._split_batch(texts)
+        results = [list(known) for known, _ in splits]
+        if pending:
+            for i, spans in zip(pending, self.detector.detect_batch([splits[i][1] for i in pending])):
+                results[i] = self._combine(results[i], spans)
+        return results
+
+    async def adetect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        splits, pending = self._split_batch(texts)
+        results = [list(known) for known, _ in splits]
+        if pending:
+            for i, spans in zip(pending, await self.detector.adetect_batch([splits[i][1] for i in pending])):
+                results[i] = self._combine(results[i], spans)
+        return results
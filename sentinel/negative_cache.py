@@ -0,0 +1,215 @@
+"""
+A compact negative cache: remembers texts a detector found clean, so they skip detection.
+
+Texts are remembered as content hashes in a Bloom filter of a few bits each, instead of
+as full strings: a million clean texts fit in a few MB. A Bloom filter can answer "seen"
+for a text it has never seen (a false positive); here that would skip detection of a new
+text, so the error rate defaults to one in a million and the current rate is exposed.
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import List, Optional, Sequence
+
+from sentinel.sentinel_detectors import FallbackResult, SecretDetector
+from sentinel.spans import Span
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter over 128-bit digests, sized for `capacity` items at `error_rate`."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate between 0 and 1.")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes):
+        # Double hashing: k positions from two 64-bit halves of the digest.
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, digest: bytes):
+        bits = self.bits
+        for position in self._positions(digest):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Estimated probability that an unseen digest is reported as present, at the current fill."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class NegativeCache:
+    """
+    Content hashes of known-clean texts in two rotating Bloom filter generations.
+
+    New texts go into the current generation; lookups check both. When the current
+    generation is full, or older than `max_age` seconds, it becomes the previous one and
+    the oldest is dropped. The false-positive rate therefore stays bounded, and texts that
+    are no longer seen are eventually forgotten, while texts seen in the last generation
+    survive a rotation.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 1e-6, max_age: Optional[float] = None):
+        """
+        :param capacity: Texts per generation. Memory is about 2 x capacity x 3.6 bytes at
+                         the default error rate.
+        :param error_rate: Target false-positive rate of each generation when full.
+        :param max_age: Optional seconds after which the current generation is rotated,
+                        so clean texts are re-checked, e.g. after the patterns change.
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_age = max_age
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous: Optional[BloomFilter] = None
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+
+    def __contains__(self, digest: bytes) -> bool:
+        found = digest in self._current or (self._previous is not None and digest in self._previous)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def add(self, digest: bytes):
+        with self._lock:
+            if self._current.count >= self.capacity or (
+                    self.max_age is not None and time.monotonic() - self._started > self.max_age):
+                self._rotate()
+            self._current.add(digest)
+
+    def rotate(self):
+        """Starts a new generation; the current one becomes the previous one."""
+        with self._lock:
+            self._rotate()
+
+    def _rotate(self):
+        self._previous = self._current
+        self._current = BloomFilter(self.capacity, self.error_rate)
+        self._started = time.monotonic()
+        self.rotations += 1
+
+    def clear(self):
+        with self._lock:
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._previous = None
+            self._started = time.monotonic()
+
+    def __len__(self) -> int:
+        return self._current.count + (self._previous.count if self._previous is not None else 0)
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Estimated probability that an unseen text is taken for a known-clean one."""
+        rate = 1 - self._current.false_positive_rate
+        if self._previous is not None:
+            rate *= 1 - self._previous.false_positive_rate
+        return 1 - rate
+
+    @property
+    def nbytes(self) -> int:
+        return self._current.nbytes + (self._previous.nbytes if self._previous is not None else 0)
+
+
+class NegativeCacheDetector(SecretDetector):
+    """
+    Skips detection for texts the wrapped detector already found clean.
+
+    Hashes are keyed by the detector configuration (`namespace`), so texts found clean
+    by one pattern set are not trusted by another, and one `NegativeCache` can be
+    shared by several detectors.
+
+    Example:
+    -------
+    ```python
+    detector = NegativeCacheDetector(LLMSecretDetector(trusted_llm), namespace="llm-v3")
+    detector.detect(system_prompt)   # detected once, then remembered as clean
+    ```
+    """
+
+    def __init__(self, detector: SecretDetector, cache: Optional[NegativeCache] = None,
+                 namespace: Optional[str] = None):
+        """
+        :param detector: The detector whose clean results are remembered.
+        :param cache: The negative cache; a new one with default settings if not provided.
+        :param namespace: Identifies the detector configuration. Defaults to the detector's
+                          `fingerprint` (e.g. of a `RegexSecretDetector`'s patterns), or its
+                          class name. Change it whenever the detector's behavior changes.
+        """
+        self.detector = detector
+        self.cache = cache if cache is not None else NegativeCache()
+        if namespace is None:
+            namespace = getattr(detector, "fingerprint", None) or type(detector).__qualname__
+        self.namespace = namespace
+        self._key = hashlib.blake2b(namespace.encode(), digest_size=32).digest()
+
+    @staticmethod
+    def _is_clean(spans) -> bool:
+        # An empty fallback result (e.g. the trusted LLM failed) is not proof of a clean text.
+        return not spans and not isinstance(spans, FallbackResult)
+
+    def _digest(self, text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16, key=self._key).digest()
+
+    def detect(self, text: str) -> List[Span]:
+        digest = self._digest(text)
+        if digest in self.cache:
+            return []
+        spans = self.detector.detect(text)
+        if self._is_clean(spans):
+            self.cache.add(digest)
+        return spans
+
+    async def adetect(self, text: str) -> List[Span]:
+        digest = self._digest(text)
+        if digest in self.cache:
+            return []
+        spans = await self.detector.adetect(text)
+        if self._is_clean(spans):
+            self.cache.add(digest)
+        return spans
+
+    def detect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        digests = [self._digest(text) for text in texts]
+        results: List[List[Span]] = [[] for _ in texts]
+        pending = [i for i, digest in enumerate(digests) if digest not in self.cache]
+        if pending:
+            for i, spans in zip(pending, self.detector.detect_batch([texts[i] for i in pending])):
+                results[i] = spans
+                if self._is_clean(spans):
+                    self.cache.add(digests[i])
+        return results
+
+    async def adetect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        digests = [self._digest(text) for text in texts]
+        results: List[List[Span]] = [[] for _ in texts]
+        pending = [i for i, digest in enumerate(digests) if digest not in self.cache]
+        if pending:
+            for i, spans in zip(pending, await self.detector.adetect_batch([texts[i] for i in pending])):
+                results[i] = spans
+                if self._is_clean(spans):
+                    self.cache.add(digests[i])
+        return results
@@ -0,0 +1,202 @@
+"""
+Detection in a pool of worker processes, for CPU-bound detectors.
+
+`RegexSecretDetector` and `PythonStringDataDetector` are pure-Python CPU work, so
+threads detecting concurrently are serialized by the GIL. `ParallelDetector` sends
+detection to a persistent process pool instead. Each worker builds its detector once,
+large texts are split into overlapping chunks and small texts are grouped into one
+task, so inter-process overhead is amortized. Spans come back as flat integer arrays
+and their text is rebuilt from the original input.
+"""
+import os
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sentinel.sentinel_detectors import SecretDetector
+from sentinel.spans import Span
+
+# A piece of work: (text, keep_from, keep_to). Only spans starting in [keep_from, keep_to)
+# are kept, so the context around a chunk is scanned without being reported twice.
+Piece = Tuple[str, int, int]
+# Compact spans: flat [start, end, type index] triples, type names, and the secrets that
+# differ from their text slice (rare; e.g. a custom detector that normalizes secrets).
+EncodedSpans = Tuple[array, Tuple[Optional[str], ...], Dict[int, str]]
+
+_worker_detector: Optional[SecretDetector] = None
+
+
+def _init_worker(detector_factory: Callable[[], SecretDetector]):
+    global _worker_detector
+    _worker_detector = detector_factory()
+
+
+def _encode(text: str, spans, keep_from: int, keep_to: int) -> EncodedSpans:
+    flat, types, type_index, overrides = array("q"), [], {}, {}
+    for span in spans:
+        span = Span.coerce(span)
+        if not keep_from <= span.start < keep_to:
+            continue
+        index = type_index.get(span.type)
+        if index is None:
+            index = type_index[span.type] = len(types)
+            types.append(span.type)
+        if text[span.start:span.end] != span.secret:
+            overrides[len(flat) // 3] = span.secret
+        flat.extend((span.start, span.end, index))
+    return flat, tuple(types), overrides
+
+
+def _detect_pieces(pieces: Sequence[Piece]) -> List[EncodedSpans]:
+    """Runs in a worker: detects every piece and returns the compact spans of each."""
+    return [_encode(text, _worker_detector.detect(text), keep_from, keep_to)
+            for text, keep_from, keep_to in pieces]
+
+
+def _decode(text: str, offset: int, encoded: EncodedSpans) -> List[Span]:
+    flat, types, overrides = encoded
+    spans = []
+    for i in range(0, len(flat), 3):
+        start, end = flat[i], flat[i + 1]
+        secret = overrides.get(i // 3) if overrides else None
+        if secret is None:
+            secret = text[offset + start:offset + end]
+        spans.append(Span(secret, offset + start, offset + end, types[flat[i + 2]]))
+    return spans
+
+
+class ParallelDetector(SecretDetector):
+    """
+    Runs a CPU-bound detector in a persistent pool of worker processes.
+
+    Example:
+    -------
+    ```python
+    detector = ParallelDetector(partial(RegexSecretDetector, yaml_path="patterns.yaml"), processes=4)
+    spans = detector.detect(huge_log)                 # chunks detected in parallel
+    results = detector.detect_batch(many_prompts)     # prompts grouped into tasks
+    ```
+    """
+
+    def __init__(self, detector_factory: Callable[[], SecretDetector], processes: Optional[int] = None,
+                 chunk_size: int = 256 * 1024, overlap: int = 1024, min_parallel_size: int = 64 * 1024,
+                 mp_context=None):
+        """
+        :param detector_factory: Picklable callable building the detector (a class, a
+                                 module-level function or a `functools.partial` of one).
+                                 It is called once in each worker process.
+        :param processes: Number of worker processes. Defaults to the number of CPUs.
+        :param chunk_size: Characters per task; large texts are split into chunks of
+                           this size and small texts are grouped up to this size.
+        :param overlap: Characters of context scanned on each side of a chunk. Must be
+                        at least the length of the longest secret.
+        :param min_parallel_size: Texts shorter than this are detected in the calling
+                                  process by `detect`, where IPC would cost more than it saves.
+        :param mp_context: Optional multiprocessing context, e.g. `get_context("spawn")`.
+        """
+        self.detector_factory = detector_factory
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.min_parallel_size = min_parallel_size
+        self.mp_context = mp_context
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._local: Optional[SecretDetector] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=self.mp_context,
+                                             initializer=_init_worker, initargs=(self.detector_factory,))
+        return self._pool
+
+    def close(self):
+        """Shuts the worker processes down."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _local_detector(self) -> SecretDetector:
+        if self._local is None:
+            self._local = self.detector_factory()
+        return self._local
+
+    def detect(self, text: str) -> List[Span]:
+        if len(text) < self.min_parallel_size:
+            return [Span.coerce(span) for span in self._local_detector().detect(text)]
+        return self.detect_batch([text])[0]
+
+    async def adetect(self, text: str) -> List[Span]:
+        import asyncio
+        if len(text) < self.min_parallel_size:
+            # The local detector's `adetect`, e.g. in an executor, so the loop is not blocked.
+            return [Span.coerce(span) for span in await self._local_detector().adetect(text)]
+        tasks = self._plan([text])
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in self._submit(tasks)))
+        return self._collect([text], tasks, results)[0]
+
+    def detect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        """Detects secrets in many texts at once; returns one list of spans per text."""
+        tasks = self._plan(texts)
+        results = [future.result() for future in self._submit(tasks)]
+        return self._collect(texts, tasks, results)
+
+    async def adetect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        import asyncio
+        tasks = self._plan(texts)
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in self._submit(tasks)))
+        return self._collect(texts, tasks, results)
+
+    def _plan(self, texts: Sequence[str]) -> List[List[Tuple[int, int, Piece]]]:
+        """
+        Splits the work into tasks of about `chunk_size` characters. Each task is a list
+        of (text index, offset of the piece in that text, piece).
+        """
+        tasks, current, current_size = [], [], 0
+        for index, text in enumerate(texts):
+            for offset, piece in self._pieces(text):
+                if current and current_size + len(piece[0]) > self.chunk_size:
+                    tasks.append(current)
+                    current, current_size = [], 0
+                current.append((index, offset, piece))
+                current_size += len(piece[0])
+        if current:
+            tasks.append(current)
+        return tasks
+
+    def _pieces(self, text: str):
+        if len(text) <= self.chunk_size + self.overlap:
+            yield 0, (text, 0, len(text))
+            return
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + self.chunk_size)
+            if end < len(text):
+                # Prefer cutting after a newline, where secrets are least likely to be split.
+                newline = text.rfind("\n", start + self.chunk_size // 2, end)
+                if newline != -1:
+                    end = newline + 1
+            context_start = max(0, start - self.overlap)
+            piece = text[context_start:min(len(text), end + self.overlap)]
+            yield context_start, (piece, start - context_start, end - context_start)
+            start = end
+
+    def _submit(self, tasks) -> List[Future]:
+        return [self.pool.submit(_detect_pieces, [piece for _, _, piece in task]) for task in tasks]
+
+    @staticmethod
+    def _collect(texts: Sequence[str], tasks, results) -> List[List[Span]]:
+        spans: List[List[Span]] = [[] for _ in texts]
+        for task, encoded_pieces in zip(tasks, results):
+            for (index, offset, _), encoded in zip(task, encoded_pieces):
+                spans[index].extend(_decode(texts[index], offset, encoded))
+        for text_spans in spans:
+            text_spans.sort(key=lambda span: span.start)
+        return spans
@@ -0,0 +1,319 @@
+"""
+Pattern packs: validated, normalized and precompiled regex pattern sets.
+
+A pack is built once from a YAML pattern set (a file or a string), or loaded from its
+JSON serialization, which needs neither YAML parsing nor pattern analysis. Compiled
+packs are cached process-wide by content hash, so constructing many detectors from the
+same patterns, e.g. one per tenant, compiles them only once.
+
+YAML pattern sets map each secret type either to a regex or to its settings:
+
+    aws_api_key: 'AKIA[0-9A-Z]{16}'
+    stripe_key:
+      pattern: '(?:sk|pk)_live_[0-9a-zA-Z]{24}'
+      priority: 10
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+# The regex parser is private: without it, or if its output changes shape, patterns get
+# no literal prefixes and are simply not prefiltered.
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+    from re import _constants as _sre_constants
+except ImportError:  # pragma: no cover
+    try:
+        import sre_parse as _sre_parse
+        import sre_constants as _sre_constants
+    except ImportError:
+        _sre_parse = _sre_constants = None
+
+logger = logging.getLogger(__name__)
+
+PACK_FORMAT = "prompt-sentinel-pattern-pack"
+PACK_VERSION = 1
+
+_MAX_PREFIXES = 16
+_MIN_PREFIX_LENGTH = 2
+
+
+@dataclass(frozen=True)
+class PatternSpec:
+    """
+    One pattern of a pack.
+
+    :param type: The secret type reported for matches.
+    :param pattern: The regex.
+    :param priority: Patterns are run, and their matches reported, in decreasing
+                     priority; when spans overlap, the type of the first one is kept.
+    :param prefixes: Literal strings every match starts with, if the pattern has any.
+                     The pattern is skipped for texts containing none of them.
+    """
+    type: str
+    pattern: str
+    priority: int = 0
+    prefixes: Tuple[str, ...] = ()
+
+
+def literal_prefixes(pattern: str) -> Tuple[str, ...]:
+    """
+    Returns literal strings one of which every match of `pattern` starts with, or an
+    empty tuple if there is no useful set of them (e.g. the pattern ignores case or
+    starts with a character class), or if the pattern cannot be analyzed.
+    """
+    if _sre_parse is None:
+        return ()
+    try:
+        parsed = _sre_parse.parse(pattern)
+        if parsed.state.flags & re.IGNORECASE:
+            return ()
+        prefixes = _prefixes(list(parsed))
+    except re.error:
+        return ()
+    except Exception:
+        logger.debug("Could not analyze the pattern %r; it is not prefiltered", pattern, exc_info=True)
+        return ()
+    if not prefixes or len(prefixes) > _MAX_PREFIXES or min(map(len, prefixes)) < _MIN_PREFIX_LENGTH:
+        return ()
+    return tuple(sorted(prefixes))
+
+
+def _prefixes(items) -> Optional[Set[str]]:
+    """Literal prefixes of a parsed sequence, or None if a match may start with anything."""
+    prefixes = {""}
+    for op, arg in items:
+        if op is _sre_constants.AT:
+            if prefixes == {""}:
+                continue  # Leading zero-width anchors such as ^ and \b
+            break
+        fixed = _fixed_strings(op, arg)
+        if fixed is not None and len(prefixes) * len(fixed) <= _MAX_PREFIXES:
+            prefixes = {p + f for p in prefixes for f in fixed}
+            continue
+        group = _group_prefixes(op, arg)
+        if group is not None and len(prefixes) * len(group) <= _MAX_PREFIXES:
+            prefixes = {p + g for p in prefixes for g in group}
+        break
+    return None if prefixes == {""} else prefixes
+
+
+def _fixed_strings(op, arg) -> Optional[Set[str]]:
+    """The strings matched by a literal element, e.g. `a`, `[Ss]` or `(?:sk|pk)`."""
+    if op is _sre_constants.LITERAL:
+        return {chr(arg)}
+    if op is _sre_constants.IN and all(item_op is _sre_constants.LITERAL for item_op, _ in arg):
+        return {chr(item_arg) for _, item_arg in arg}
+    if op is _sre_constants.SUBPATTERN and not arg[1] and not arg[2]:
+        return _fixed_sequence(arg[3])
+    if op is _sre_constants.BRANCH:
+        result: Set[str] = set()
+        for branch in arg[1]:
+            strings = _fixed_sequence(branch)
+            if strings is None:
+                return None
+            result |= strings
+        return result
+    return None
+
+
+def _fixed_sequence(items) -> Optional[Set[str]]:
+    strings = {""}
+    for op, arg in items:
+        fixed = _fixed_strings(op, arg)
+        if fixed is None or len(strings) * len(fixed) > _MAX_PREFIXES:
+            return None
+        strings = {s + f for s in strings for f in fixed}
+    return strings
+
+
+def _group_prefixes(op, arg) -> Optional[Set[str]]:
+    """The literal prefixes of a group that is not entirely literal, e.g. `(?:ab+|cd)`."""
+    if op is _sre_constants.SUBPATTERN and not arg[1] and not arg[2]:
+        return _prefixes(list(arg[3]))
+    if op is _sre_constants.BRANCH:
+        result: Set[str] = set()
+        for branch in arg[1]:
+            prefixes = _prefixes(list(branch))
+            if prefixes is None:
+                return None
+            result |= prefixes
+        return result
+    return None
+
+
+class PatternPack:
+    """
+    A validated, normalized set of `PatternSpec`, identified by a content fingerprint.
+    """
+
+    def __init__(self, specs: List[PatternSpec]):
+        self.specs: Tuple[PatternSpec, ...] = tuple(sorted(specs, key=lambda spec: -spec.priority))
+        # The prefixes are part of the fingerprint: they decide which patterns run on a text.
+        canonical = json.dumps([[s.type, s.pattern, s.priority, list(s.prefixes)] for s in self.specs],
+                               separators=(",", ":"))
+        self.fingerprint = hashlib.sha256(canonical.encode()).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def __repr__(self) -> str:
+        return f"PatternPack({len(self.specs)} patterns, fingerprint={self.fingerprint[:12]})"
+
+    @classmethod
+    def from_mapping(cls, data: Any, source: str = "pattern set") -> "PatternPack":
+        """Validates a parsed pattern set and computes the metadata of every pattern."""
+        if not isinstance(data, Mapping):
+            raise ValueError(f"The {source} must be a mapping of secret types to regex patterns.")
+        specs = []
+        for secret_type, value in data.items():
+            if not isinstance(secret_type, str) or not secret_type:
+                raise ValueError(f"Invalid secret type {secret_type!r} in the {source}.")
+            priority = 0
+            if isinstance(value, Mapping):
+                priority = value.get("priority", 0)
+                value = value.get("pattern")
+                if not isinstance(priority, int):
+                    raise ValueError(f"The priority of {secret_type!r} must be an integer.")
+            if not isinstance(value, str) or not value:
+                raise ValueError(f"The pattern of {secret_type!r} must be a non-empty string.")
+            try:
+                re.compile(value)
+            except re.error as e:
+                raise ValueError(f"Invalid regex for {secret_type!r} in the {source}: {e}") from e
+            specs.append(PatternSpec(secret_type, value, priority, literal_prefixes(value)))
+        return cls(specs)
+
+    @classmethod
+    def from_yaml_string(cls, yaml_string: str) -> "PatternPack":
+        return _cached_pack(yaml_string, lambda: cls._parse_yaml(yaml_string, "YAML pattern string"))
+
+    @classmethod
+    def from_yaml_file(cls, path: str) -> "PatternPack":
+        with open(path, "r") as f:
+            content = f.read()
+        return _cached_pack(content, lambda: cls._parse_yaml(content, f"YAML file {path}"))
+
+    @classmethod
+    def _parse_yaml(cls, content: str, source: str) -> "PatternPack":
+        import yaml
+        return cls.from_mapping(yaml.safe_load(content), source)
+
+    @classmethod
+    def load(cls, path: str) -> "PatternPack":
+        """Loads a JSON pack written by `save`, or a YAML pattern set."""
+        if path.endswith(".json"):
+            with open(path, "r") as f:
+                content = f.read()
+            return _cached_pack(content, lambda: cls.from_json(content))
+        return cls.from_yaml_file(path)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "format": PACK_FORMAT,
+            "version": PACK_VERSION,
+            "fingerprint": self.fingerprint,
+            "patterns": [asdict(spec) for spec in self.specs],
+        }, indent=2)
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def from_json(cls, content: str) -> "PatternPack":
+        """Loads a serialized pack, trusting its precomputed metadata."""
+        data = json.loads(content)
+        if data.get("format") != PACK_FORMAT or data.get("version") != PACK_VERSION:
+            raise ValueError("Not a prompt-sentinel pattern pack, or an unsupported version.")
+        pack = cls([PatternSpec(p["type"], p["pattern"], p.get("priority", 0), tuple(p.get("prefixes", ())))
+                    for p in data["patterns"]])
+        if pack.fingerprint != data.get("fingerprint"):
+            raise ValueError("The pattern pack's fingerprint does not match its patterns.")
+        return pack
+
+    def compile(self) -> "CompiledPack":
+        """Returns the compiled pack, shared by every pack with the same fingerprint."""
+        with _lock:
+            compiled = _compiled.get(self.fingerprint)
+            if compiled is not None:
+                _compiled.move_to_end(self.fingerprint)
+                return compiled
+        compiled = CompiledPack(self)
+        with _lock:
+            compiled = _compiled.setdefault(self.fingerprint, compiled)
+            while len(_compiled) > CACHE_SIZE:
+                _compiled.popitem(last=False)
+        return compiled
+
+
+class CompiledPack:
+    """The compiled patterns of a pack, with their prefilter. Immutable and shareable."""
+
+    # Below this many prefixed patterns, running each pattern (the regex engine already
+    # searches for a literal prefix first) is faster than a separate prefilter pass.
+    PREFILTER_MIN_PATTERNS = 8
+
+    def __init__(self, pack: PatternPack):
+        self.pack = pack
+        self.fingerprint = pack.fingerprint
+        self.patterns: Dict[str, "re.Pattern"] = {spec.type: re.compile(spec.pattern) for spec in pack.specs}
+        # (type, compiled pattern, literal prefixes) in priority order.
+        self.entries = tuple((spec.type, self.patterns[spec.type], spec.prefixes) for spec in pack.specs)
+
+        prefixes = {prefix for spec in pack.specs for prefix in spec.prefixes}
+        self._prefilter = None
+        if sum(1 for spec in pack.specs if spec.prefixes) >= self.PREFILTER_MIN_PATTERNS:
+            # One scan for all prefixes. At each position the longest prefix wins, so every
+            # prefix also marks the shorter prefixes it starts with as present.
+            ordered = sorted(prefixes, key=len, reverse=True)
+            self._prefilter = re.compile("|".join(map(re.escape, ordered)))
+            self._implied = {p: tuple(q for q in prefixes if p.startswith(q)) for p in prefixes}
+
+    def active_entries(self, text: str):
+        """The entries whose pattern can match somewhere in `text`."""
+        if self._prefilter is None:
+            return self.entries
+        found, implied, match_at = set(), self._implied, self._prefilter.match
+        for match in self._prefilter.finditer(text):
+            found.update(implied[match.group()])
+            # The scan resumes after a match; prefixes starting inside it are checked here.
+            for position in range(match.start() + 1, match.end()):
+                inner = match_at(text, position)
+                if inner is not None:
+                    found.update(implied[inner.group()])
+        return [entry for entry in self.entries if not entry[2] or not found.isdisjoint(entry[2])]
+
+
+# Process-wide caches, keyed by content hash: raw pattern source -> pack, fingerprint -> compiled pack.
+CACHE_SIZE = 256
+_lock = threading.Lock()
+_packs: "OrderedDict[str, PatternPack]" = OrderedDict()
+_compiled: "OrderedDict[str, CompiledPack]" = OrderedDict()
+
+
+def _cached_pack(content: str, build) -> PatternPack:
+    key = hashlib.sha256(content.encode()).hexdigest()
+    with _lock:
+        pack = _packs.get(key)
+        if pack is not None:
+            _packs.move_to_end(key)
+            return pack
+    pack = build()
+    with _lock:
+        pack = _packs.setdefault(key, pack)
+        while len(_packs) > CACHE_SIZE:
+            _packs.popitem(last=False)
+    return pack
+
+
+def clear_cache():
+    """Empties the process-wide pack caches."""
+    with _lock:
+        _packs.clear()
+        _compiled.clear()
@@ -0,0 +1,294 @@
+"""
+Bulk, offline sanitization of JSONL chat logs and text corpora.
+
+Input is streamed in batches of lines, batches are sanitized in a pool of worker
+processes (each builds its detector once), and results are written in input order.
+Every output line corresponds to exactly one input line. At each checkpoint the
+output is flushed and the input/output byte offsets are recorded, so that an
+interrupted run can be resumed exactly where the last checkpoint left off.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sentinel.prompt_sentinel import detect_and_encode_text
+from sentinel.sentinel_detectors import SecretDetector
+from sentinel.session_context import ScopedSessionContext
+from sentinel.vault import Vault
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIELDS = ("content", "text", "prompt", "completion")
+
+FORMAT_JSONL = "jsonl"
+FORMAT_TEXT = "text"
+
+# Each batch is sanitized with a vault of its own, which cannot lengthen a hash that
+# collides with another batch's secret. Placeholders therefore use 128-bit hashes, for
+# which collisions are negligible, and a collision found when merging is an error.
+PLACEHOLDER_HASH_LENGTH = 32
+
+
+class VaultConflictError(ValueError):
+    """Two secrets from different batches were given the same placeholder."""
+
+
+@dataclass
+class PipelineStats:
+    lines: int = 0
+    bytes: int = 0
+    secrets: int = 0  # Secrets replaced, counting every occurrence
+    invalid_lines: int = 0
+    offset: int = 0  # Input byte offset up to which output has been written
+    output_offset: int = 0  # Output byte offset matching `offset`
+    elapsed: float = 0.0
+
+    @property
+    def lines_per_s(self) -> float:
+        return self.lines / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes / 1e6 / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.lines} lines, {self.bytes / 1e6:.1f} MB, {self.secrets} secrets "
+                f"in {self.elapsed:.1f}s ({self.lines_per_s:.0f} lines/s, {self.mb_per_s:.2f} MB/s); "
+                f"resume offset {self.offset}")
+
+
+# Per-process state, set once by `_init_worker`.
+_worker_detector: Optional[SecretDetector] = None
+
+
+class _CountingVault(Vault):
+    """A vault counting the secrets replaced: one placeholder is requested per occurrence."""
+
+    def __init__(self):
+        super().__init__(hash_length=PLACEHOLDER_HASH_LENGTH)
+        self.replaced = 0
+
+    def add_secret_and_get_placeholder(self, secret: str, secret_type: Optional[str] = None) -> str:
+        self.replaced += 1
+        return super().add_secret_and_get_placeholder(secret, secret_type)
+
+
+def _init_worker(detector_factory: Callable[[], SecretDetector]):
+    global _worker_detector
+    _worker_detector = detector_factory()
+
+
+def _sanitize_value(value: Any, fields: Sequence[str], context: ScopedSessionContext,
+                    detector: SecretDetector, sanitize: bool) -> Any:
+    if isinstance(value, str):
+        return detect_and_encode_text(value, context, detector) if sanitize else value
+    if isinstance(value, dict):
+        return {k: _sanitize_value(v, fields, context, detector, sanitize or k in fields)
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [_sanitize_value(v, fields, context, detector, sanitize) for v in value]
+    return value
+
+
+def _sanitize_record(record: Any, fields: Sequence[str], context: ScopedSessionContext,
+                     detector: SecretDetector) -> Any:
+    """
+    Sanitizes a JSONL record. Strings at the top level, alone or in lists, have no key to
+    select them, so they are always sanitized; dicts are sanitized under `fields`.
+    """
+    if isinstance(record, list):
+        return [_sanitize_record(v, fields, context, detector) for v in record]
+    return _sanitize_value(record, fields, context, detector, isinstance(record, str))
+
+
+def sanitize_lines(lines: List[bytes], fmt: str = FORMAT_JSONL, fields: Sequence[str] = DEFAULT_FIELDS,
+                   detector: Optional[SecretDetector] = None) -> Tuple[List[bytes], Dict[str, str], int, int]:
+    """
+    Sanitizes a batch of raw input lines.
+
+    For JSONL, string values under any of `fields` (at any depth) are sanitized, as are
+    lines that are a JSON string or a list of strings; lines that are not valid JSON are
+    sanitized as plain text rather than passed through.
+    Returns the output lines, the placeholder-secret pairs created for the batch, the
+    number of invalid JSON lines and the number of secrets replaced. A secret occurring
+    several times is replaced, and counted, every time, but has a single placeholder.
+    """
+    detector = detector or _worker_detector
+    vault = _CountingVault()
+    context = ScopedSessionContext(app_id="sentinel-pipeline", vault=vault)
+    output, invalid = [], 0
+    for raw in lines:
+        line = raw.decode("utf-8", errors="replace")
+        newline = "\n" if line.endswith("\n") else ""
+        line = line[:-1] if newline else line
+        if fmt == FORMAT_JSONL and line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                invalid += 1
+            else:
+                record = _sanitize_record(record, fields, context, detector)
+                output.append((json.dumps(record, ensure_ascii=False) + newline).encode("utf-8"))
+                continue
+        output.append((detect_and_encode_text(line, context, detector) + newline).encode("utf-8"))
+    return output, dict(vault.get_secret_mapping()), invalid, vault.replaced
+
+
+def _batches(stream, batch_size: int) -> Iterator[Tuple[List[bytes], int]]:
+    """Yields batches of lines together with their total size in bytes."""
+    batch, size = [], 0
+    for line in stream:
+        batch.append(line)
+        size += len(line)
+        if len(batch) >= batch_size:
+            yield batch, size
+            batch, size = [], 0
+    if batch:
+        yield batch, size
+
+
+def sanitize_stream(
+        stream: Iterable[bytes],
+        out,
+        detector_factory: Callable[[], SecretDetector],
+        fmt: str = FORMAT_JSONL,
+        fields: Sequence[str] = DEFAULT_FIELDS,
+        processes: Optional[int] = None,
+        batch_size: int = 512,
+        vault=None,
+        start_offset: int = 0,
+        start_output_offset: int = 0,
+        checkpoint_every: float = 10.0,
+        on_checkpoint: Optional[Callable[[PipelineStats], None]] = None,
+) -> PipelineStats:
+    """
+    Sanitizes a stream of raw lines into the binary file-like `out`.
+
+    :param detector_factory: Picklable callable building the detector, called once per worker.
+    :param processes: Number of worker processes; 0 sanitizes in the calling process.
+                      Defaults to the number of CPUs.
+    :param batch_size: Lines per task sent to a worker; larger batches amortize IPC.
+    :param vault: Optional `Vault` collecting all placeholder-secret pairs. Raises
+                  `VaultConflictError` if a placeholder of a batch is already mapped to a
+                  different secret.
+    :param start_offset: Byte offset of the stream's first line in the input, so the
+                         reported resume offset is absolute.
+    :param start_output_offset: Byte offset in the output at which writing starts.
+    :param checkpoint_every: Seconds between checkpoints. At a checkpoint the output is
+                             flushed, progress is logged and `on_checkpoint` is called.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    stats = PipelineStats(offset=start_offset, output_offset=start_output_offset)
+    started = last_checkpoint = time.monotonic()
+
+    def _checkpoint():
+        out.flush()
+        stats.elapsed = time.monotonic() - started
+        if on_checkpoint is not None:
+            on_checkpoint(stats)
+
+    def _collect(result: Tuple[List[bytes], Dict[str, str], int, int], size: int):
+        nonlocal last_checkpoint
+        lines, mapping, invalid, secrets = result
+        out.writelines(lines)
+        stats.lines += len(lines)
+        stats.bytes += size
+        stats.offset += size
+        stats.output_offset += sum(len(line) for line in lines)
+        stats.invalid_lines += invalid
+        stats.secrets += secrets
+        if vault is not None and vault.merge(mapping):
+            # The output already holds the shared placeholder: no vault can decode it correctly.
+            raise VaultConflictError(
+                f"Two secrets were given the same placeholder near input offset {stats.offset}; "
+                f"the vault cannot restore them.")
+        if time.monotonic() - last_checkpoint >= checkpoint_every:
+            _checkpoint()
+            logger.info("Progress: %s", stats.summary())
+            last_checkpoint = time.monotonic()
+
+    if processes == 0:
+        detector = detector_factory()
+        for batch, size in _batches(stream, batch_size):
+            _collect(sanitize_lines(batch, fmt, fields, detector), size)
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(detector_factory,)) as pool:
+            # Bounded in-flight window: keeps memory flat however large the input is,
+            # while preserving input order on output.
+            in_flight = deque()
+            for batch, size in _batches(stream, batch_size):
+                in_flight.append((pool.submit(sanitize_lines, batch, fmt, fields), size))
+                if len(in_flight) >= 2 * processes:
+                    future, done_size = in_flight.popleft()
+                    _collect(future.result(), done_size)
+            while in_flight:
+                future, done_size = in_flight.popleft()
+                _collect(future.result(), done_size)
+
+    _checkpoint()
+    return stats
+
+
+def checkpoint_path(output_path: str) -> str:
+    return f"{output_path}.progress"
+
+
+def sanitize_file(
+        input_path: str,
+        output_path: str,
+        detector_factory: Callable[[], SecretDetector],
+        resume: bool = False,
+        on_checkpoint: Optional[Callable[[PipelineStats], None]] = None,
+        **kwargs,
+) -> PipelineStats:
+    """
+    Sanitizes `input_path` into `output_path` with `sanitize_stream`.
+
+    Input may be "-" for stdin. The input/output offsets of every checkpoint are
+    recorded in `<output_path>.progress`. With `resume`, the input is read from the
+    last recorded input offset and the output is truncated to the matching output
+    offset, discarding anything written after the last checkpoint.
+    """
+    progress_path = checkpoint_path(output_path)
+    input_offset = output_offset = 0
+    if resume and os.path.exists(progress_path):
+        with open(progress_path) as f:
+            progress = json.load(f)
+        input_offset, output_offset = progress["input_offset"], progress["output_offset"]
+
+    if input_path == "-":
+        if input_offset:
+            raise ValueError("Cannot resume when reading from stdin.")
+        in_file = sys.stdin.buffer
+    else:
+        in_file = open(input_path, "rb")
+        in_file.seek(input_offset)
+
+    out_file = open(output_path, "r+b" if output_offset else "wb")
+    out_file.truncate(output_offset)
+    out_file.seek(output_offset)
+
+    def _record_checkpoint(stats: PipelineStats):
+        if on_checkpoint is not None:
+            on_checkpoint(stats)  # E.g. persist the vault before the offsets that depend on it
+        tmp_path = f"{progress_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"input_offset": stats.offset, "output_offset": stats.output_offset}, f)
+        os.replace(tmp_path, progress_path)
+
+    try:
+        return sanitize_stream(in_file, out_file, detector_factory, start_offset=input_offset,
+                               start_output_offset=output_offset, on_checkpoint=_record_checkpoint,
+                               **kwargs)
+    finally:
+        if in_file is not sys.stdin.buffer:
+            in_file.close()
+        out_file.close()
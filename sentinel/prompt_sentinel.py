@@ -1,40 +1,48 @@
 import os
+import re
+from contextvars import ContextVar
+import time
+from bisect import bisect_left
 from copy import deepcopy
 from datetime import datetime
-from typing import Any, Callable, Dict, Union, Tuple
+from typing import (
+    TYPE_CHECKING, AbstractSet, Any, AsyncIterator, Awaitable, Callable, Dict, FrozenSet, Iterator, List, Optional,
+    Set, Union, Tuple,
+)
 from functools import wraps
-from sentinel.sentinel_detectors import SecretDetector
+from operator import attrgetter
+from sentinel.response_adapters import adapter_for, replace_fields
+from sentinel.sentinel_detectors import CollectingDetector, PrecomputedDetector, SecretDetector
 from sentinel.session_context import SessionContext
+from sentinel.spans import Span
+from sentinel.instrumentation import (
+    CACHE_HITS, PLACEHOLDERS_DECODED, SECRETS_FOUND,
+    STAGE_DECODE, STAGE_DETECT, STAGE_ENCODE, STAGE_REPORT, Instrumentation,
+)
 import inspect
-import asyncio
+import logging
 
+if TYPE_CHECKING:
+    from sentinel.tracing import TraceRecorder
 
-try:
-    from langchain.schema import AIMessage, HumanMessage, SystemMessage  # or BaseMessage
+logger = logging.getLogger(__name__)
 
-    def _process_langchain_message(
-            message: Union[AIMessage, HumanMessage, SystemMessage],
-            session_context: SessionContext
-    ) -> Union[AIMessage, HumanMessage, SystemMessage]:
-        # if getattr(message, "role", None) in {"tool", "tool_calls"}:
-        #     return message
+# Set while a batch-mode wrapper calls the wrapped method: the id of its instance (None
+# for a function) and the ids of the inputs it already sanitized. LangChain's
+# `Runnable.batch` calls `self.invoke` with each of these inputs (in threads or tasks that
+# copy the context), and only such calls skip sanitization. Any other wrapped call made
+# from within, e.g. to another model or a tool, is sanitized as usual: detection leaves
+# placeholders alone.
+_IN_BATCH: ContextVar[Optional[Tuple[Optional[int], FrozenSet[int]]]] = ContextVar(
+    "sentinel_in_batch", default=None)
 
-        kwargs: Dict[str, Any] = {
-            "content": decode_text(message.content, session_context),
-            "additional_kwargs": _process_response(message.additional_kwargs, session_context),
-            "response_metadata": _process_response(message.response_metadata, session_context),
-            "usage_metadata": _process_response(getattr(message, "usage_metadata", {}), session_context),
-        }
 
-        if isinstance(message, AIMessage):
-            kwargs["tool_calls"] = _process_response(message.tool_calls, session_context)
-
-        return message.copy(update=kwargs)
-except ImportError:
-    pass
-
-
-def _sanitize_message(message: Any, session_context: SessionContext, detector: SecretDetector) -> Any:
+def _sanitize_message(
+        message: Any,
+        session_context: SessionContext,
+        detector: SecretDetector,
+        issued: Optional[Set[str]] = None
+) -> Any:
     """
     Sanitizes a single message-like representation.
     - If it's a string, sanitize the text.
@@ -42,17 +50,20 @@ def _sanitize_message(message: Any, session_context: SessionContext, detector: S
     - If it's a list or tuple of strings, sanitize each string.
     - If it has a 'content' attribute (e.g., HumanMessage), create a new message with sanitized content.
     - Otherwise, fallback to converting to string and sanitizing.
+
+    If `issued` is given, every placeholder that may come back in the response (see
+    `detect_and_encode_text`) is added to it.
     """
     # Check for dict with "content" key.
     if isinstance(message, dict):
         if "content" in message and isinstance(message["content"], str):
             message["content"] = detect_and_encode_text(
-                message["content"], session_context, detector
+                message["content"], session_context, detector, issued
             )
         return message
     # Check for plain string.
     if hasattr(message, "content") and isinstance(getattr(message, "content"), str):
-        sanitized_content = detect_and_encode_text(message.content, session_context, detector)
+        sanitized_content = detect_and_encode_text(message.content, session_context, detector, issued)
         try:
             # Attempt to create a new instance if the class accepts 'content'.
             return message.__class__(role=message.role, content=sanitized_content)
@@ -62,24 +73,27 @@ def _sanitize_message(message: Any, session_context: SessionContext, detector: S
             message.content = sanitized_content
             return message
     elif isinstance(message, str):
-        return detect_and_encode_text(message, session_context, detector)
+        return detect_and_encode_text(message, session_context, detector, issued)
     # Check for list or tuple.
     elif isinstance(message, (list, tuple)):
         sanitized = []
         for item in message:
-            sanitized.append(_sanitize_message(item, session_context, detector))
+            sanitized.append(_sanitize_message(item, session_context, detector, issued))
         return type(message)(sanitized)
     # Check if it has a 'content' attribute.
 
     else:
         # Fallback: convert to string.
-        return detect_and_encode_text(str(message), session_context, detector)
+        return detect_and_encode_text(str(message), session_context, detector, issued)
 
 
 def _is_likely_method(func: Callable) -> bool:
-    """Heuristically check if this is an instance or class method."""
+    """
+    Heuristically check if this is an instance or class method that receives `self` or
+    `cls` as its first argument. Bound methods do not: it is already bound.
+    """
     if inspect.ismethod(func):
-        return True  # bound method
+        return False  # bound method
     qualname_parts = getattr(func, "__qualname__", "").split(".")
     if len(qualname_parts) > 1:
         try:
@@ -91,51 +105,225 @@ def _is_likely_method(func: Callable) -> bool:
     return False
 
 
-def _process_dict(response: Dict[str, Any], session_context: SessionContext) -> Dict[str, Any]:
+def _process_dict(
+        response: Dict[str, Any],
+        session_context: SessionContext,
+        placeholders: Optional[AbstractSet[str]] = None
+) -> Dict[str, Any]:
     if response.get("role") in {"tool", "tool_calls"}:
         return response
 
-    result = deepcopy(response)
-
-    if "content" in result and isinstance(result["content"], str):
-        result["content"] = decode_text(result["content"], session_context)
+    # Every nested container is rebuilt by the recursion, so a shallow rebuild replaces
+    # the former deepcopy of the whole response.
+    return {key: decode_response(value, session_context, placeholders) for key, value in response.items()}
 
-    for key, value in result.items():
-        result[key] = _process_response(value, session_context)
 
-    return result
+_SCALARS = frozenset({int, float, bool, type(None)})
 
 
-def _process_response(
+def decode_response(
         response: Any,
-        session_context: SessionContext
+        session_context: SessionContext,
+        placeholders: Optional[AbstractSet[str]] = None
 ) -> Any:
+    """
+    Decodes placeholders anywhere in a response. If `placeholders` is given, only those
+    placeholders are decoded.
+
+    The response is not modified: lists and dicts are rebuilt, and other objects are
+    decoded by the adapter registered for their type (see `sentinel.response_adapters`),
+    which copies them only if they contain decoded text.
+    """
+    if isinstance(response, str):
+        return decode_text(response, session_context, placeholders)
+
     if isinstance(response, list):
-        return [_process_response(item, session_context) for item in response]
+        return [decode_response(item, session_context, placeholders) for item in response]
 
     if isinstance(response, dict):
-        return _process_dict(response, session_context)
+        return _process_dict(response, session_context, placeholders)
 
-    if isinstance(response, str):
-        return decode_text(response, session_context)
-
-    try:
-        if isinstance(response, (AIMessage, HumanMessage, SystemMessage)):
-            return _process_langchain_message(response, session_context)
-    except NameError:
-        pass  # Either the message classes or function is not defined
-
-    # require testing test
-    if hasattr(response, '__dict__'):
-        for attr in vars(response):
-            value = getattr(response, attr)
-            if isinstance(value, str):
-                setattr(response, attr, decode_text(value, session_context))
-            else:
-                setattr(response, attr, _process_response(value, session_context))
+    if type(response) in _SCALARS:
         return response
+    adapter = adapter_for(type(response))
+    if adapter is None:
+        return response
+    return adapter(response, lambda value: decode_response(value, session_context, placeholders))
+
+
+class StreamDecoder:
+    """
+    Decodes placeholders in text that arrives in chunks, such as a streamed completion.
+
+    A placeholder may be split across chunks, so a chunk's tail that could be the
+    beginning of a placeholder is held back until the next chunk shows whether it is
+    one. Everything else is released immediately; at most one placeholder's length
+    of text is ever held back.
+    """
+
+    def __init__(self, session_context: SessionContext, placeholders: Optional[AbstractSet[str]] = None):
+        self.session_context = session_context
+        self.placeholders = placeholders
+        vault = session_context.vault
+        self._prefix = vault.prefix
+        self._pattern = vault.placeholder_pattern
+        self._max_pending = len(vault.prefix) + len(vault.suffix) + 2 * vault.MAX_HASH_LENGTH
+        # What may follow the prefix in an unfinished placeholder: body characters and
+        # the start of the suffix.
+        suffix_starts = "|".join(re.escape(vault.suffix[:i]) for i in range(1, len(vault.suffix)))
+        self._partial_body = re.compile(rf"[A-Z0-9_a-f]*(?:{suffix_starts})?" if suffix_starts
+                                        else r"[A-Z0-9_a-f]*")
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        """Returns the decoded text that can be released after receiving `chunk`."""
+        text = self._pending + chunk if self._pending else chunk
+        cut = self._hold_back_from(text)
+        self._pending = text[cut:]
+        return decode_text(text[:cut], self.session_context, self.placeholders) if cut else ""
+
+    def flush(self) -> str:
+        """Returns the decoded remainder at the end of the stream."""
+        text, self._pending = self._pending, ""
+        return decode_text(text, self.session_context, self.placeholders) if text else ""
+
+    def _hold_back_from(self, text: str) -> int:
+        prefix = self._prefix
+        if prefix[0] not in text[-self._max_pending:]:
+            return len(text)
+        # An unfinished placeholder: the prefix followed only by placeholder characters.
+        start = text.rfind(prefix, max(0, len(text) - self._max_pending))
+        floor = 0
+        if start != -1:
+            match = self._pattern.match(text, start)
+            if match is None:
+                if self._partial_body.fullmatch(text, start + len(prefix)):
+                    return start
+            elif match.end() == len(text):
+                return len(text)  # A complete placeholder cannot grow any further
+            else:
+                floor = match.end()
+        # Or the text ends with the beginning of the prefix (after any complete placeholder).
+        for length in range(min(len(prefix) - 1, len(text) - floor), 0, -1):
+            if text.endswith(prefix[:length]):
+                return len(text) - length
+        return len(text)
+
+
+class _ItemStreamDecoder:
+    """
+    Decodes the items of a stream one by one. Text items, and the text `content` of
+    message chunks, are decoded with a `StreamDecoder` so that placeholders split
+    across chunks are restored; other items are decoded individually.
+    """
+
+    def __init__(self, session_context: SessionContext, placeholders: AbstractSet[str]):
+        self.session_context = session_context
+        self.placeholders = placeholders
+        self.text_decoder = StreamDecoder(session_context, placeholders)
+        self._last = None
+
+    def decode(self, item: Any) -> Any:
+        if isinstance(item, str):
+            self._last = item
+            return self.text_decoder.feed(item)
+        content = item.get("content") if isinstance(item, dict) else getattr(item, "content", None)
+        if isinstance(content, str):
+            self._last = item
+            item = _with_content(item, self.text_decoder.feed(content))
+        return decode_response(item, self.session_context, self.placeholders)
+
+    def finish(self) -> Any:
+        """Returns a final item carrying held-back text, or None if nothing is left."""
+        remainder = self.text_decoder.flush()
+        if not remainder:
+            return None
+        return remainder if isinstance(self._last, str) else _with_content(self._last, remainder)
+
+
+def _with_content(item: Any, content: str) -> Any:
+    if isinstance(item, dict):
+        return dict(item, content=content)
+    return replace_fields(item, {"content": content})
+
+
+class DecodedStream:
+    """
+    Wraps an iterator returned by a decorated function, decoding each item as it is
+    consumed. Other attributes, and use as a context manager, are passed through.
+    """
+
+    def __init__(self, stream: Iterator, decoder: _ItemStreamDecoder):
+        self._stream = stream
+        self._decoder = decoder
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        try:
+            item = next(self._stream)
+        except StopIteration:
+            self._finished = True
+            remainder = self._decoder.finish()
+            if remainder is None:
+                raise
+            return remainder
+        return self._decoder.decode(item)
+
+    def __enter__(self):
+        enter = getattr(self._stream, "__enter__", None)
+        if enter is not None:
+            enter()
+        return self
+
+    def __exit__(self, *exc_info):
+        exit_ = getattr(self._stream, "__exit__", None)
+        return exit_(*exc_info) if exit_ is not None else False
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class AsyncDecodedStream:
+    """The asynchronous counterpart of `DecodedStream`."""
+
+    def __init__(self, stream: AsyncIterator, decoder: _ItemStreamDecoder):
+        self._stream = stream
+        self._decoder = decoder
+        self._finished = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._finished:
+            raise StopAsyncIteration
+        try:
+            item = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._finished = True
+            remainder = self._decoder.finish()
+            if remainder is None:
+                raise
+            return remainder
+        return self._decoder.decode(item)
+
+    async def __aenter__(self):
+        enter = getattr(self._stream, "__aenter__", None)
+        if enter is not None:
+            await enter()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        exit_ = getattr(self._stream, "__aexit__", None)
+        return await exit_(*exc_info) if exit_ is not None else False
 
-    return response
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
 
 
 def sentinel(
@@ -143,109 +331,449 @@ def sentinel(
     session_context: SessionContext = None,  # Keep parameter for flexibility
     sanitize_arg: Union[int, str] = 0,
     ps_app_id: str = None,
-    ps_server_url: str = None
+    ps_server_url: str = None,
+    instrumentation: Instrumentation = None,
+    batch: bool = False,
+    tracer: Optional["TraceRecorder"] = None
 ) -> Callable:
+    """
+    Decorates an LLM call so that the selected argument is sanitized before the call
+    and placeholders in the response are decoded.
+
+    With `batch=True`, the selected argument is a list of inputs, such as the first
+    argument of LangChain's `batch` and `abatch`, and the response is a list with one
+    output per input. The distinct texts of all inputs are detected in a single
+    `detect_batch` (or `adetect_batch`) call, and each output is decoded with the
+    placeholders of its own input.
+
+    With a `tracer` (a `sentinel.tracing.TraceRecorder`), or one set on the session
+    context, each call is recorded as one trace record.
+    """
     # Use the provided project/server IDs or fallback to environment variables
     ps_app_id = ps_app_id or os.getenv("PS_APP_ID", "default_token")
-    ps_server_url = ps_server_url or os.getenv("PS_SERVER_URL", "http://default.server.url")
+    ps_server_url = ps_server_url or os.getenv("PS_SERVER_URL")
 
     # Initialize the session context if not provided
     session_context = session_context or SessionContext(
         app_id=ps_app_id, server_url=ps_server_url
     )
+    if instrumentation is not None or tracer is not None:
+        # Per decorated function: the session context may be the process-wide singleton.
+        session_context = session_context.with_overrides(instrumentation=instrumentation, tracer=tracer)
 
     def decorator(func: Callable) -> Callable:
+        wrapper = _decorate(func)
+        if session_context.tracer is None:
+            return wrapper
+        from sentinel.tracing import traced_wrapper
+
+        def sanitized_value(args, kwargs):
+            return select_arg(func, args, kwargs)[1]
+        return traced_wrapper(wrapper, session_context.tracer, "batch" if batch else "call", sanitized_value)
+
+    def select_arg(func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]):
+        """
+        Returns whether the argument to sanitize was passed, its value, and a function
+        returning the call's args and kwargs with that argument replaced.
+        """
+        if isinstance(sanitize_arg, int):
+            idx = sanitize_arg + (1 if _is_likely_method(func) else 0)
+            if idx < len(args):
+                return True, args[idx], lambda value: (args[:idx] + (value,) + args[idx + 1:], kwargs)
+        elif isinstance(sanitize_arg, str) and sanitize_arg in kwargs:
+            return True, kwargs[sanitize_arg], lambda value: (args, {**kwargs, sanitize_arg: value})
+        return False, None, None
+
+    def instance_id(func: Callable, args: Tuple[Any, ...]) -> Optional[int]:
+        return id(args[0]) if args and _is_likely_method(func) else None
+
+    def batch_scope(func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]):
+        """The value of `_IN_BATCH` while calling `func` with the sanitized batch inputs."""
+        inputs = select_arg(func, args, kwargs)[1]
+        return instance_id(func, args), frozenset(map(id, inputs))
+
+    def is_batch_reentry(func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> bool:
+        """
+        Whether this call is made, on the same instance, by the batch wrapper's method with
+        one of the inputs it already sanitized.
+        """
+        scope = _IN_BATCH.get()
+        if scope is None:
+            return False
+        found, value, _ = select_arg(func, args, kwargs)
+        return found and id(value) in scope[1] and instance_id(func, args) == scope[0]
+
+    def _decorate(func: Callable) -> Callable:
 
         def process_args(
             func: Callable,
             args: Tuple[Any, ...],
             kwargs: Dict[str, Any]
-        ) -> Tuple[Tuple[Any, ...], Dict[str, Any]]:
-
-            is_method = _is_likely_method(func)
-
-            # Nothing to sanitize
-            if not args and not kwargs:
-                return args, kwargs
-
-            if isinstance(sanitize_arg, int):
-                idx = sanitize_arg + (1 if is_method else 0)
-                if idx < len(args):
-                    sanitized = deepcopy(args[idx])
-                    sanitized = _sanitize_message(sanitized, session_context, detector)
-                    args = args[(1 if inspect.ismethod(func) else 0):idx] + (sanitized,) + args[idx + 1:]
-            elif isinstance(sanitize_arg, str):
-                if sanitize_arg in kwargs:
-                    sanitized = deepcopy(kwargs[sanitize_arg])
-                    sanitized = _sanitize_message(sanitized, session_context, detector)
-                    kwargs = dict(kwargs)
-                    kwargs[sanitize_arg] = sanitized
-
-            return args, kwargs
-
-        if asyncio.iscoroutinefunction(func):
+        ) -> Tuple[Tuple[Any, ...], Dict[str, Any], Set[str]]:
+            """
+            Sanitizes the selected argument. Also returns the placeholders that may appear
+            in the response: those issued for this call and those already in the input.
+            """
+            issued: Set[str] = set()
+            found, value, replace = select_arg(func, args, kwargs)
+            if not found:
+                return args, kwargs, issued
+            sanitized = _sanitize_message(deepcopy(value), session_context, detector, issued)
+            args, kwargs = replace(sanitized)
+            return args, kwargs, issued
+
+        def prepare_batch(func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]):
+            """
+            For a batch call, copies the inputs and collects the distinct texts to detect
+            in all of them. Returns None if the argument is not a list of inputs.
+            """
+            found, inputs, replace = select_arg(func, args, kwargs)
+            if not found or not isinstance(inputs, (list, tuple)):
+                return None
+            inputs = deepcopy(inputs)
+            collector = CollectingDetector()
+            _collect_texts(inputs, session_context, collector)
+            return inputs, replace, list(collector.texts)
+
+        def detect_batch(texts: List[str]) -> List[List[Any]]:
+            if not texts:
+                return []
+            start = time.perf_counter()
+            results = detector.detect_batch(texts)
+            _trace_stage(session_context, "detect_batch", start)
+            return results
+
+        async def adetect_batch(texts: List[str]) -> List[List[Any]]:
+            if not texts:
+                return []
+            start = time.perf_counter()
+            results = await detector.adetect_batch(texts)
+            _trace_stage(session_context, "detect_batch", start)
+            return results
+
+        def finish_batch(prepared, results: List[List[Any]]):
+            """Sanitizes each input of a batch with the detection results of its texts."""
+            inputs, replace, texts = prepared
+            precomputed = PrecomputedDetector(dict(zip(texts, results)), detector)
+            sanitized, issued_per_input = [], []
+            for item in inputs:
+                issued: Set[str] = set()
+                sanitized.append(_sanitize_message(item, session_context, precomputed, issued))
+                issued_per_input.append(issued)
+            args, kwargs = replace(type(inputs)(sanitized))
+            return args, kwargs, issued_per_input
+
+        def process_batch_response(outputs: Any, issued_per_input: List[Set[str]]) -> Any:
+            # Each output is decoded with the placeholders of its own input.
+            if not isinstance(outputs, list) or len(outputs) != len(issued_per_input):
+                return process_response(outputs, set().union(*issued_per_input))
+            return [output if isinstance(output, BaseException) else process_response(output, issued)
+                    for output, issued in zip(outputs, issued_per_input)]
+
+        def process_response(response: Any, issued: Set[str]) -> Any:
+            # Fast path: no placeholder was issued for or sent with this call, so none can
+            # legitimately come back and the response is returned untouched.
+            if not issued:
+                return response
+            if isinstance(response, (str, dict, list)):
+                return decode_response(response, session_context, issued)
+            # Streams, e.g. `create(stream=True)`, are decoded lazily as they are consumed.
+            if isinstance(response, AsyncIterator):
+                return AsyncDecodedStream(response, _ItemStreamDecoder(session_context, issued))
+            if isinstance(response, Iterator):
+                return DecodedStream(response, _ItemStreamDecoder(session_context, issued))
+            return decode_response(response, session_context, issued)
+
+        async def process_awaitable(awaitable: Awaitable, issued: Set[str]) -> Any:
+            return process_response(await awaitable, issued)
+
+        if batch and inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_batch_wrapper(*args, **kwargs):
+                prepared = prepare_batch(func, args, kwargs)
+                if prepared is None:
+                    args, kwargs, issued = process_args(func, args, kwargs)
+                    return process_response(await func(*args, **kwargs), issued)
+                results = await adetect_batch(prepared[2])
+                args, kwargs, issued_per_input = finish_batch(prepared, results)
+                token = _IN_BATCH.set(batch_scope(func, args, kwargs))
+                try:
+                    outputs = await func(*args, **kwargs)
+                finally:
+                    _IN_BATCH.reset(token)
+                return process_batch_response(outputs, issued_per_input)
+            return async_batch_wrapper
+
+        elif batch:
+            @wraps(func)
+            def batch_wrapper(*args, **kwargs):
+                prepared = prepare_batch(func, args, kwargs)
+                if prepared is None:
+                    args, kwargs, issued = process_args(func, args, kwargs)
+                    return process_response(func(*args, **kwargs), issued)
+                results = detect_batch(prepared[2])
+                args, kwargs, issued_per_input = finish_batch(prepared, results)
+                token = _IN_BATCH.set(batch_scope(func, args, kwargs))
+                try:
+                    outputs = func(*args, **kwargs)
+                finally:
+                    _IN_BATCH.reset(token)
+                return process_batch_response(outputs, issued_per_input)
+            return batch_wrapper
+
+        elif inspect.isasyncgenfunction(func):
+            @wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                if is_batch_reentry(func, args, kwargs):
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    return
+                args, kwargs, issued = process_args(func, args, kwargs)
+                stream = func(*args, **kwargs)
+                try:
+                    if not issued:
+                        async for item in stream:
+                            yield item
+                        return
+                    decoder = _ItemStreamDecoder(session_context, issued)
+                    async for item in stream:
+                        yield decoder.decode(item)
+                    remainder = decoder.finish()
+                    if remainder is not None:
+                        yield remainder
+                finally:
+                    await stream.aclose()
+            return async_gen_wrapper
+
+        elif inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                if is_batch_reentry(func, args, kwargs):
+                    return (yield from func(*args, **kwargs))
+                args, kwargs, issued = process_args(func, args, kwargs)
+                stream = func(*args, **kwargs)
+                if not issued:
+                    return (yield from stream)  # Keeps send() and throw() working
+                decoder = _ItemStreamDecoder(session_context, issued)
+                try:
+                    for item in stream:
+                        yield decoder.decode(item)
+                    remainder = decoder.finish()
+                    if remainder is not None:
+                        yield remainder
+                finally:
+                    stream.close()
+            return gen_wrapper
+
+        elif inspect.iscoroutinefunction(func):
             @wraps(func)
             async def async_wrapper(*args, **kwargs):
-                args, kwargs = process_args(func, args, kwargs)
+                if is_batch_reentry(func, args, kwargs):
+                    return await func(*args, **kwargs)
+                args, kwargs, issued = process_args(func, args, kwargs)
                 response = await func(*args, **kwargs)
-                return _process_response(response, session_context)
+                return process_response(response, issued)
             return async_wrapper
 
         else:
             @wraps(func)
             def sync_wrapper(*args, **kwargs):
-                args, kwargs = process_args(func, args, kwargs)
+                if is_batch_reentry(func, args, kwargs):
+                    return func(*args, **kwargs)
+                args, kwargs, issued = process_args(func, args, kwargs)
                 response = func(*args, **kwargs)
-                return _process_response(response, session_context)
+                if issued and inspect.isawaitable(response):
+                    # E.g. a plain method returning a coroutine or a future.
+                    return process_awaitable(response, issued)
+                return process_response(response, issued)
             return sync_wrapper
 
     return decorator
 
 
+def _collect_texts(inputs: Any, session_context: SessionContext, collector: CollectingDetector):
+    """Runs a sanitization pass that only collects the texts to detect, without tracing it."""
+    if session_context.tracer is None:
+        for item in inputs:
+            _sanitize_message(item, session_context, collector)
+        return
+    from sentinel.tracing import untraced
+    with untraced():
+        for item in inputs:
+            _sanitize_message(item, session_context, collector)
+
+
+def _trace_stage(session_context: SessionContext, stage: str, start: float):
+    """Adds the time since `start` to a stage of the call being traced, if any."""
+    if session_context.tracer is None:
+        return
+    from sentinel.tracing import current_call
+    call = current_call()
+    if call is not None:
+        call.add_stage(stage, time.perf_counter() - start)
+
+
+def _cache_hits(detector: SecretDetector) -> int:
+    cached_detect = getattr(detector, "_cached_detect", None)
+    cache_info = getattr(cached_detect, "cache_info", None)
+    return cache_info().hits if cache_info is not None else 0
+
+
+_START = attrgetter("start")
+
+
+def _encode_spans(
+        text: str,
+        spans: List[Any],
+        session_context: SessionContext,
+        issued: Optional[Set[str]] = None,
+        with_ranges: bool = False
+) -> Tuple[str, List[str], Optional[List[Tuple[int, int, Optional[str]]]]]:
+    """
+    Replaces the detected spans with placeholders. Returns the sanitized text, the
+    secrets that were replaced, in order, and, if `with_ranges`, their (start, end, type)
+    in the text.
+
+    Overlapping spans (e.g. from two patterns matching the same key) are merged and
+    replaced together, so no part of either secret is left in the text.
+    """
+    spans = sorted([span if type(span) is Span else Span.coerce(span) for span in spans], key=_START)
+    parts, secrets, types = [], [], []
+    ranges = [] if with_ranges else None
+    last_idx = run_start = 0
+    for span in spans:
+        start, end = span.start, span.end
+        if start < last_idx:
+            # Overlaps the previous span: extend its secret to replace both together.
+            if end <= last_idx:
+                continue
+            secrets[-1] = text[run_start:end]
+            if with_ranges:
+                ranges[-1] = (run_start, end, types[-1])
+        else:
+            parts.append(text[last_idx:start])
+            parts.append(None)  # The placeholder, once the secret is complete
+            secrets.append(span.secret)
+            types.append(span.type)
+            run_start = start
+            if with_ranges:
+                ranges.append((start, end, span.type))
+        last_idx = end
+    parts.append(text[last_idx:])
+    # Placeholders are created for the merged secrets only.
+    add_secret = session_context.vault.add_secret_and_get_placeholder  # Use Vault to manage placeholders
+    placeholders = [add_secret(secret, secret_type) for secret, secret_type in zip(secrets, types)]
+    parts[1::2] = placeholders
+    if issued is not None:
+        issued.update(placeholders)
+    return "".join(parts), secrets, ranges
+
+
+def _outside_ranges(spans: List[Any], ranges: List[Tuple[int, int]]) -> List[Span]:
+    """The spans that do not overlap any of the sorted, disjoint [start, end) ranges."""
+    starts = [start for start, _ in ranges]
+    kept = []
+    for span in spans:
+        span = Span.coerce(span)
+        i = bisect_left(starts, span.end)  # ranges[:i] start before the span ends
+        if i == 0 or ranges[i - 1][1] <= span.start:
+            kept.append(span)
+    return kept
+
+
 def detect_and_encode_text(
         text: str,
         session_context: SessionContext,
-        detector: SecretDetector
+        detector: SecretDetector,
+        issued: Optional[Set[str]] = None
 ) -> str:
     """
     Uses the provided SecretDetector to find sensitive data in the text
     and replace it with tokens.
+
+    Placeholders the text already contains (e.g. echoed by the model and resent in
+    the conversation history) are masked before detection, so they are never
+    detected again and sanitizing an already sanitized text returns it unchanged.
+    If `issued` is given, the placeholders created for the text, as well as known
+    placeholders the text already contains, are added to it.
     """
-    secrets_info = detector.detect(text)
+    masked, masked_ranges, known = session_context.vault.mask_placeholders(text)
+    if issued is not None:
+        issued.update(known)
+    tracer = session_context.tracer
+    if masked_ranges and masked.isspace():
+        if tracer is not None:
+            tracer.record_text(session_context, text, masked_ranges, [])
+        return text  # Nothing but placeholders: no detection needed
+    if tracer is not None:
+        started = time.perf_counter()
+    instrumentation = session_context.instrumentation
+    if instrumentation.enabled:
+        hits_before = _cache_hits(detector)
+        with instrumentation.timer(STAGE_DETECT):
+            secrets_info = detector.detect(masked)
+        instrumentation.count(CACHE_HITS, _cache_hits(detector) - hits_before)
+    else:
+        secrets_info = detector.detect(masked)
+    if secrets_info and masked_ranges:
+        secrets_info = _outside_ranges(secrets_info, masked_ranges)
+    if tracer is not None:
+        detected = time.perf_counter()
     if not secrets_info:
+        if tracer is not None:
+            tracer.record_text(session_context, text, masked_ranges, [], detected - started)
         return text
 
-    # Sort detected secrets by their start index for proper replacement.
-    secrets_info.sort(key=lambda x: x["start"])
-    sanitized_text = ""
-    last_idx = 0
-    for secret in secrets_info:
-        start, end = secret["start"], secret["end"]
-        sanitized_text += text[last_idx:start]
-        placeholder = session_context.vault.add_secret_and_get_placeholder(secret["secret"])  # Use Vault to manage placeholder
-        sanitized_text += placeholder
-        last_idx = end
-    sanitized_text += text[last_idx:]
+    with instrumentation.timer(STAGE_ENCODE):
+        sanitized_text, secrets, ranges = _encode_spans(
+            text, secrets_info, session_context, issued, with_ranges=bool(session_context.server_url))
+    instrumentation.count(SECRETS_FOUND, len(secrets))
+    if tracer is not None:
+        encoded = time.perf_counter()
 
-    timestamp = datetime.now().isoformat()
-    secrets = [secret["secret"] for secret in secrets_info]
-    session_context.report_to_server(text, secrets, sanitized_text, timestamp)
+    with instrumentation.timer(STAGE_REPORT):
+        timestamp = datetime.now().isoformat()
+        session_context.report_to_server(text, secrets, sanitized_text, timestamp, ranges)
 
+    if tracer is not None:
+        tracer.record_text(session_context, text, masked_ranges, secrets_info, detected - started,
+                           encoded - detected, time.perf_counter() - encoded)
 
-    print(f"============================================"
-          f"\n{len(secrets_info)} Secrets were detected in the LLM prompt."
-          f"\nSanitized Input: {secret['secret']}\n"
-          f"============================================")
+    logger.info("%d secrets were detected in the LLM prompt and sanitized.", len(secrets))
     return sanitized_text
 
 
-def decode_text(text: str, session_context: SessionContext) -> str:
+def decode_text(
+        text: str,
+        session_context: SessionContext,
+        placeholders: Optional[AbstractSet[str]] = None
+) -> str:
     """
     Replace placeholders in the text with the original sensitive data.
+    If `placeholders` is given, only those placeholders are replaced.
     """
-    secret_mapping = session_context.get_secret_mapping()  # Use Vault via SessionContext
-    for placeholder, original in secret_mapping.items():
-        text = text.replace(placeholder, original)
+    instrumentation = session_context.instrumentation
+    if session_context.tracer is not None:
+        start = time.perf_counter()
+        text = _decode_measured(text, session_context, placeholders)
+        _trace_stage(session_context, "decode", start)
+        return text
+    if not instrumentation.enabled:
+        return session_context.vault.decode(text, placeholders)  # Use Vault via SessionContext
+    return _decode_measured(text, session_context, placeholders)
+
+
+def _decode_measured(
+        text: str,
+        session_context: SessionContext,
+        placeholders: Optional[AbstractSet[str]] = None
+) -> str:
+    instrumentation = session_context.instrumentation
+    if not instrumentation.enabled:
+        return session_context.vault.decode(text, placeholders)
+    with instrumentation.timer(STAGE_DECODE):
+        text, decoded = session_context.vault.decode_and_count(text, placeholders)
+    instrumentation.count(PLACEHOLDERS_DECODED, decoded)
     return text
 
 
@@ -0,0 +1,304 @@
+"""
+An OpenAI-compatible sanitizing proxy.
+
+Services point their OpenAI client at the proxy instead of the provider, whatever
+language they are written in. Each `/v1/chat/completions` request is sanitized with its
+own vault, forwarded to the upstream API through a pooled HTTP client, and the secrets
+are restored in the response, including streamed (SSE) responses.
+
+    sentinel proxy --upstream https://api.openai.com --port 8080 --workers 4
+
+Requires `aiohttp` (`pip install prompt-sentinel[proxy]`).
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError as e:  # pragma: no cover
+    raise ImportError("The sentinel proxy requires aiohttp: pip install prompt-sentinel[proxy]") from e
+
+from sentinel.prompt_sentinel import StreamDecoder, decode_response, detect_and_encode_text
+from sentinel.sentinel_detectors import CollectingDetector, PrecomputedDetector, SecretDetector
+from sentinel.session_context import ScopedSessionContext
+from sentinel.tracing import TraceRecorder, untraced
+
+logger = logging.getLogger(__name__)
+
+# Client headers passed on to the upstream API.
+FORWARDED_HEADERS = ("Authorization", "OpenAI-Organization", "OpenAI-Project", "User-Agent")
+
+
+def _text_fields(messages: Any) -> List[Tuple[Dict[str, Any], str]]:
+    """
+    The (container, key) pairs of every text in chat messages that may hold a secret:
+    string contents, text parts of multi-part contents and tool call arguments.
+    """
+    fields = []
+    if not isinstance(messages, list):
+        return fields
+    for message in messages:
+        if not isinstance(message, dict):
+            continue
+        content = message.get("content")
+        if isinstance(content, str):
+            fields.append((message, "content"))
+        elif isinstance(content, list):
+            fields.extend((part, "text") for part in content
+                          if isinstance(part, dict) and isinstance(part.get("text"), str))
+        for tool_call in message.get("tool_calls") or ():
+            function = tool_call.get("function") if isinstance(tool_call, dict) else None
+            if isinstance(function, dict) and isinstance(function.get("arguments"), str):
+                fields.append((function, "arguments"))
+    return fields
+
+
+async def sanitize_chat_request(body: Dict[str, Any], session_context: ScopedSessionContext,
+                                detector: SecretDetector) -> Set[str]:
+    """
+    Sanitizes the messages of a chat completion request in place. The distinct texts
+    of all messages are detected with one `adetect_batch` call. Returns the
+    placeholders that may appear in the response.
+    """
+    fields = _text_fields(body.get("messages"))
+    collector = CollectingDetector()
+    with untraced():
+        for container, key in fields:
+            detect_and_encode_text(container[key], session_context, collector)
+    texts = list(collector.texts)
+    results = await detector.adetect_batch(texts) if texts else []
+    precomputed = PrecomputedDetector(dict(zip(texts, results)), detector)
+    issued: Set[str] = set()
+    for container, key in fields:
+        container[key] = detect_and_encode_text(container[key], session_context, precomputed, issued)
+    return issued
+
+
+class _ChunkDecoder:
+    """
+    Decodes the chunks of a streamed chat completion. Content and tool call arguments
+    arrive in fragments, so each of them is decoded with its own `StreamDecoder`.
+    """
+
+    def __init__(self, session_context: ScopedSessionContext, placeholders: Set[str]):
+        self.session_context = session_context
+        self.placeholders = placeholders
+        self._decoders: Dict[Tuple[int, Any], StreamDecoder] = {}
+
+    def _feed(self, key: Tuple[int, Any], text: str) -> str:
+        decoder = self._decoders.get(key)
+        if decoder is None:
+            decoder = self._decoders[key] = StreamDecoder(self.session_context, self.placeholders)
+        return decoder.feed(text)
+
+    def decode(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        for choice in chunk.get("choices") or ():
+            index = choice.get("index", 0)
+            delta = choice.get("delta")
+            if not isinstance(delta, dict):
+                continue
+            if isinstance(delta.get("content"), str):
+                delta["content"] = self._feed((index, None), delta["content"])
+            for tool_call in delta.get("tool_calls") or ():
+                function = tool_call.get("function") or {}
+                if isinstance(function.get("arguments"), str):
+                    function["arguments"] = self._feed((index, tool_call.get("index", 0)), function["arguments"])
+            if choice.get("finish_reason") is not None:
+                self._flush_into(index, delta)
+        return chunk
+
+    def _flush_into(self, index: int, delta: Dict[str, Any]):
+        """Appends the text held back for a finished choice to its last delta."""
+        for key in [key for key in self._decoders if key[0] == index]:
+            remainder = self._decoders.pop(key).flush()
+            if not remainder:
+                continue
+            if key[1] is None:
+                delta["content"] = (delta.get("content") or "") + remainder
+            else:
+                delta.setdefault("tool_calls", []).append({"index": key[1], "function": {"arguments": remainder}})
+
+    def finish(self, template: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """A final chunk with any text still held back, or None."""
+        if not self._decoders or template is None:
+            return None
+        choices = []
+        for index in sorted({key[0] for key in self._decoders}):
+            delta: Dict[str, Any] = {}
+            self._flush_into(index, delta)
+            if delta:
+                choices.append({"index": index, "delta": delta, "finish_reason": None})
+        return dict(template, choices=choices) if choices else None
+
+
+class SanitizingProxy:
+    """
+    An aiohttp application proxying OpenAI-compatible chat completions.
+
+    Example:
+    -------
+    ```python
+    proxy = SanitizingProxy(RegexSecretDetector(), upstream_url="https://api.openai.com")
+    web.run_app(proxy.build_app(), port=8080)
+    ```
+    """
+
+    def __init__(self, detector: SecretDetector, upstream_url: str, max_concurrency: int = 64,
+                 max_connections: int = 100, timeout: float = 600.0, upstream_api_key: Optional[str] = None,
+                 app_id: str = "sentinel-proxy", server_url: Optional[str] = None,
+                 tracer: Optional[TraceRecorder] = None):
+        """
+        :param detector: The detector sanitizing every request.
+        :param upstream_url: Base URL of the OpenAI-compatible API, e.g. https://api.openai.com
+        :param max_concurrency: Requests handled at once; further requests wait.
+        :param max_connections: Size of the upstream connection pool.
+        :param timeout: Seconds without data from the upstream before a request fails.
+        :param upstream_api_key: If given, replaces the client's Authorization header.
+        :param app_id: App id of the per-request session contexts, used for reporting.
+        :param server_url: Optional Prompt Sentinel server receiving the reports.
+        :param tracer: Optional recorder of a workload trace, one record per request.
+        """
+        self.detector = detector
+        self.upstream_url = upstream_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.upstream_api_key = upstream_api_key
+        self.app_id = app_id
+        self.server_url = server_url
+        self.tracer = tracer
+        self._client: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_get("/health", self.health)
+        app.cleanup_ctx.append(self._client_context)
+        return app
+
+    async def _client_context(self, _app: web.Application):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=self.timeout),
+        )
+        yield
+        await self._client.close()
+
+    async def health(self, _request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    def _upstream_headers(self, request: web.Request) -> Dict[str, str]:
+        headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+        if self.upstream_api_key:
+            headers["Authorization"] = f"Bearer {self.upstream_api_key}"
+        return headers
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        try:
+            body = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return _error(400, "The request body is not valid JSON.")
+        if not isinstance(body, dict) or not isinstance(body.get("messages"), list):
+            return _error(400, "The request must be a JSON object with a 'messages' list.")
+
+        async with self._semaphore:
+            if self.tracer is None:
+                return await self._forward(request, body)
+            with self.tracer.call("proxy", body["messages"]):
+                return await self._forward(request, body)
+
+    async def _forward(self, request: web.Request, body: Dict[str, Any]) -> web.StreamResponse:
+        session_context = ScopedSessionContext(app_id=self.app_id, server_url=self.server_url, tracer=self.tracer)
+        issued = await sanitize_chat_request(body, session_context, self.detector)
+        try:
+            upstream = await self._client.post(f"{self.upstream_url}/v1/chat/completions",
+                                               json=body, headers=self._upstream_headers(request))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Upstream request failed: %s", e)
+            return _error(502, "The upstream API could not be reached.", "upstream_error")
+        async with upstream:
+            if upstream.status != 200 or not body.get("stream"):
+                return await self._respond(upstream, session_context, issued)
+            return await self._respond_stream(request, upstream, session_context, issued)
+
+    async def _respond(self, upstream: aiohttp.ClientResponse, session_context: ScopedSessionContext,
+                       issued: Set[str]) -> web.Response:
+        payload = await upstream.read()
+        if issued and upstream.status == 200:
+            try:
+                data = decode_response(json.loads(payload), session_context, issued)
+                payload = json.dumps(data).encode()
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                logger.warning("Upstream returned a non-JSON chat completion; passing it through.")
+        return web.Response(body=payload, status=upstream.status,
+                            content_type=upstream.content_type or "application/json")
+
+    async def _respond_stream(self, request: web.Request, upstream: aiohttp.ClientResponse,
+                              session_context: ScopedSessionContext, issued: Set[str]) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        decoder = _ChunkDecoder(session_context, issued)
+        last_chunk = None
+        async for line in upstream.content:
+            if not issued or not line.startswith(b"data:"):
+                await response.write(line)
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                final = decoder.finish(last_chunk)
+                if final is not None:
+                    await response.write(b"data: " + json.dumps(final).encode() + b"\n\n")
+                await response.write(line)
+                continue
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                await response.write(line)
+                continue
+            last_chunk = {key: value for key, value in chunk.items() if key != "choices"}
+            await response.write(b"data: " + json.dumps(decoder.decode(chunk)).encode() + b"\n")
+        await response.write_eof()
+        return response
+
+
+def _error(status: int, message: str, error_type: str = "invalid_request_error") -> web.Response:
+    return web.json_response({"error": {"message": message, "type": error_type}}, status=status)
+
+
+def _serve_worker(detector_factory: Callable[[], SecretDetector], upstream_url: str, host: str, port: int,
+                  reuse_port: bool, options: Dict[str, Any]):
+    proxy = SanitizingProxy(detector_factory(), upstream_url, **options)
+    web.run_app(proxy.build_app(), host=host, port=port, reuse_port=reuse_port, print=None)
+
+
+def serve(detector_factory: Callable[[], SecretDetector], upstream_url: str, host: str = "127.0.0.1",
+          port: int = 8080, workers: int = 1, **options):
+    """
+    Runs the proxy until interrupted.
+
+    :param detector_factory: Picklable callable building the detector; called once per worker.
+    :param upstream_url: Base URL of the OpenAI-compatible API.
+    :param workers: Number of worker processes sharing the port (SO_REUSEPORT).
+    :param options: Further `SanitizingProxy` arguments, e.g. `max_concurrency`.
+    """
+    logger.info("Proxying %s on http://%s:%d with %d worker(s)", upstream_url, host, port, workers)
+    if workers <= 1:
+        _serve_worker(detector_factory, upstream_url, host, port, False, options)
+        return
+    processes = [multiprocessing.Process(target=_serve_worker, daemon=True,
+                                         args=(detector_factory, upstream_url, host, port, True, options))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
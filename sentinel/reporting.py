@@ -0,0 +1,306 @@
+"""
+Sampled detection reports, sent in the background, optionally compact and batched.
+
+By default each report is POSTed on its own to ``{server_url}/api/report`` as a JSON
+object with the ``app_id``, ``session_id``, ``prompt``, ``secrets``, ``sanitized_output``
+and ``timestamp`` of the detection, as Prompt Sentinel servers have always received them.
+
+With `batched=True`, a report describes a detection without its text: the keyed hashes,
+types and offsets of the secrets, and the length and keyed digest of the prompt, so the
+server never sees the secrets. Sending the prompt and the sanitized output is an
+explicit opt-in (`full_text=True`). A batch is a POST of a JSON array of such reports to
+``{server_url}/api/reports``, with a ``Content-Encoding`` of ``gzip`` (the default),
+``zstd`` or none. The server must support this endpoint.
+
+Either way, reports are queued and sent from a background thread, so reporting never
+blocks the LLM call.
+"""
+import atexit
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+REPORT_ENDPOINT = "/api/report"  # One full report per request
+REPORTS_ENDPOINT = "/api/reports"  # Batches of compact reports
+HASH_KEY_ENV = "PS_REPORT_HASH_KEY"
+
+_STOP = object()
+
+
+def secret_hash(secret: str, key: bytes) -> str:
+    """
+    The hash identifying a secret in reports: an HMAC-SHA-256 prefix keyed with a key that
+    is never sent, so short secrets such as PINs cannot be recovered from the reports by
+    hashing candidates.
+    """
+    return hmac.new(key, secret.encode("utf-8", "surrogatepass"), hashlib.sha256).hexdigest()[:16]
+
+
+def text_digest(text: str, key: bytes) -> str:
+    return hmac.new(key, text.encode("utf-8", "surrogatepass"), hashlib.sha256).hexdigest()[:32]
+
+
+def _zstd_compressor() -> Callable[[bytes], bytes]:
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd.compress
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compression requires zstandard: pip install prompt-sentinel[zstd]") from e
+    return zstandard.ZstdCompressor().compress
+
+
+class Reporter:
+    """
+    Sends reports of detections to a Prompt Sentinel server from a background thread: one
+    by one by default, or compact and in compressed batches with `batched=True`.
+
+    Session contexts with a `server_url` report through a reporter shared by all contexts
+    with that URL (see `shared_reporter`), unless they are given one.
+
+    Example:
+    -------
+    ```python
+    reporter = Reporter("https://sentinel.example.com", batched=True, sample_rate=0.1,
+                        type_sample_rates={"aws_api_key": 1.0})
+    session = SessionContext(app_id="my-app", server_url=reporter.server_url, reporter=reporter)
+    ```
+    """
+
+    def __init__(self, server_url: str, batched: bool = False, full_text: bool = False, sample_rate: float = 1.0,
+                 type_sample_rates: Optional[Dict[str, float]] = None, batch_size: int = 100,
+                 flush_interval: float = 1.0, compression: Optional[str] = "gzip", max_queue: int = 10_000,
+                 timeout: float = 10.0, hash_key: Optional[bytes] = None):
+        """
+        :param server_url: Base URL of the Prompt Sentinel server.
+        :param batched: Send compact reports in compressed batches to the server's
+                        `/api/reports` endpoint, instead of full reports one by one to
+                        `/api/report`. `full_text`, `batch_size`, `flush_interval` and
+                        `compression` apply to batched reports only.
+        :param full_text: Also send the prompt, with its secrets, and the sanitized output.
+        :param sample_rate: Fraction of detections reported.
+        :param type_sample_rates: Fractions for specific secret types, overriding `sample_rate`.
+                                  A detection is reported if one of its types is sampled.
+        :param batch_size: Reports per request at most.
+        :param flush_interval: Seconds a report waits for a batch to fill before it is sent.
+        :param compression: "gzip", "zstd" (requires Python 3.14 or zstandard) or None.
+        :param max_queue: Reports waiting to be sent at most; further reports are dropped.
+        :param timeout: Seconds per request to the server.
+        :param hash_key: Key of the secret hashes and prompt digests; it is never sent. Defaults
+                         to the `PS_REPORT_HASH_KEY` environment variable, so hashes match across
+                         the processes of a deployment, or else to a random key per reporter.
+        """
+        if compression not in ("gzip", "zstd", None):
+            raise ValueError(f"Unsupported compression {compression!r}; use 'gzip', 'zstd' or None.")
+        self.server_url = server_url.rstrip("/")
+        self.batched = batched
+        self.full_text = full_text
+        self.sample_rate = sample_rate
+        self.type_sample_rates = dict(type_sample_rates or {})
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compression = compression
+        self.timeout = timeout
+        if hash_key is None:
+            hash_key = os.environ.get(HASH_KEY_ENV, "").encode() or os.urandom(32)
+        self.hash_key = hash_key
+        self._compress: Optional[Callable[[bytes], bytes]] = (
+            gzip.compress if compression == "gzip" else _zstd_compressor() if compression == "zstd" else None)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        # Counters, for monitoring the reporter itself.
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        atexit.register(self.close)
+
+    def _rate(self, types: Sequence[Optional[str]]) -> float:
+        if not self.type_sample_rates:
+            return self.sample_rate
+        return max((self.type_sample_rates.get(t, self.sample_rate) for t in types), default=self.sample_rate)
+
+    def _sampled(self, digest: str, types: Sequence[Optional[str]]) -> bool:
+        rate = self._rate(types)
+        if rate >= 1.0:
+            return True
+        # Sampled by digest, so the same prompt is either always or never reported.
+        return int(digest[:8], 16) / 0x100000000 < rate
+
+    def build_report(self, app_id: str, session_id: str, prompt: str, secrets: Sequence[str],
+                     sanitized_output: str, timestamp: str,
+                     spans: Optional[Sequence[Tuple[int, int, Optional[str]]]] = None) -> Dict[str, Any]:
+        """The report of one detection. `spans` are the (start, end, type) of each secret."""
+        if not self.batched:
+            return {
+                "app_id": app_id,
+                "session_id": session_id,
+                "prompt": prompt,
+                "secrets": list(secrets),
+                "sanitized_output": sanitized_output,
+                "timestamp": timestamp,
+            }
+        entries = []
+        for i, secret in enumerate(secrets):
+            entry: Dict[str, Any] = {"hash": secret_hash(secret, self.hash_key)}
+            if spans is not None and i < len(spans):
+                entry["start"], entry["end"], entry["type"] = spans[i]
+            entries.append(entry)
+        report = {
+            "app_id": app_id,
+            "session_id": session_id,
+            "timestamp": timestamp,
+            "length": len(prompt),
+            "digest": text_digest(prompt, self.hash_key),
+            "secrets": entries,
+        }
+        if self.full_text:
+            report["prompt"] = prompt
+            report["sanitized_output"] = sanitized_output
+        return report
+
+    def report(self, app_id: str, session_id: str, prompt: str, secrets: Sequence[str], sanitized_output: str,
+               timestamp: str, spans: Optional[Sequence[Tuple[int, int, Optional[str]]]] = None) -> bool:
+        """Queues the report of a detection. Returns False if it was sampled out or dropped."""
+        types = [secret_type for _, _, secret_type in spans or ()]
+        if not self._sampled(text_digest(prompt, self.hash_key), types):
+            self.sampled_out += 1
+            return False
+        report = self.build_report(app_id, session_id, prompt, secrets, sanitized_output, timestamp, spans)
+        if self._closed:
+            self.dropped += 1
+            return False
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(report)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1:
+                logger.warning("The report queue for %s is full; reports are being dropped.", self.server_url)
+            return False
+        return True
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="sentinel-reporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch: List[Dict[str, Any]] = []
+        deadline = 0.0
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()) if batch else None)
+            except queue.Empty:
+                item = None
+            if item is _STOP or isinstance(item, threading.Event):
+                self._send(batch)
+                batch = []
+                if item is _STOP:
+                    return
+                item.set()
+                continue
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if self.batched and len(batch) < self.batch_size:
+                    continue
+            self._send(batch)
+            batch = []
+
+    def encode_batch(self, batch: List[Dict[str, Any]]) -> Tuple[bytes, Dict[str, str]]:
+        """The request body and headers of a batch."""
+        body = json.dumps(batch, separators=(",", ":")).encode()
+        headers = {"Content-Type": "application/json"}
+        if self._compress is not None:
+            body = self._compress(body)
+            headers["Content-Encoding"] = self.compression
+        return body, headers
+
+    def _send(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        if not self.batched:
+            for report in batch:
+                self._post(REPORT_ENDPOINT, json.dumps(report).encode(), {"Content-Type": "application/json"}, 1)
+            return
+        body, headers = self.encode_batch(batch)
+        self._post(REPORTS_ENDPOINT, body, headers, len(batch))
+
+    def _post(self, endpoint: str, body: bytes, headers: Dict[str, str], reports: int):
+        url = self.server_url + endpoint
+        try:
+            import requests  # Imported lazily; only needed once reporting is enabled
+            response = requests.post(url, data=body, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception:
+            self.failed += reports
+            logger.warning("Could not send %d reports to the server at %s", reports, url, exc_info=True)
+            return
+        self.sent += reports
+        self.requests += 1
+        self.bytes_sent += len(body)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Sends the queued reports now. Returns False if they were not sent within `timeout`."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)  # Waits for room if the queue is full
+        except queue.Full:
+            return False
+        return done.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def close(self, timeout: float = 5.0):
+        """Sends the queued reports and stops the background thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        if self._thread is not None and self._thread.is_alive():
+            deadline = time.monotonic() + timeout
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                logger.warning("Could not send the queued reports to %s within %ss; they are dropped.",
+                               self.server_url, timeout)
+                return
+            self._thread.join(max(0.0, deadline - time.monotonic()))
+
+
+_shared: Dict[str, Reporter] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_reporter(server_url: str) -> Reporter:
+    """The reporter with default settings shared by the session contexts reporting to `server_url`."""
+    reporter = _shared.get(server_url)
+    if reporter is None:
+        with _shared_lock:
+            reporter = _shared.get(server_url)
+            if reporter is None:
+                reporter = _shared[server_url] = Reporter(server_url)
+    return reporter
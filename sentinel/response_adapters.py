@@ -0,0 +1,134 @@
+"""
+Adapters that decode placeholders in response objects of LLM SDKs and frameworks.
+
+`decode_response` decodes strings, lists and dicts itself. For any other object it
+looks up an adapter by the object's type, walking its MRO, so an adapter registered for
+a base class also handles its subclasses. An adapter visits only the fields that can
+carry model text, and returns the very same object when nothing in it was decoded, or
+a shallow copy with the decoded fields otherwise. The response is never modified.
+
+Adapters can be registered by class, or by the qualified name of a class
+(``"package.module.Class"``) so that a library is never imported just to register one.
+Built-in adapters cover OpenAI SDK responses, LangChain messages, and Pydantic models
+in general. Other objects fall back to their public instance attributes.
+"""
+from copy import copy
+from typing import Any, Callable, Dict, Optional, Union
+
+# An adapter is called with the object and a function decoding any value in it, and
+# returns the decoded object.
+ResponseAdapter = Callable[[Any, Callable[[Any], Any]], Any]
+
+_BY_TYPE: Dict[type, ResponseAdapter] = {}
+_BY_NAME: Dict[str, ResponseAdapter] = {}
+# Resolved adapters per concrete type; None when the object is returned as is.
+_RESOLVED: Dict[type, Optional[ResponseAdapter]] = {}
+
+
+def register_response_adapter(cls: Union[type, str], adapter: ResponseAdapter):
+    """
+    Registers `adapter` for `cls` and its subclasses, replacing any adapter registered for
+    it before. `cls` is a class or its qualified name, e.g. "openai.types.completion.Completion".
+    """
+    if isinstance(cls, str):
+        _BY_NAME[cls] = adapter
+    else:
+        _BY_TYPE[cls] = adapter
+    _RESOLVED.clear()
+
+
+def adapter_for(cls: type) -> Optional[ResponseAdapter]:
+    """The adapter for objects of type `cls`: that of its nearest registered base class."""
+    try:
+        return _RESOLVED[cls]
+    except KeyError:
+        pass
+    adapter = None
+    for base in cls.__mro__:
+        adapter = _BY_TYPE.get(base) or _BY_NAME.get(f"{base.__module__}.{base.__qualname__}")
+        if adapter is not None:
+            break
+    _RESOLVED[cls] = adapter
+    return adapter
+
+
+def replace_fields(obj: Any, update: Dict[str, Any]) -> Any:
+    """A shallow copy of `obj` with the attributes in `update` replaced."""
+    for copy_method in ("model_copy", "copy"):  # Pydantic v2 / v1 (e.g. LangChain messages)
+        method = getattr(obj, copy_method, None)
+        if method is not None:
+            try:
+                return method(update=update)
+            except TypeError:
+                continue
+    obj = copy(obj)
+    obj.__dict__.update(update)  # Also works for frozen dataclasses
+    return obj
+
+
+def _decode_fields(obj: Any, fields, decode: Callable[[Any], Any]) -> Any:
+    update = {}
+    for field in fields:
+        value = getattr(obj, field, None)
+        if value is None or isinstance(value, (int, float)):
+            continue
+        decoded = decode(value)
+        # Lists and dicts are always rebuilt, so compare them by value.
+        if decoded is not value and decoded != value:
+            update[field] = decoded
+    return replace_fields(obj, update) if update else obj
+
+
+def fields_adapter(*fields: str) -> ResponseAdapter:
+    """An adapter decoding only the given attributes of an object."""
+    return lambda obj, decode: _decode_fields(obj, fields, decode)
+
+
+def _pydantic_adapter(obj: Any, decode: Callable[[Any], Any]) -> Any:
+    cls = type(obj)
+    fields = getattr(cls, "model_fields", None)  # Pydantic v2; v1 has `__fields__`
+    return _decode_fields(obj, fields if fields is not None else cls.__fields__, decode)
+
+
+def _object_adapter(obj: Any, decode: Callable[[Any], Any]) -> Any:
+    # Private attributes hold clients, caches and other internals, not model text.
+    attributes = getattr(obj, "__dict__", None)
+    if not attributes:
+        return obj
+    return _decode_fields(obj, [name for name in attributes if not name.startswith("_")], decode)
+
+
+_MESSAGE_FIELDS = ("content", "refusal", "tool_calls", "function_call")
+
+_BUILTIN_ADAPTERS = {
+    # OpenAI SDK (openai>=1.0): chat completions, their chunks, and legacy completions.
+    "openai.types.chat.chat_completion.ChatCompletion": fields_adapter("choices"),
+    "openai.types.chat.chat_completion.Choice": fields_adapter("message"),
+    "openai.types.chat.chat_completion_message.ChatCompletionMessage": fields_adapter(*_MESSAGE_FIELDS),
+    "openai.types.chat.chat_completion_message.FunctionCall": fields_adapter("arguments"),
+    "openai.types.chat.chat_completion_message_tool_call.ChatCompletionMessageToolCall": fields_adapter("function"),
+    "openai.types.chat.chat_completion_message_tool_call.Function": fields_adapter("arguments"),
+    "openai.types.chat.chat_completion_message_function_tool_call.ChatCompletionMessageFunctionToolCall":
+        fields_adapter("function"),
+    "openai.types.chat.chat_completion_message_function_tool_call.Function": fields_adapter("arguments"),
+    "openai.types.chat.chat_completion_chunk.ChatCompletionChunk": fields_adapter("choices"),
+    "openai.types.chat.chat_completion_chunk.Choice": fields_adapter("delta"),
+    "openai.types.chat.chat_completion_chunk.ChoiceDelta": fields_adapter(*_MESSAGE_FIELDS),
+    "openai.types.chat.chat_completion_chunk.ChoiceDeltaFunctionCall": fields_adapter("arguments"),
+    "openai.types.chat.chat_completion_chunk.ChoiceDeltaToolCall": fields_adapter("function"),
+    "openai.types.chat.chat_completion_chunk.ChoiceDeltaToolCallFunction": fields_adapter("arguments"),
+    "openai.types.completion.Completion": fields_adapter("choices"),
+    "openai.types.completion_choice.CompletionChoice": fields_adapter("text"),
+    # LangChain messages and message chunks; usage metadata holds only token counts.
+    "langchain_core.messages.base.BaseMessage": fields_adapter(
+        "content", "additional_kwargs", "response_metadata", "tool_calls", "invalid_tool_calls",
+        "tool_call_chunks"),
+    "langchain.schema.messages.BaseMessage": fields_adapter("content", "additional_kwargs"),
+    # Any other Pydantic model: its declared fields.
+    "pydantic.main.BaseModel": _pydantic_adapter,
+    "pydantic.v1.main.BaseModel": _pydantic_adapter,
+}
+
+for _name, _adapter in _BUILTIN_ADAPTERS.items():
+    register_response_adapter(_name, _adapter)
+register_response_adapter(object, _object_adapter)
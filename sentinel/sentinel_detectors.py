@@ -1,45 +1,84 @@
 import re
-import yaml
 import json
+import logging
 import os
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Union, Callable
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Sequence, Union, Callable
 from functools import lru_cache
+from sentinel.singleflight import CoalescedTimeout, SingleFlight
+from sentinel.spans import Span
 from sentinel.utils import extract_secrets_json
 
+if TYPE_CHECKING:
+    from sentinel.pattern_pack import PatternPack
 
-def find_secret_positions(text: str, secrets: List[str]) -> List[Dict]:
+logger = logging.getLogger(__name__)
+
+
+def find_secret_positions(text: str, secrets: List[str]) -> List[Span]:
     """
-    For each secret string, uses regex to find all occurrences in the text.
-    Returns a list of dictionaries with keys "secret", "start", and "end".
+    Finds all non-overlapping occurrences of each secret string in the text.
+    Returns a list of `Span` objects (readable like dicts with keys "secret", "start" and "end").
     """
     results = []
     for secret in secrets:
-        # Escape the secret to safely use in regex
-        pattern = re.escape(secret)
-        for match in re.finditer(pattern, text):
-            results.append({
-                "secret": secret,
-                "start": match.start(),
-                "end": match.end()
-            })
+        if not secret:
+            continue
+        # A plain substring search; equivalent to re.finditer(re.escape(secret)) but faster.
+        length = len(secret)
+        start = text.find(secret)
+        while start != -1:
+            results.append(Span(secret, start, start + length))
+            start = text.find(secret, start + length)
     return results
 
 
 # Base class for secret detectors.
 class SecretDetector(ABC):
     @abstractmethod
-    def detect(self, text: str) -> List[Dict]:
+    def detect(self, text: str) -> List[Span]:
         """
         Detect sensitive secrets in the text.
 
-        Should return a list of dictionaries with keys:
-          - "secret": the detected secret text
-          - "start": the start index of the secret in text
-          - "end": the end index of the secret in text
+        Should return a list of `Span` objects with:
+          - secret: the detected secret text
+          - start: the start index of the secret in text
+          - end: the end index of the secret in text
+          - type: optionally, the kind of secret
+
+        Dictionaries with the keys "secret", "start", "end" and optionally "type"
+        are accepted as well.
         """
         pass
 
+    async def adetect(self, text: str) -> List[Span]:
+        """
+        Async variant of `detect`. By default, runs `detect` in the event loop's
+        default executor so slow detectors do not block the loop.
+        """
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, self.detect, text)
+
+    def detect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        """
+        Detect secrets in many texts; returns one list of spans per text. Detectors
+        with a batched or concurrent path override this.
+        """
+        return [self.detect(text) for text in texts]
+
+    async def adetect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        """Async variant of `detect_batch`. By default, runs `adetect` for all texts concurrently."""
+        import asyncio
+        return list(await asyncio.gather(*(self.adetect(text) for text in texts)))
+
+
+class FallbackResult(list):
+    """
+    Spans returned by a fallback path, e.g. after the trusted LLM failed. They are not a
+    definitive answer, so caches must not remember them (in particular, an empty
+    `FallbackResult` does not mean the text is clean).
+    """
+
 
 class TrustableLLM(ABC):
     @abstractmethod
@@ -52,7 +91,7 @@ DEFAULT_PROMPT_TEMPLATE = (
     "Analyze the following text and extract only those pieces of information that are sensitive or private. "
     "Sensitive data includes API keys, passwords, tokens, sensitive personal information or any other information that could compromise security or safety if exposed. "
     "Do not include any data that is not sensitive. "
-    "Do not extract already obfuscated tokens which follow the template '__SECRET_X__' (for example, '__SECRET_3__'). "
+    "Do not extract already obfuscated tokens which follow the template '__SECRET_<TYPE>_<hash>__' (for example, '__SECRET_AWS_3f2a91c0a37__'). "
     "Return the result as a structured JSON output with the following schema: {{\"secrets\": [string, ...]}}.\n\n"
     "Text: ''' {text} '''"
 )
@@ -61,44 +100,95 @@ DEFAULT_PROMPT_TEMPLATE = (
 class LLMSecretDetector(SecretDetector):
     def __init__(self,
                  trustable_llm,
-                 prompt_format: Union[str, Callable[[str], str]] = DEFAULT_PROMPT_TEMPLATE
+                 prompt_format: Union[str, Callable[[str], str]] = DEFAULT_PROMPT_TEMPLATE,
+                 fallback_detector: Optional[SecretDetector] = None,
+                 coalesce_timeout: Optional[float] = None,
+                 batch_concurrency: int = 8
     ):
         """
-        :param trustable_llm: An object with a method `predict(text: str) -> str`
+        :param trustable_llm: An object with a method `predict(text: str) -> str`.
+                              Wrap it in `ResilientTrustableLLM` for timeouts, retries,
+                              hedging and circuit breaking.
         :param prompt_format: Either a string template with a '{text}' placeholder,
                               or a function that takes `text` and returns a prompt.
+        :param fallback_detector: Optional detector (e.g. `RegexSecretDetector`) used when
+                                  the LLM call or the parsing of its answer fails.
+        :param coalesce_timeout: How long a caller waits for an identical in-flight detection
+                                 started by another thread or task before falling back.
+        :param batch_concurrency: Maximum number of concurrent LLM calls in `detect_batch`
+                                  and `adetect_batch`.
         """
         self.trustable_llm = trustable_llm
         self._cached_detect = self._build_cached_detect()
         self.prompt = prompt_format
+        self.fallback_detector = fallback_detector
+        self.coalesce_timeout = coalesce_timeout
+        self.batch_concurrency = batch_concurrency
+        # Concurrent misses for the same text share one LLM call instead of each firing one.
+        self._flight = SingleFlight()
+
+    def _format_prompt(self, text: str) -> str:
+        if callable(self.prompt):
+            return self.prompt(text)
+        return self.prompt.format(text=text)
 
     def _build_cached_detect(self):
+        # Failures raise out of the cached function, and lru_cache never caches exceptions,
+        # so a timeout or a malformed answer is retried instead of remembered as "no secrets".
         @lru_cache(maxsize=128)
-        def _detect(text: str) -> List[Dict[str, Any]]:
-
-            formatted_prompt = self.prompt.format(text=text)
-            try:
-                response_text = self.trustable_llm.predict(formatted_prompt)
-            except Exception as e:
-                print(f"Error calling LLM: {e}")
-                return []
-
-            try:
-                json_dict = extract_secrets_json(response_text)
-                secret_list = json_dict['secrets']
-                if not isinstance(secret_list, list):
-                    print("LLM did not return a list. Response:", response_text)
-                    return []
-            except json.JSONDecodeError:
-                print("Failed to decode LLM response as JSON. Response:", response_text)
-                return []
-
+        def _detect(text: str) -> List[Span]:
+            response_text = self.trustable_llm.predict(self._format_prompt(text))
+            secret_list = extract_secrets_json(response_text, strict=True)['secrets']
             return find_secret_positions(text, secret_list)
 
         return _detect
 
-    def detect(self, text: str) -> List[Dict[str, Any]]:
-        return self._cached_detect(text)
+    def detect(self, text: str) -> List[Span]:
+        try:
+            return self._flight.do(text, self._cached_detect, text, timeout=self.coalesce_timeout)
+        except CoalescedTimeout:
+            logger.warning("Timed out after %ss waiting for the same text's detection in another thread; "
+                           "using the fallback detector.", self.coalesce_timeout)
+        except json.JSONDecodeError:
+            logger.warning("Failed to decode the trusted LLM response as JSON.")
+        except Exception as e:
+            logger.error("Error calling the trusted LLM: %s", e)
+        return self._fallback(text)
+
+    async def adetect(self, text: str) -> List[Span]:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            return await self._flight.ado(
+                text, loop.run_in_executor, None, self.detect, text, timeout=self.coalesce_timeout
+            )
+        except CoalescedTimeout:
+            logger.warning("Timed out after %ss waiting for the same text's detection in another task; "
+                           "using the fallback detector.", self.coalesce_timeout)
+        return self._fallback(text)
+
+    def detect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        # One LLM call per text, `batch_concurrency` at a time.
+        if len(texts) <= 1 or self.batch_concurrency <= 1:
+            return [self.detect(text) for text in texts]
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(self.batch_concurrency, len(texts))) as pool:
+            return list(pool.map(self.detect, texts))
+
+    async def adetect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        import asyncio
+        semaphore = asyncio.Semaphore(max(1, self.batch_concurrency))
+
+        async def _detect(text: str) -> List[Span]:
+            async with semaphore:
+                return await self.adetect(text)
+
+        return list(await asyncio.gather(*(_detect(text) for text in texts)))
+
+    def _fallback(self, text: str) -> List[Span]:
+        if self.fallback_detector is not None:
+            return FallbackResult(self.fallback_detector.detect(text))
+        return FallbackResult()
 
     def report_cache(self):
         return self._cached_detect.cache_info()
@@ -123,7 +213,7 @@ class PythonStringDataDetector(SecretDetector):
         """
         from pkgs.high_entropy_strings import PythonStringData
         @lru_cache(maxsize=128)
-        def _detect(text: str) -> List[Dict]:
+        def _detect(text: str) -> List[Span]:
             results = []
             # Tokenize the text using a simple regex.
             for match in re.finditer(r'\b\S+\b', text):
@@ -137,146 +227,169 @@ class PythonStringDataDetector(SecretDetector):
                 # Decide if the token qualifies as a secret.
                 # Here we flag the token if either its confidence or severity is above threshold.
                 if psd.confidence >= self.confidence_threshold or psd.severity >= self.severity_threshold:
-                    results.append({
-                        "secret": token,
-                        "start": match.start(),
-                        "end": match.end()
-                    })
+                    results.append(Span(token, match.start(), match.end()))
             return results
 
         return _detect
 
-    def detect(self, text: str) -> List[Dict]:
+    def detect(self, text: str) -> List[Span]:
         """
         Uses the cached detection function to get the list of potential secrets.
-        Each detected secret is a dict with keys: "secret", "start", and "end".
+        Each detected secret is a `Span`.
         """
         return self._cached_detect(text)
 
     def report_cache(self):
         """
-        Prints and returns the cache info and, if possible, the cached items.
+        Logs and returns the cache info and, if possible (at DEBUG level), the cached items.
         Note: Accessing the internal cache is relying on CPython internals.
         """
         # Print cache statistics.
         cache_info = self._cached_detect.cache_info()
-        print("Cache info:", cache_info)
+        logger.info("Cache info: %s", cache_info)
         # Try to inspect the raw cache.
         try:
             cache = self._cached_detect.cache
-            print("Cached items:", dict(cache))
+            logger.debug("Cached items: %s", dict(cache))
         except AttributeError:
-            print("Direct cache inspection not supported on this Python version.")
+            logger.debug("Direct cache inspection not supported on this Python version.")
         return cache_info
 
 
 class RegexSecretDetector(SecretDetector):
-    def __init__(self, yaml_path: Optional[str] = None, yaml_string: Optional[str] = None):
+    def __init__(self, yaml_path: Optional[str] = None, yaml_string: Optional[str] = None,
+                 pack: Optional["PatternPack"] = None):
         """
-        :param yaml_path: Optional path to YAML file with secret type regex patterns
+        :param yaml_path: Optional path to YAML file with secret type regex patterns,
+                          or to a JSON pattern pack written by `PatternPack.save`
         :param yaml_string: Optional YAML string with secret type regex patterns
+        :param pack: Optional `PatternPack`
+
+        Pattern sets are parsed, validated and compiled once per process: detectors
+        built from the same patterns share the compiled pack.
         """
-        if yaml_string:
-            pattern_config = self._load_patterns_from_yaml_string(yaml_string)
-        elif yaml_path:
-            pattern_config = self._load_patterns_from_yaml(yaml_path)
-        else:
-            current_dir = os.path.dirname(__file__)
-            default_yaml_path = os.path.join(current_dir, 'basic_secret_patterns.yaml')
-            pattern_config = self._load_patterns_from_yaml(default_yaml_path)
-
-        self.patterns = {key: re.compile(pattern) for key, pattern in pattern_config.items()}
-
-
-    def _load_patterns_from_yaml_string(self, yaml_string: str) -> dict:
-        """Load regex patterns from a YAML string."""
-        return yaml.safe_load(yaml_string)
-
-    @staticmethod
-    def _load_patterns_from_yaml(path: str) -> Dict[str, str]:
-        with open(path, "r") as f:
-            data = yaml.safe_load(f)
-        if not isinstance(data, dict):
-            raise ValueError("YAML file must contain a dictionary mapping secret types to regex strings.")
-        return data
-
-    def detect(self, text: str) -> List[Dict]:
+        from sentinel.pattern_pack import PatternPack
+
+        if pack is None:
+            if yaml_string:
+                pack = PatternPack.from_yaml_string(yaml_string)
+            elif yaml_path:
+                pack = PatternPack.load(yaml_path)
+            else:
+                current_dir = os.path.dirname(__file__)
+                pack = PatternPack.from_yaml_file(os.path.join(current_dir, 'basic_secret_patterns.yaml'))
+
+        self._compiled = pack.compile()
+        self.pack = pack
+        self.patterns = self._compiled.patterns
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash of the pattern set; equal for detectors with the same patterns."""
+        return self._compiled.fingerprint
+
+    def detect(self, text: str) -> List[Span]:
         detected = []
-        for secret_type, pattern in self.patterns.items():
-            for match in pattern.finditer(text):
-                detected.append({
-                    "secret": match.group(),
-                    "start": match.start(),
-                    "end": match.end(),
-                    "type": secret_type
-                })
+        # Large pattern sets are prefiltered: patterns whose literal prefixes do not occur
+        # in the text are skipped.
+        for secret_type, pattern, _ in self._compiled.active_entries(text):
+            detected.extend(Span(match.group(), match.start(), match.end(), secret_type)
+                            for match in pattern.finditer(text))
         return detected
 
 
 class DummyDetector(SecretDetector):
-    def detect(self, text: str) -> List[Dict]:
+    def detect(self, text: str) -> List[Span]:
         """
         A dummy detector that does nothing and returns an empty list.
         """
         return []
 
 
-try:
-    from langchain.output_parsers import ResponseSchema, StructuredOutputParser
-
-    class LangchainLLMSecretDetector(SecretDetector):
-        def __init__(self, trustable_llm):
-            """
-            :param trustable_llm: An object with a method `chat(messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str`
-            """
-            self.trustable_llm = trustable_llm
-            self._cached_detect = self._build_cached_detect()
-            response_schemas = [
-                ResponseSchema(name="secrets", description="A list of sensitive or private data extracted from the text")
-            ]
-            self.output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
-
-        def _build_cached_detect(self):
-            @lru_cache(maxsize=128)
-            def _detect(text: str) -> List[Dict]:
-                prompt = (
-                    "Analyze the following text and extract only those pieces of information that are sensitive or private. "
-                    "Sensitive data includes API keys, passwords, tokens, sensitive personal information or any other information that could compromise security or safety if exposed. "
-                    "Do not include any data that is not sensitive. "
-                    "Do not extract already obfuscated tokens which follow the template '__SECRET_X__' (for example, '__SECRET_3__'). "
-                    "Return the result as a structured JSON output with the following schema: {\"secrets\": [string, ...]}.\n\n"
-                    f"{self.output_parser.get_format_instructions()}\n\n"
-                    f"Text: '''{text}'''"
-                )
+class CollectingDetector(SecretDetector):
+    """
+    Records the texts a sanitization pass would detect, without detecting anything. Used
+    with `PrecomputedDetector` to detect all the texts of a request in one batch.
+    """
 
-                try:
-                    response_text = self.trustable_llm.predict(
-                        text=prompt,
-                    )
-                except Exception as e:
-                    print(f"Error calling LLM: {e}")
-                    return []
+    def __init__(self):
+        self.texts: Dict[str, None] = {}  # Insertion-ordered set
 
-                try:
-                    parsed_output = self.output_parser.parse(str(response_text))
-                    secret_list = parsed_output.get("secrets", [])
-                    # secret_list = parse_json_output(response_text)
-                    if not isinstance(secret_list, list):
-                        print("LLM did not return a list. Response:", response_text)
-                        return []
-                except json.JSONDecodeError:
-                    print("Failed to decode LLM response as JSON. Response:", response_text)
-                    return []
+    def detect(self, text: str) -> List[Span]:
+        self.texts[text] = None
+        return []
+
+
+class PrecomputedDetector(SecretDetector):
+    """
+    Serves detection results computed in advance, e.g. by one `detect_batch` call, and
+    falls back to `detector` for any other text.
+    """
+
+    def __init__(self, results: Dict[str, List[Any]], detector: SecretDetector):
+        self.results = results
+        self.detector = detector
+
+    def detect(self, text: str) -> List[Any]:
+        spans = self.results.get(text)
+        return self.detector.detect(text) if spans is None else spans
+
+
+class LangchainLLMSecretDetector(SecretDetector):
+    def __init__(self, trustable_llm):
+        """
+        :param trustable_llm: An object with a method `chat(messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str`
+
+        LangChain is imported here rather than at module import time, so the
+        dependency is only paid for by code that actually uses this detector.
+        """
+        from langchain.output_parsers import ResponseSchema, StructuredOutputParser
+
+        self.trustable_llm = trustable_llm
+        self._cached_detect = self._build_cached_detect()
+        response_schemas = [
+            ResponseSchema(name="secrets", description="A list of sensitive or private data extracted from the text")
+        ]
+        self.output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
+
+    def _build_cached_detect(self):
+        @lru_cache(maxsize=128)
+        def _detect(text: str) -> List[Span]:
+            prompt = (
+                "Analyze the following text and extract only those pieces of information that are sensitive or private. "
+                "Sensitive data includes API keys, passwords, tokens, sensitive personal information or any other information that could compromise security or safety if exposed. "
+                "Do not include any data that is not sensitive. "
+                "Do not extract already obfuscated tokens which follow the template '__SECRET_<TYPE>_<hash>__' (for example, '__SECRET_AWS_3f2a91c0a37__'). "
+                "Return the result as a structured JSON output with the following schema: {\"secrets\": [string, ...]}.\n\n"
+                f"{self.output_parser.get_format_instructions()}\n\n"
+                f"Text: '''{text}'''"
+            )
 
-                return find_secret_positions(text, secret_list)
+            try:
+                response_text = self.trustable_llm.predict(
+                    text=prompt,
+                )
+            except Exception as e:
+                logger.error("Error calling the trusted LLM: %s", e)
+                return []
 
-            return _detect
+            try:
+                parsed_output = self.output_parser.parse(str(response_text))
+                secret_list = parsed_output.get("secrets", [])
+                # secret_list = parse_json_output(response_text)
+                if not isinstance(secret_list, list):
+                    logger.warning("LLM did not return a list. Response: %s", response_text)
+                    return []
+            except json.JSONDecodeError:
+                logger.warning("Failed to decode LLM response as JSON. Response: %s", response_text)
+                return []
+
+            return find_secret_positions(text, secret_list)
 
-        def detect(self, text: str) -> List[Dict]:
-            return self._cached_detect(text)
+        return _detect
 
-        def report_cache(self):
-            return self._cached_detect.cache_info()
+    def detect(self, text: str) -> List[Span]:
+        return self._cached_detect(text)
 
-except ImportError:
-    LLMSecretDetectorLangchain = None
\ No newline at end of file
+    def report_cache(self):
+        return self._cached_detect.cache_info()
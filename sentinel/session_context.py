@@ -1,8 +1,11 @@
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+from sentinel.instrumentation import Instrumentation, NULL_INSTRUMENTATION
 from sentinel.vault import Vault
-import requests
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 
 class SessionContext:
     """
@@ -25,6 +28,16 @@ class SessionContext:
 
     vault : Vault
         An instance of the `Vault` class for managing secrets.
+
+    instrumentation : Instrumentation
+        Stage timers and counters of the hot path; disabled unless sinks are configured.
+
+    tracer : TraceRecorder
+        Records every sanitized text to a workload trace (see `sentinel.tracing`); None by default.
+
+    reporter : Reporter
+        Sends the reports of detections (see `sentinel.reporting`). If None, reports go through
+        the reporter shared by all session contexts with the same `server_url`.
     """
 
     _instance = None  # Singleton instance
@@ -38,9 +51,11 @@ class SessionContext:
             cls._instance._initialized = False
         return cls._instance
 
-    def __init__(self, app_id: str, server_url: str = None, session_id: str = None):
+    def __init__(self, app_id: str, server_url: str = None, session_id: str = None, *,
+                 instrumentation: Instrumentation = None, tracer=None, reporter=None, vault: Vault = None):
         """
-        Initialize the SessionContext instance.
+        Initialize the SessionContext instance. The parameters after `session_id` are
+        keyword-only.
 
         Parameters:
         ----------
@@ -52,13 +67,30 @@ class SessionContext:
 
         session_id : str, optional
             A unique identifier for the session. If not provided, a UUID is generated.
+
+        instrumentation : Instrumentation, optional
+            Metrics sinks for the sanitization hot path. Disabled if not provided.
+
+        tracer : TraceRecorder, optional
+            Records sanitized texts to a workload trace. Disabled if not provided.
+
+        reporter : Reporter, optional
+            Sends the reports of detections, e.g. with sampling or full text. The reporter
+            shared by all session contexts with the same `server_url` if not provided.
+
+        vault : Vault, optional
+            The vault to use, e.g. a `MappedVault` that survives restarts. A new, empty
+            vault is created if not provided.
         """
         if self._initialized:
             return  # Avoid reinitializing the singleton instance
         self.app_id = app_id
         self.server_url = server_url  # Allow server_url to be None
-        self.vault = Vault()  # Use Vault for secret management
+        self.vault = vault if vault is not None else Vault()  # Use Vault for secret management
         self.session_id = session_id or str(uuid.uuid4())
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.tracer = tracer
+        self.reporter = reporter
         self._initialized = True
 
     def add_secret(self, placeholder: str, secret: str):
@@ -73,7 +105,7 @@ class SessionContext:
         secret : str
             The sensitive data to be stored securely.
         """
-        self.vault.add_secret(placeholder, secret)
+        self.vault._add_secret(placeholder, secret)
 
     def get_secret_mapping(self) -> Dict[str, str]:
         """
@@ -95,9 +127,30 @@ class SessionContext:
         """
         self.vault.clear_secrets()
 
-    def report_to_server(self, prompt: str, secrets: list, sanitized_output: str, timestamp: str):
+    def with_overrides(self, instrumentation: Instrumentation = None, tracer=None) -> "SessionContext":
         """
-        Sends a report about the detected secrets to the server.
+        Return a session context that shares this one's session, vault and reporting, but
+        uses its own instrumentation and tracer where given. This context is not modified,
+        so options given to one decorated function do not affect the others.
+
+        Parameters:
+        ----------
+        instrumentation : Instrumentation, optional
+            Metrics sinks used instead of this context's.
+
+        tracer : TraceRecorder, optional
+            Workload trace recorder used instead of this context's.
+        """
+        return _SessionContextView(self, instrumentation=instrumentation, tracer=tracer)
+
+    def report_to_server(self, prompt: str, secrets: list, sanitized_output: str, timestamp: str,
+                         spans: Optional[List[Tuple[int, int, Optional[str]]]] = None):
+        """
+        Reports detected secrets to the server.
+
+        The report is compact: the hashes, types and offsets of the secrets, and the length
+        and digest of the prompt, but neither the prompt nor the secrets, unless the reporter
+        sends full text. It is queued and sent in the background, in a compressed batch.
 
         Parameters:
         ----------
@@ -112,23 +165,58 @@ class SessionContext:
 
         timestamp : str
             The timestamp of when the secrets were detected.
+
+        spans : list, optional
+            The (start, end, type) of each secret in the prompt.
         """
         if not self.server_url:
-            print("Server URL is not defined. Reporting functionality is disabled.")
+            logger.debug("Server URL is not defined. Reporting functionality is disabled.")
             return
 
-        url = f"{self.server_url}/api/report"
-        payload = {
-            "app_id": self.app_id,
-            "session_id": self.session_id,
-            "prompt": prompt,
-            "secrets": secrets,
-            "sanitized_output": sanitized_output,
-            "timestamp": timestamp
-        }
-        try:
-            requests.post(url, json=payload)
-        except Exception:
-            print("Could not send data to the server")
+        reporter = self.reporter
+        if reporter is None:
+            from sentinel.reporting import shared_reporter
+            reporter = shared_reporter(self.server_url)
+        reporter.report(self.app_id, self.session_id, prompt, secrets, sanitized_output, timestamp, spans)
+
+
+class ScopedSessionContext(SessionContext):
+    """
+    A session context that is not a singleton and owns its own vault.
+
+    Use it to give a unit of work, such as a single proxied request or a batch
+    sanitization job, its own placeholder namespace without touching the
+    process-wide `SessionContext`.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, app_id: str, server_url: str = None, session_id: str = None, *,
+                 instrumentation: Instrumentation = None, tracer=None, reporter=None, vault: Vault = None):
+        """
+        Parameters are those of `SessionContext`.
+        """
+        self._initialized = False
+        super().__init__(app_id, server_url, session_id, instrumentation=instrumentation, tracer=tracer,
+                         reporter=reporter, vault=vault)
+
+
+class _SessionContextView(SessionContext):
+    """
+    A session context that reads every attribute from a base context, except the options
+    it overrides. See `SessionContext.with_overrides`.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
 
+    def __init__(self, base: SessionContext, **overrides):
+        self._base = base
+        for name, value in overrides.items():
+            if value is not None:
+                setattr(self, name, value)
 
+    def __getattr__(self, name):
+        # Only called for attributes not set on the view: those of the base context.
+        return getattr(self._base, name)
@@ -0,0 +1,99 @@
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class CoalescedTimeout(TimeoutError):
+    """Raised to a caller that timed out waiting for a computation started by another caller."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same key.
+
+    The first caller for a key (the leader) runs the computation; callers that arrive
+    while it is in flight wait for it and share its result or exception instead of
+    starting their own. Nothing is retained once the computation finishes, so this
+    complements, rather than replaces, a result cache such as `lru_cache`.
+
+    `do` coalesces threads and `ado` coalesces asyncio tasks of the same event loop.
+    Both accept a `timeout` bounding how long a caller waits for a computation started
+    by another caller, after which `CoalescedTimeout` is raised; the computation itself
+    keeps running for the other callers. The leader is not bounded by it.
+
+    Attributes:
+    ----------
+    calls : int
+        Number of computations actually started.
+
+    shared : int
+        Number of callers that reused an in-flight computation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls = weakref.WeakKeyDictionary()  # event loop -> {key: future}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.event.wait(timeout):
+                # The key is not part of the message: it may be a text holding secrets.
+                raise CoalescedTimeout(f"Timed out after {timeout}s waiting for an in-flight computation")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def ado(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args,
+                  timeout: Optional[float] = None) -> Any:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            calls = self._async_calls.setdefault(loop, {})
+            future = calls.get(key)
+            leader = future is None
+            if leader:
+                future = calls[key] = asyncio.ensure_future(fn(*args))
+                future.add_done_callback(lambda _: calls.pop(key, None))
+                self.calls += 1
+            else:
+                self.shared += 1
+        # shield: a caller timing out or being cancelled must not cancel the shared work.
+        if leader:
+            return await asyncio.shield(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            raise CoalescedTimeout(f"Timed out after {timeout}s waiting for an in-flight computation") from None
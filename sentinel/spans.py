@@ -0,0 +1,71 @@
+from typing import Any, Iterator, List, Mapping, Optional, Tuple, Union
+
+_FIELDS = ("secret", "start", "end", "type")
+
+
+class Span:
+    """
+    A detected secret: its text, its [start, end) position and, optionally, its type.
+
+    Spans use `__slots__` rather than a dict per match, which matters on secret-dense
+    inputs such as log dumps. For compatibility with code written against the former
+    dict results, a span can also be read like a mapping: ``span["start"]``,
+    ``span.get("type")`` and ``dict(span)`` all work. Spans are treated as immutable;
+    use `shifted` to move one.
+    """
+
+    __slots__ = _FIELDS
+
+    def __init__(self, secret: str, start: int, end: int, type: Optional[str] = None):
+        self.secret = secret
+        self.start = start
+        self.end = end
+        self.type = type
+
+    @classmethod
+    def coerce(cls, span: Union["Span", Mapping[str, Any]]) -> "Span":
+        """Returns `span` as a `Span`, converting a dict result of a custom detector."""
+        if type(span) is cls:
+            return span
+        return cls(span["secret"], span["start"], span["end"], span.get("type"))
+
+    def shifted(self, offset: int) -> "Span":
+        return Span(self.secret, self.start + offset, self.end + offset, self.type)
+
+    def as_tuple(self) -> Tuple[str, int, int, Optional[str]]:
+        return self.secret, self.start, self.end, self.type
+
+    def as_dict(self) -> dict:
+        return {key: self[key] for key in self.keys()}
+
+    # Mapping-style access, for code written against dict results.
+    def keys(self) -> List[str]:
+        return list(_FIELDS) if self.type is not None else list(_FIELDS[:3])
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _FIELDS else default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Span):
+            return self.as_tuple() == other.as_tuple()
+        if isinstance(other, Mapping):
+            return self.as_dict() == dict(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.as_tuple())
+
+    def __repr__(self) -> str:
+        type_repr = f", type={self.type!r}" if self.type is not None else ""
+        return f"Span(secret={self.secret!r}, start={self.start}, end={self.end}{type_repr})"
@@ -0,0 +1,547 @@
+"""
+Workload traces: what went through `sentinel`, safe to share, and replayable offline.
+
+A `TraceRecorder` writes one JSON line per sanitized call to a rotating file: the
+message shape, each text with its secrets and every other word replaced by synthetic
+tokens of the same length and character classes, the detected spans, and per-stage
+timings. With `redact_text=False`, only the detected secrets are replaced: the rest of
+the prompt, including any secret the detector missed, is written verbatim. Texts that
+repeat, such as system prompts, are written once per file and referenced by id.
+
+`replay` drives any detector with a trace, and `format_comparison` reports throughput
+and latency against the recording and between detector configurations:
+
+    sentinel replay trace.jsonl --patterns patterns.yaml --detector mymodule:build_detector
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sentinel.sentinel_detectors import SecretDetector
+from sentinel.spans import Span
+from sentinel.windows import DEFAULT_KEYWORDS
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+_UPPER = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_LOWER = "abcdefghijklmnopqrstuvwxyz"
+_DIGITS = "0123456789"
+_HEX = "0123456789abcdef"
+_WORD = re.compile(r"\w+")
+# Context words are not sensitive and detectors rely on them: they are kept in redacted text.
+_KEYWORDS = frozenset(word for keyword in DEFAULT_KEYWORDS for word in _WORD.findall(keyword))
+
+# The call being traced in the current thread or task, or _UNTRACED to record nothing.
+_CURRENT_CALL: contextvars.ContextVar = contextvars.ContextVar("sentinel_trace_call", default=None)
+_UNTRACED = object()
+
+
+class Synthesizer:
+    """
+    Replaces strings with synthetic ones of the same length and character classes.
+    The mapping is keyed, so the same secret always gets the same token within one
+    recorder, and tokens cannot be traced back without the key, which is never written.
+    """
+
+    def __init__(self, key: Optional[bytes] = None):
+        self._key = key or os.urandom(16)
+
+    def _stream(self, value: str, length: int) -> bytes:
+        data, counter = b"", 0
+        while len(data) < length:
+            data += hashlib.blake2b(value.encode("utf-8", "surrogatepass"), key=self._key,
+                                    salt=counter.to_bytes(16, "little")).digest()
+            counter += 1
+        return data
+
+    def token(self, value: str, keep_prefix: int = 0) -> str:
+        """A same-length token: letters stay letters of the same case, digits stay digits."""
+        stream = self._stream(value, len(value))
+        chars = list(value[:keep_prefix])
+        for i in range(len(chars), len(value)):
+            char = value[i]
+            if char.isdigit():
+                chars.append(_DIGITS[stream[i] % 10])
+            elif char.isupper():
+                chars.append(_UPPER[stream[i] % 26])
+            elif char.isalpha():
+                chars.append(_LOWER[stream[i] % 26])
+            else:
+                chars.append(char)
+        return "".join(chars)
+
+    def hex(self, value: str) -> str:
+        stream = self._stream(value, len(value))
+        return "".join(_HEX[stream[i] % 16] for i in range(len(value)))
+
+
+def describe_shape(value: Any) -> Any:
+    """A compact description of a sanitized argument, e.g. ``["dict:system", "dict:user"]``."""
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, (list, tuple)):
+        return [describe_shape(item) for item in value]
+    role = value.get("role") if isinstance(value, dict) else getattr(value, "role", None)
+    name = "dict" if isinstance(value, dict) else type(value).__name__
+    return f"{name}:{role}" if isinstance(role, str) else name
+
+
+class _CallRecord:
+    __slots__ = ("kind", "shape", "session", "texts", "stages", "error", "started")
+
+    def __init__(self, kind: str, shape: Any = None):
+        self.kind = kind
+        self.shape = shape
+        self.session: Optional[str] = None
+        self.texts: List[Dict[str, Any]] = []
+        self.stages: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.started = time.time()
+
+    def add_stage(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+def current_call() -> Optional[_CallRecord]:
+    """The call record of the current thread or task, if a traced call is running."""
+    call = _CURRENT_CALL.get()
+    return call if isinstance(call, _CallRecord) else None
+
+
+@contextmanager
+def untraced():
+    """Records nothing inside the block, e.g. in a pass that only collects texts."""
+    token = _CURRENT_CALL.set(_UNTRACED)
+    try:
+        yield
+    finally:
+        _CURRENT_CALL.reset(token)
+
+
+def _us(seconds: float) -> int:
+    return int(round(seconds * 1e6))
+
+
+class TraceRecorder:
+    """
+    Records sanitized calls as JSON lines in a rotating file.
+
+    Set it on a session context (`SessionContext(..., tracer=recorder)`) to record every
+    text that is sanitized, or pass it to `@sentinel(..., tracer=recorder)` to also group
+    the texts of each call and time the whole call and the decoding of its response.
+
+    Example:
+    -------
+    ```python
+    recorder = TraceRecorder("traces/llm.jsonl", max_bytes=64 * 2**20, sample_rate=0.1)
+    @sentinel(detector, tracer=recorder)
+    def call_llm(messages): ...
+    ```
+    """
+
+    TEXT_TABLE_SIZE = 4096
+
+    def __init__(self, path: str, max_bytes: int = 64 * 2 ** 20, backup_count: int = 5,
+                 sample_rate: float = 1.0, keep_prefix: int = 0, redact_text: bool = True,
+                 prefixes: Optional[Iterable[str]] = None, key: Optional[bytes] = None):
+        """
+        :param path: The trace file. Full files are renamed to path.1, path.2, ...
+        :param max_bytes: Size at which the file is rotated.
+        :param backup_count: Rotated files kept; older ones are deleted.
+        :param sample_rate: Fraction of calls recorded.
+        :param keep_prefix: Leading characters of each secret kept verbatim.
+        :param redact_text: Also replace every word outside the secrets with a synthetic
+                            one, except context words such as "password". If False, the
+                            trace holds the raw prompt text apart from the detected secrets,
+                            which replays context-dependent detectors faithfully but is only
+                            safe to share if the prompts are.
+        :param prefixes: Literal prefixes kept verbatim where a secret starts with one,
+                         ignoring case, so that regex detectors still match the synthetic
+                         secrets. Defaults to the prefixes of the built-in patterns and
+                         context words such as "password" and "Bearer".
+        :param key: Key of the synthetic tokens; random by default, so tokens differ
+                    between recorders.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.sample_rate = sample_rate
+        self.keep_prefix = keep_prefix
+        self.redact_text = redact_text
+        if prefixes is None:
+            prefixes = _default_prefixes()
+        # Longest first, so that the longest matching prefix is kept.
+        self.prefixes = tuple(sorted({prefix.lower() for prefix in prefixes if prefix}, key=len, reverse=True))
+        self.synthesizer = Synthesizer(key)
+        self.records = 0
+        self._lock = threading.Lock()
+        self._text_ids: "OrderedDict[bytes, int]" = OrderedDict()
+        self._next_id = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    @contextmanager
+    def call(self, kind: str = "call", value: Any = None):
+        """Groups the texts sanitized inside the block into one record, written at its end."""
+        if not self._sampled():
+            token = _CURRENT_CALL.set(_UNTRACED)
+            try:
+                yield None
+            finally:
+                _CURRENT_CALL.reset(token)
+            return
+        record = _CallRecord(kind, describe_shape(value) if value is not None else None)
+        token = _CURRENT_CALL.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = type(e).__name__
+            raise
+        finally:
+            _CURRENT_CALL.reset(token)
+            record.add_stage("call", time.perf_counter() - start)
+            self._write_call(record)
+
+    def synthesize(self, text: str, spans: Sequence[Span], placeholder_ranges: Sequence[Tuple[int, int]],
+                   vault=None) -> str:
+        """The text with its secrets, placeholders and, if `redact_text`, other words replaced."""
+        cuts = sorted([(span.start, span.end, 0) for span in spans]
+                      + [(start, end, 1) for start, end in placeholder_ranges])
+        parts, last = [], 0
+        for start, end, is_placeholder in cuts:
+            start = max(start, last)
+            if end <= start:
+                continue
+            parts.append(self._plain(text[last:start]))
+            piece = text[start:end]
+            if is_placeholder and vault is not None:
+                parts.append(self._placeholder(piece, vault))
+            else:
+                parts.append(self._secret(piece))
+            last = end
+        parts.append(self._plain(text[last:]))
+        return "".join(parts)
+
+    def _secret(self, secret: str) -> str:
+        keep = next((len(prefix) for prefix in self.prefixes if secret[:len(prefix)].lower() == prefix), 0)
+        return self.synthesizer.token(secret, max(keep, self.keep_prefix))
+
+    def _plain(self, text: str) -> str:
+        if not self.redact_text or not text:
+            return text
+        return _WORD.sub(self._word, text)
+
+    def _word(self, match) -> str:
+        word = match.group()
+        return word if word.lower() in _KEYWORDS else self.synthesizer.token(word)
+
+    def _placeholder(self, placeholder: str, vault) -> str:
+        # The hash identifies the secret: it is replaced, keeping the type and a valid checksum.
+        body = placeholder[len(vault.prefix):len(placeholder) - len(vault.suffix)]
+        type_segment, _, digest = body.rpartition("_")
+        synthetic = vault.format_placeholder(self.synthesizer.hex(digest[:-vault.CHECKSUM_LENGTH]), type_segment or None)
+        return synthetic if len(synthetic) == len(placeholder) else self.synthesizer.token(placeholder)
+
+    def record_text(self, session_context, text: str, placeholder_ranges: Sequence[Tuple[int, int]],
+                    spans: Sequence[Any], detect: float = 0.0, encode: float = 0.0, report: float = 0.0):
+        """Adds a sanitized text to the current call, or records it as a call of its own."""
+        call = _CURRENT_CALL.get()
+        if call is _UNTRACED:
+            return
+        standalone = call is None
+        if standalone:
+            if not self._sampled():
+                return
+            call = _CallRecord("text")
+        spans = [Span.coerce(span) for span in spans]
+        call.texts.append({
+            "text": self.synthesize(text, spans, placeholder_ranges, session_context.vault),
+            "len": len(text),
+            "spans": [[span.start, span.end, span.type] for span in spans],
+            "detect_us": _us(detect), "encode_us": _us(encode), "report_us": _us(report),
+        })
+        if call.session is None:
+            call.session = getattr(session_context, "session_id", None)
+        if standalone:
+            self._write_call(call)
+
+    def _session_hash(self, session_id: Optional[str]) -> Optional[str]:
+        if session_id is None:
+            return None
+        return self.synthesizer.hex(str(session_id))[:12]
+
+    def _write_call(self, call: _CallRecord):
+        record = {
+            "v": TRACE_VERSION, "kind": call.kind, "t": round(call.started, 3),
+            "session": self._session_hash(call.session), "shape": call.shape,
+            "texts": call.texts, "stages_us": {stage: _us(seconds) for stage, seconds in call.stages.items()},
+        }
+        if call.error:
+            record["error"] = call.error
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+            lines = []
+            for entry in call.texts:
+                text = entry.pop("text")
+                digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+                text_id = self._text_ids.get(digest)
+                if text_id is None:
+                    text_id = self._text_ids[digest] = self._next_id
+                    self._next_id += 1
+                    if len(self._text_ids) > self.TEXT_TABLE_SIZE:
+                        self._text_ids.popitem(last=False)
+                    lines.append(json.dumps({"kind": "text_def", "id": text_id, "text": text},
+                                            ensure_ascii=False, separators=(",", ":")))
+                else:
+                    self._text_ids.move_to_end(digest)
+                entry["id"] = text_id
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            self._file.write("\n".join(lines) + "\n")
+            self.records += 1
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        # Every file can be read on its own: texts are written again after a rotation.
+        self._text_ids.clear()
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def _default_prefixes() -> Tuple[str, ...]:
+    from sentinel.sentinel_detectors import RegexSecretDetector
+
+    builtin = [prefix for spec in RegexSecretDetector().pack.specs for prefix in spec.prefixes]
+    return tuple(builtin) + tuple(_KEYWORDS)
+
+
+def trace_files(path: str) -> List[str]:
+    """The files of a rotated trace, oldest first."""
+    rotated = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        rotated.append(f"{path}.{i}")
+        i += 1
+    return rotated[::-1] + ([path] if os.path.exists(path) else [])
+
+
+@dataclass
+class TracedCall:
+    kind: str
+    session: Optional[str]
+    shape: Any
+    texts: List[str]
+    spans: List[List[Tuple[int, int]]]
+    stages_us: Dict[str, int]
+    text_stages_us: List[Dict[str, int]]
+
+    @property
+    def sanitize_us(self) -> int:
+        """Time spent sanitizing the call's texts, including any batched detection."""
+        return (sum(sum(stages.values()) for stages in self.text_stages_us)
+                + self.stages_us.get("detect_batch", 0))
+
+
+def read_trace(paths: Iterable[str]) -> Iterator[TracedCall]:
+    """Yields the calls of trace files, resolving the texts they reference."""
+    for path in paths:
+        texts: Dict[int, str] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("kind") == "text_def":
+                    texts[record["id"]] = record["text"]
+                    continue
+                if record.get("v") != TRACE_VERSION:
+                    raise ValueError(f"Unsupported trace version {record.get('v')!r} in {path}")
+                yield TracedCall(
+                    kind=record["kind"], session=record.get("session"), shape=record.get("shape"),
+                    texts=[texts[entry["id"]] for entry in record["texts"]],
+                    spans=[[(start, end) for start, end, _ in entry["spans"]] for entry in record["texts"]],
+                    stages_us=record.get("stages_us", {}),
+                    text_stages_us=[{stage: entry[f"{stage}_us"] for stage in ("detect", "encode", "report")}
+                                    for entry in record["texts"]],
+                )
+
+
+@dataclass
+class ReplayResult:
+    label: str
+    calls: int
+    texts: int
+    chars: int
+    seconds: float
+    texts_per_s: float
+    mb_per_s: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    spans: int
+    agreement: Optional[float] = None
+    call_ms: List[float] = field(default_factory=list, repr=False)
+
+
+def _percentile(values: List[float], p: float) -> float:
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+def _result(label: str, calls: List[TracedCall], call_seconds: List[float], spans: int,
+            agreement: Optional[float]) -> ReplayResult:
+    seconds = sum(call_seconds)
+    texts = sum(len(call.texts) for call in calls)
+    chars = sum(len(text) for call in calls for text in call.texts)
+    latencies = sorted(s * 1000 for s in call_seconds)
+    return ReplayResult(
+        label=label, calls=len(calls), texts=texts, chars=chars, seconds=round(seconds, 4),
+        texts_per_s=round(texts / seconds, 1) if seconds else 0.0,
+        mb_per_s=round(chars / seconds / 1e6, 2) if seconds else 0.0,
+        p50_ms=round(statistics.median(latencies), 3) if latencies else 0.0,
+        p90_ms=round(_percentile(latencies, 90), 3), p99_ms=round(_percentile(latencies, 99), 3),
+        spans=spans, agreement=agreement, call_ms=latencies,
+    )
+
+
+def recorded(calls: List[TracedCall]) -> ReplayResult:
+    """The throughput and latency of the traced calls as they were recorded."""
+    return _result("recorded", calls, [call.sanitize_us / 1e6 for call in calls],
+                   sum(len(spans) for call in calls for spans in call.spans), None)
+
+
+def replay(calls: List[TracedCall], detector: SecretDetector, label: str = "replay") -> ReplayResult:
+    """
+    Sanitizes the traced texts again with `detector`, call by call, with one session
+    context per traced session, and measures how long each call takes. Batch calls are
+    detected with one `detect_batch` call, as they were recorded.
+    """
+    from sentinel.prompt_sentinel import detect_and_encode_text
+    from sentinel.sentinel_detectors import CollectingDetector, PrecomputedDetector
+    from sentinel.session_context import ScopedSessionContext
+
+    contexts: Dict[Optional[str], ScopedSessionContext] = {}
+    call_seconds, found, agreeing, total = [], 0, 0, 0
+    for call in calls:
+        context = contexts.get(call.session)
+        if context is None:
+            context = contexts[call.session] = ScopedSessionContext(app_id="replay")
+        start = time.perf_counter()
+        spans_per_text = []
+        if call.kind == "batch":
+            collector = CollectingDetector()
+            for text in call.texts:
+                detect_and_encode_text(text, context, collector)
+            distinct = list(collector.texts)
+            results = detector.detect_batch(distinct) if distinct else []
+            active = PrecomputedDetector(dict(zip(distinct, results)), detector)
+        else:
+            active = detector
+        recording = _SpanRecorder(active)
+        for text in call.texts:
+            recording.spans = []
+            detect_and_encode_text(text, context, recording)
+            spans_per_text.append(recording.spans)
+        call_seconds.append(time.perf_counter() - start)
+        for spans, expected in zip(spans_per_text, call.spans):
+            found += len(spans)
+            agreeing += sorted((span.start, span.end) for span in spans) == sorted(map(tuple, expected))
+            total += 1
+    return _result(label, calls, call_seconds, found, round(agreeing / total, 4) if total else None)
+
+
+class _SpanRecorder(SecretDetector):
+    """Passes detection through, keeping the spans of the last text."""
+
+    def __init__(self, detector: SecretDetector):
+        self.detector = detector
+        self.spans: List[Span] = []
+
+    def detect(self, text: str) -> List[Span]:
+        self.spans = [Span.coerce(span) for span in self.detector.detect(text)]
+        return self.spans
+
+
+def format_comparison(results: List[ReplayResult]) -> str:
+    """A table of the results, with latency and throughput changes relative to the first."""
+    base = results[0]
+
+    def delta(value: float, reference: float) -> str:
+        return f"{(value / reference - 1) * 100:+.0f}%" if reference else "n/a"
+
+    header = (f"{'config':<24} {'texts/s':>10} {'MB/s':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+              f"{'spans':>7} {'agree':>6} {'d p50':>7} {'d texts/s':>9}")
+    lines = [header, "-" * len(header)]
+    for result in results:
+        agreement = f"{result.agreement:.1%}" if result.agreement is not None else "-"
+        lines.append(
+            f"{result.label[:24]:<24} {result.texts_per_s:>10.1f} {result.mb_per_s:>7.2f} {result.p50_ms:>9.3f} "
+            f"{result.p90_ms:>9.3f} {result.p99_ms:>9.3f} {result.spans:>7} {agreement:>6} "
+            f"{delta(result.p50_ms, base.p50_ms):>7} {delta(result.texts_per_s, base.texts_per_s):>9}")
+    return "\n".join(lines)
+
+
+def traced_wrapper(wrapper: Callable, tracer: TraceRecorder, kind: str, sanitized_value: Callable) -> Callable:
+    """
+    Wraps a `sentinel` wrapper so that each call is one trace record. `sanitized_value`
+    returns the argument that is sanitized, for the message shape. Generator functions
+    are not wrapped; their texts are recorded individually.
+    """
+    import functools
+    import inspect
+
+    if inspect.iscoroutinefunction(wrapper):
+        @functools.wraps(wrapper)
+        async def async_traced(*args, **kwargs):
+            with tracer.call(kind, sanitized_value(args, kwargs)):
+                return await wrapper(*args, **kwargs)
+        return async_traced
+    if inspect.isgeneratorfunction(wrapper) or inspect.isasyncgenfunction(wrapper):
+        return wrapper
+
+    @functools.wraps(wrapper)
+    def traced(*args, **kwargs):
+        with tracer.call(kind, sanitized_value(args, kwargs)):
+            return wrapper(*args, **kwargs)
+    return traced
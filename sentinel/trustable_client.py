@@ -0,0 +1,190 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from sentinel.sentinel_detectors import TrustableLLM
+
+
+class TrustableLLMError(Exception):
+    """Raised when the trusted LLM could not produce an answer within its budget."""
+
+
+class CircuitOpenError(TrustableLLMError):
+    """Raised without calling the LLM while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker.
+
+    After `failure_threshold` consecutive failed calls the circuit opens and calls are
+    rejected immediately. Once `recovery_timeout` seconds have passed, a single trial
+    call is let through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = CircuitBreaker.CLOSED
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == CircuitBreaker.CLOSED:
+                return True
+            if self._state == CircuitBreaker.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+                self._state = CircuitBreaker.HALF_OPEN
+                return True  # Let exactly one trial call through
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._state = CircuitBreaker.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == CircuitBreaker.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = CircuitBreaker.OPEN
+                self._opened_at = self._clock()
+
+
+class ResilientTrustableLLM(TrustableLLM):
+    """
+    Wraps a `TrustableLLM` with per-call deadlines, retries with jittered exponential
+    backoff, optional hedged requests and a circuit breaker.
+
+    Calls run on a small thread pool so that a hung endpoint cannot block the caller past
+    its deadline. A call that misses its deadline keeps its worker until it returns, so
+    at most `max_workers` calls are outstanding at once: an attempt that finds every
+    worker busy fails at once instead of queueing behind hung calls. With `hedge_llm` and `hedge_delay` set, a second request is sent to the
+    hedge endpoint when the primary has not answered within `hedge_delay` seconds, and
+    the first successful answer wins; this trims the latency tail caused by occasional
+    slow calls. When the circuit is open, `predict` raises `CircuitOpenError` at once, and
+    `LLMSecretDetector` falls back to its `fallback_detector`.
+    """
+
+    def __init__(self,
+                 llm: TrustableLLM,
+                 timeout: float = 30.0,
+                 max_retries: int = 2,
+                 backoff_base: float = 0.25,
+                 backoff_max: float = 4.0,
+                 hedge_llm: Optional[TrustableLLM] = None,
+                 hedge_delay: Optional[float] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 max_workers: int = 8):
+        """
+        :param llm: The primary trusted LLM.
+        :param timeout: Deadline in seconds for each attempt, hedged request included.
+        :param max_retries: Number of additional attempts after the first one fails.
+        :param backoff_base: Base delay of the exponential backoff between attempts.
+        :param backoff_max: Upper bound of the backoff delay.
+        :param hedge_llm: Optional second endpoint used for hedged requests.
+        :param hedge_delay: Seconds to wait for the primary before hedging. Hedging is
+                            disabled when None.
+        :param circuit_breaker: Breaker shared by all calls; a default one is created if omitted.
+        :param max_workers: Size of the thread pool running the LLM calls, and the maximum
+                            number of outstanding calls, hedged requests included.
+        """
+        self.llm = llm
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_llm = hedge_llm
+        self.hedge_delay = hedge_delay
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trustable-llm")
+        # One slot per worker, held from submission until the call returns, even past its deadline.
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def predict(self, text: str, **kwargs) -> str:
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError("Trusted LLM circuit is open")
+
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self._backoff(attempt))
+            try:
+                result = self._call_once(text, kwargs)
+            except Exception as e:
+                last_error = e
+                continue
+            self.circuit_breaker.record_success()
+            return result
+
+        self.circuit_breaker.record_failure()
+        raise TrustableLLMError(
+            f"Trusted LLM failed after {self.max_retries + 1} attempts: {last_error!r}"
+        ) from last_error
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": spreads retries of concurrent callers instead of synchronizing them.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+
+    def _submit(self, llm: TrustableLLM, text: str, kwargs: dict) -> Optional[Future]:
+        """Starts a call on a free worker, or returns None if every worker is busy."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._executor.submit(llm.predict, text, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _call_once(self, text: str, kwargs: dict) -> str:
+        deadline = time.monotonic() + self.timeout
+        primary = self._submit(self.llm, text, kwargs)
+        if primary is None:
+            raise TrustableLLMError("Every trusted LLM worker is busy with an outstanding call")
+        pending = {primary}
+
+        if self.hedge_llm is not None and self.hedge_delay is not None:
+            done, _ = wait(pending, timeout=min(self.hedge_delay, self.timeout))
+            if not done or next(iter(done)).exception() is not None:
+                hedge = self._submit(self.hedge_llm, text, kwargs)  # Not hedged if no worker is free
+                if hedge is not None:
+                    pending.add(hedge)
+
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    last_error = future.exception()
+        finally:
+            # Losing and timed-out calls: cancelled if not started yet, abandoned otherwise.
+            for straggler in pending:
+                straggler.cancel()
+
+        if last_error is not None and not pending:
+            raise last_error
+        raise TimeoutError(f"Trusted LLM did not answer within {self.timeout}s")
+
+    def close(self):
+        self._executor.shutdown(wait=False)
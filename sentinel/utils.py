@@ -1,28 +1,107 @@
 import json
 import re
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
+_FENCED_BLOCK = re.compile(r"```[A-Za-z0-9_-]*[ \t]*\n(.*?)```", re.DOTALL)
+# Only these characters can change the scanner state; everything else is skipped in C.
+_STRUCTURAL_CHAR = re.compile(r'[{}"\\]')
 
-def extract_secrets_json(input_str: str) -> Dict[str, List[str]]:
+_json_loads: Optional[Callable[[str], object]] = None
+
+
+def _get_json_loads() -> Callable[[str], object]:
     """
-    Extracts the first valid JSON object with structure {"secrets": [string, ...]} from the input.
-    Returns {"secrets": []} if extraction or validation fails.
+    Returns the fastest available JSON parser: `orjson.loads` when installed,
+    otherwise the standard library's `json.loads`. Resolved once, on first use.
+    """
+    global _json_loads
+    if _json_loads is None:
+        try:
+            import orjson
+            _json_loads = orjson.loads
+        except ImportError:
+            _json_loads = json.loads
+    return _json_loads
+
+
+def iter_json_object_spans(text: str, start: int = 0) -> Iterator[Tuple[int, int]]:
     """
-    # Match candidate JSON objects (non-greedy)
-    candidate_jsons = re.findall(r'\{.*?\}', input_str, re.DOTALL)
+    Yields (start, end) spans of balanced `{...}` objects in the text, outermost first.
+
+    The text is scanned once with a brace- and string-aware state machine that jumps
+    between structural characters, so braces inside JSON strings and escaped quotes do
+    not confuse the matcher. Spans are yielded as soon as their outermost object closes,
+    which lets callers stop early. An opening brace that is never closed (e.g. stray
+    prose before the real JSON) does not hide the objects nested after it.
+    """
+    search = _STRUCTURAL_CHAR.search
+    open_braces: List[int] = []
+    closed: List[Tuple[int, int]] = []  # Spans whose outermost object is still open
+    in_string = False
+    match = search(text, start)
+    while match is not None:
+        i = match.start()
+        ch = text[i]
+        if in_string:
+            if ch == "\\":
+                i += 1  # Skip the escaped character
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = bool(open_braces)  # Quotes in prose outside any object are ignored
+        elif ch == "{":
+            open_braces.append(i)
+        elif ch == "}" and open_braces:
+            closed.append((open_braces.pop(), i + 1))
+            if not open_braces:
+                closed.sort()
+                yield from closed
+                closed = []
+        match = search(text, i + 1)
+    closed.sort()
+    yield from closed
+
 
-    for candidate in candidate_jsons:
+def _is_secrets_object(obj: object) -> bool:
+    return (
+        isinstance(obj, dict)
+        and "secrets" in obj
+        and isinstance(obj["secrets"], list)
+        and all(isinstance(s, str) for s in obj["secrets"])
+    )
+
+
+def _find_secrets_object(text: str, loads: Callable[[str], object]) -> Optional[Dict[str, List[str]]]:
+    for start, end in iter_json_object_spans(text):
         try:
-            obj = json.loads(candidate)
-            if (
-                isinstance(obj, dict)
-                and "secrets" in obj
-                and isinstance(obj["secrets"], list)
-                and all(isinstance(s, str) for s in obj["secrets"])
-            ):
-                return obj
-        except json.JSONDecodeError:
+            obj = loads(text[start:end])
+        except ValueError:  # json.JSONDecodeError and orjson.JSONDecodeError are both ValueErrors
             continue
+        if _is_secrets_object(obj):
+            return obj  # Early exit on the first valid secrets array
+    return None
+
+
+def extract_secrets_json(input_str: str, strict: bool = False) -> Dict[str, List[str]]:
+    """
+    Extracts the first valid JSON object with structure {"secrets": [string, ...]} from the input.
+
+    Fenced markdown blocks (```json ... ```) are tried first, then the whole text; nested
+    objects and trailing chatter are handled. Returns {"secrets": []} if extraction or
+    validation fails, or raises `json.JSONDecodeError` when `strict` is True, so callers
+    can tell an unparseable answer apart from a genuine "no secrets".
+    """
+    loads = _get_json_loads()
+    for block in _FENCED_BLOCK.findall(input_str):
+        found = _find_secrets_object(block, loads)
+        if found is not None:
+            return found
+
+    found = _find_secrets_object(input_str, loads)
+    if found is not None:
+        return found
 
+    if strict:
+        raise json.JSONDecodeError("No valid {\"secrets\": [...]} object found", input_str, 0)
     # Fallback if no valid match found
     return {"secrets": []}
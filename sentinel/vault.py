@@ -1,6 +1,10 @@
-from typing import Dict
-import uuid
+from typing import AbstractSet, Dict, Iterator, List, Mapping, Optional, Set, Tuple
+import json
+import os
+import re
+import zlib
 import hashlib  # Add import for hashing
+from functools import lru_cache
 
 
 class Vault:
@@ -11,23 +15,52 @@ class Vault:
     mappings of tokens to sensitive data (secrets). It acts as a secure
     storage mechanism for handling secrets during runtime.
 
+    Placeholders are delimited and typed, e.g. ``__SECRET_AWS_3f2a91c0a37__``:
+    the prefix and suffix make them unambiguous in model output, the optional
+    type segment comes from the detector, and the body is a short SHA-256
+    prefix of the secret followed by a three-hex-digit checksum. When two
+    secrets share a hash prefix the placeholder is automatically lengthened.
+
     Attributes:
     ----------
     secret_mapping : Dict[str, str]
         A dictionary that maps tokens to their corresponding secrets.
     """
 
-    def __init__(self, hash_length: int = 8):
+    MAX_HASH_LENGTH = 64
+    # Hex digits of the checksum: 1 in 4096 random placeholder-shaped tokens passes it.
+    CHECKSUM_LENGTH = 3
+
+    def __init__(self, hash_length: int = 8, prefix: str = "__SECRET_", suffix: str = "__"):
         """
-        Initialize the Vault with an empty secret mapping and a configurable hash length.
+        Initialize the Vault with an empty secret mapping and a configurable placeholder format.
 
         Parameters:
         ----------
         hash_length : int, optional
-            The length of the hash used for generating placeholders (default is 8).
+            The initial length of the hash used for generating placeholders (default is 8).
+            It grows automatically for secrets whose hash prefix is already taken.
+
+        prefix : str, optional
+            The delimiter that opens every placeholder (default is ``__SECRET_``).
+
+        suffix : str, optional
+            The delimiter that closes every placeholder (default is ``__``).
         """
+        if not prefix or not suffix:
+            raise ValueError("Placeholder prefix and suffix must be non-empty.")
         self.secret_mapping: Dict[str, str] = {}
+        # (secret, type) -> placeholder, so secrets seen before are not hashed again.
+        self._placeholders: Dict[Tuple[str, Optional[str]], str] = {}
         self.hash_length = hash_length
+        self._listeners: List[object] = []
+        self._known_index = None
+        self.prefix = prefix
+        self.suffix = suffix
+        # One precompiled pattern finds every placeholder candidate in a single pass.
+        self.placeholder_pattern = re.compile(
+            re.escape(prefix) + r"(?:[A-Z0-9]+_)*[0-9a-f]+" + re.escape(suffix)
+        )
 
     def _add_secret(self, placeholder: str, secret: str):
         """
@@ -43,7 +76,7 @@ class Vault:
         """
         self.secret_mapping[placeholder] = secret
 
-    def add_secret_and_get_placeholder(self, secret: str) -> str:
+    def add_secret_and_get_placeholder(self, secret: str, secret_type: Optional[str] = None) -> str:
         """
         Add a secret to the secret mapping and generate a shorter unique placeholder for it.
 
@@ -52,15 +85,147 @@ class Vault:
         secret : str
             The sensitive data to be stored securely.
 
+        secret_type : str, optional
+            The kind of secret (e.g. ``"aws_api_key"``), embedded in the placeholder
+            so the model can reason about what was masked.
+
         Returns:
         -------
         str
             The shorter placeholder that maps to the secret.
         """
-        # Generate a short hash-based placeholder
-        short_hash = Vault._hash_secret(secret, self.hash_length)
-        self._add_secret(short_hash, secret)
-        return short_hash
+        key = (secret, secret_type)
+        placeholder = self._placeholders.get(key)
+        if placeholder is not None and self.secret_mapping.get(placeholder) == secret:
+            return placeholder
+
+        digest = hashlib.sha256(secret.encode()).hexdigest()
+        length = self.hash_length
+        while True:
+            placeholder = self.format_placeholder(digest[:length], secret_type)
+            existing = self.secret_mapping.get(placeholder)
+            if existing is None:
+                self._add_secret(placeholder, secret)
+                for listener in self._listeners:
+                    listener.secret_added(secret, secret_type)
+                break
+            if existing == secret or length >= Vault.MAX_HASH_LENGTH:
+                break
+            length += 2  # Hash prefix collision: lengthen until unique
+        self._placeholders[key] = placeholder
+        return placeholder
+
+    def format_placeholder(self, short_hash: str, secret_type: Optional[str] = None) -> str:
+        """
+        Build the placeholder for a hash prefix and an optional secret type.
+        """
+        type_segment = Vault._normalize_type(secret_type)
+        if type_segment:
+            type_segment += "_"
+        return f"{self.prefix}{type_segment}{short_hash}{Vault._checksum(short_hash)}{self.suffix}"
+
+    def is_placeholder(self, token: str) -> bool:
+        """
+        Check whether a token is a well-formed placeholder with a valid checksum,
+        regardless of whether this vault knows its secret.
+        """
+        if not self.placeholder_pattern.fullmatch(token):
+            return False
+        body = token[len(self.prefix):len(token) - len(self.suffix)].rsplit("_", 1)[-1]
+        n = Vault.CHECKSUM_LENGTH
+        return len(body) > n and Vault._checksum(body[:-n]) == body[-n:]
+
+    def find_placeholders(self, text: str) -> Set[str]:
+        """
+        Return the placeholders known to this vault that appear in the text.
+        """
+        if not self.secret_mapping or self.prefix not in text:
+            return set()
+        mapping = self.secret_mapping
+        return {p for p in self.placeholder_pattern.findall(text) if p in mapping}
+
+    def mask_placeholders(self, text: str) -> Tuple[str, List[Tuple[int, int]], Set[str]]:
+        """
+        Blank out the placeholders in the text, so that detectors never see them.
+
+        Placeholders known to this vault, and well-formed placeholders with a valid
+        checksum (e.g. issued by another session), are replaced with spaces of the same
+        length, so offsets in the masked text are offsets in the original text.
+
+        Returns:
+        -------
+        Tuple[str, List[Tuple[int, int]], Set[str]]
+            The masked text, the masked [start, end) ranges in order, and the masked
+            placeholders known to this vault.
+        """
+        if self.prefix not in text:
+            return text, [], set()
+        mapping = self.secret_mapping
+        parts, ranges, known = [], [], set()
+        last = 0
+        for match in self.placeholder_pattern.finditer(text):
+            token = match.group()
+            if token in mapping:
+                known.add(token)
+            elif not self.is_placeholder(token):
+                continue
+            start, end = match.span()
+            parts.append(text[last:start])
+            parts.append(" " * (end - start))
+            ranges.append((start, end))
+            last = end
+        if not ranges:
+            return text, ranges, known
+        parts.append(text[last:])
+        return "".join(parts), ranges, known
+
+    def decode(self, text: str, placeholders: Optional[AbstractSet[str]] = None) -> str:
+        """
+        Replace every known placeholder in the text with its original secret.
+
+        Candidates are found with the precompiled placeholder pattern and resolved
+        with a dictionary lookup; unknown candidates are left untouched. If
+        `placeholders` is given, only those placeholders are replaced.
+        """
+        if not self.secret_mapping or self.prefix not in text:
+            return text
+        mapping = self.secret_mapping
+        if placeholders is None:
+            return self.placeholder_pattern.sub(lambda m: mapping.get(m.group(0), m.group(0)), text)
+        return self.placeholder_pattern.sub(
+            lambda m: mapping.get(m.group(0), m.group(0)) if m.group(0) in placeholders else m.group(0), text
+        )
+
+    def decode_and_count(self, text: str, placeholders: Optional[AbstractSet[str]] = None) -> Tuple[str, int]:
+        """
+        Like `decode`, but also returns how many placeholders were replaced.
+        """
+        if not self.secret_mapping or self.prefix not in text:
+            return text, 0
+        mapping = self.secret_mapping
+        decoded = 0
+
+        def _replace(match) -> str:
+            nonlocal decoded
+            secret = mapping.get(match.group(0))
+            if secret is None or (placeholders is not None and match.group(0) not in placeholders):
+                return match.group(0)
+            decoded += 1
+            return secret
+
+        return self.placeholder_pattern.sub(_replace, text), decoded
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _normalize_type(secret_type: Optional[str]) -> str:
+        # Cached: detectors report a handful of distinct types, once per secret.
+        if not secret_type:
+            return ""
+        return "_".join(re.findall(r"[A-Z0-9]+", secret_type.upper()))
+
+    @staticmethod
+    def _checksum(short_hash: str) -> str:
+        return format(zlib.crc32(short_hash.encode()) & 0xFFF, "03x")
 
     @staticmethod
     def _hash_secret(txt: str, hash_length: int = 8) -> str:
@@ -85,3 +250,81 @@ class Vault:
         resetting the Vault.
         """
         self.secret_mapping.clear()
+        self._placeholders.clear()
+        for listener in self._listeners:
+            listener.cleared()
+
+    def secrets(self) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Yield every secret of the vault once, with the type it was added with, or None
+        for secrets added without one (e.g. by `merge`).
+        """
+        typed = {secret: secret_type for (secret, secret_type) in self._placeholders}
+        seen = set()
+        for secret in self.secret_mapping.values():
+            if secret not in seen:
+                seen.add(secret)
+                yield secret, typed.get(secret)
+
+    def add_listener(self, listener):
+        """
+        Register an object notified of changes to the vault: its `secret_added(secret,
+        secret_type)` method is called for every new secret and its `cleared()` method
+        when the vault is cleared.
+        """
+        self._listeners.append(listener)
+
+    def known_secrets(self):
+        """
+        Return the `KnownSecretIndex` of this vault's secrets, created on first use and
+        kept up to date as secrets are added.
+        """
+        if self._known_index is None:
+            from sentinel.known_secrets import KnownSecretIndex
+            self._known_index = KnownSecretIndex(self)
+        return self._known_index
+
+    def merge(self, mapping: Mapping[str, str]) -> int:
+        """
+        Add placeholder-secret pairs produced elsewhere, e.g. by worker processes.
+
+        Existing placeholders are never overwritten. Returns the number of placeholders
+        that were already mapped to a different secret.
+        """
+        conflicts = 0
+        for placeholder, secret in mapping.items():
+            existing = self.secret_mapping.setdefault(placeholder, secret)
+            if existing != secret:
+                conflicts += 1
+            else:
+                for listener in self._listeners:
+                    listener.secret_added(secret, None)
+        return conflicts
+
+    def save_encrypted(self, path: str, key: bytes):
+        """
+        Write the secret mapping to `path`, encrypted with a Fernet key.
+
+        Requires the `cryptography` package. The file is replaced atomically.
+        """
+        from cryptography.fernet import Fernet
+
+        token = Fernet(key).encrypt(json.dumps(dict(self.secret_mapping)).encode())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(token)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_encrypted(cls, path: str, key: bytes, **kwargs) -> "Vault":
+        """
+        Load a vault written by `save_encrypted`. Extra keyword arguments are passed
+        to the constructor.
+        """
+        from cryptography.fernet import Fernet
+
+        with open(path, "rb") as f:
+            mapping = json.loads(Fernet(key).decrypt(f.read()))
+        vault = cls(**kwargs)
+        vault.merge(mapping)
+        return vault
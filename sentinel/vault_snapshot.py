@@ -0,0 +1,460 @@
+"""
+Encrypted vault snapshots, served from a memory-mapped file.
+
+A `Vault` lives in memory, so a restarted worker cannot decode the placeholders it issued
+before, and every forked worker holds its own copy of the mapping. A snapshot stores the
+mapping in an indexed, encrypted file instead. `MappedVault` maps it and looks placeholders
+up in the file: opening it does not read the entries, and the pages are shared through the
+page cache by every process mapping the same file. New secrets go to an in-memory overlay,
+which `MappedVault.checkpoint` (or a `VaultCheckpointer` in the background) adds to the file.
+
+File layout (little-endian)::
+
+    header    magic, version, count, index offset, salt, key check
+    records   per entry: u32 length, 12-byte nonce, AES-GCM("placeholder\\0secret")
+    index     count u64 keyed hashes of the placeholders, sorted
+              count u64 offsets of their records
+
+Placeholders are found by a binary search over the keyed hashes, so the file reveals
+neither secrets nor placeholders without the key. Records are append-only: a checkpoint
+copies the existing records as they are, encrypts only the new entries, and rewrites the
+index, then atomically replaces the file.
+
+Requires the `cryptography` package. Keys are the same as for `Vault.save_encrypted`,
+e.g. from `sentinel keygen`.
+"""
+import atexit
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import weakref
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from sentinel.vault import Vault
+
+try:
+    import fcntl
+except ImportError:  # Windows: checkpoints are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SNTLVLT1"
+VERSION = 1
+_NONCE_SIZE = 12
+_KEY_CHECK = b"sentinel-vault"
+# Magic, version, flags, count, index offset, salt, and the key check: _KEY_CHECK encrypted.
+_HEADER = struct.Struct(f"<8sIIQQ16s{_NONCE_SIZE + len(_KEY_CHECK) + 16}s")
+HEADER_SIZE = 128
+_LENGTH = struct.Struct("<I")
+_COPY_CHUNK = 16 << 20
+_EMPTY = memoryview(b"").cast("Q")
+
+
+def _derive_keys(key: Union[str, bytes], salt: bytes) -> Tuple[bytes, bytes]:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    material = HKDF(algorithm=hashes.SHA256(), length=64, salt=salt, info=b"sentinel-vault-snapshot").derive(
+        key.encode() if isinstance(key, str) else key)
+    return material[:32], material[32:]
+
+
+class _Cipher:
+    """The record cipher and placeholder hash of a snapshot, derived from its key and salt."""
+
+    def __init__(self, key: Union[str, bytes], salt: bytes):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        self.salt = salt
+        encryption_key, self._hash_key = _derive_keys(key, salt)
+        self._aead = AESGCM(encryption_key)
+
+    def hash(self, placeholder: str) -> bytes:
+        return hashlib.blake2b(placeholder.encode(), digest_size=8, key=self._hash_key).digest()
+
+    def seal(self, plaintext: bytes, aad: bytes) -> bytes:
+        nonce = os.urandom(_NONCE_SIZE)
+        return nonce + self._aead.encrypt(nonce, plaintext, aad)
+
+    def open(self, sealed: bytes, aad: bytes) -> bytes:
+        return self._aead.decrypt(sealed[:_NONCE_SIZE], sealed[_NONCE_SIZE:], aad)
+
+    def record(self, placeholder: str, secret: str) -> Tuple[int, bytes]:
+        """The index hash and the record of an entry."""
+        digest = self.hash(placeholder)
+        sealed = self.seal(f"{placeholder}\0{secret}".encode("utf-8", "surrogatepass"), digest)
+        return int.from_bytes(digest, "little"), _LENGTH.pack(len(sealed)) + sealed
+
+
+class VaultSnapshot:
+    """
+    A read-only, memory-mapped snapshot file.
+
+    :param path: The snapshot file.
+    :param key: The key it was written with.
+    :param cache_size: Decrypted entries cached, per snapshot.
+    """
+
+    def __init__(self, path: str, key: Union[str, bytes], cache_size: int = 4096):
+        if sys.byteorder != "little":
+            raise RuntimeError("Vault snapshots are only supported on little-endian machines.")
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _flags, self.count, self.index_offset, salt, check = _HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a vault snapshot (or was written by an unsupported version).")
+        self.cipher = _Cipher(key, salt)
+        self._check_key(check)
+        view = memoryview(self._mm)
+        self._hashes = view[self.index_offset:self.index_offset + 8 * self.count].cast("Q")
+        self._offsets = view[self.index_offset + 8 * self.count:self.index_offset + 16 * self.count].cast("Q")
+        self._view = view
+        # The cache must not hold the snapshot itself: a reference cycle would keep a
+        # replaced snapshot, and its mapping, alive until the next garbage collection.
+        snapshot = weakref.ref(self)
+        self._cached_get = lru_cache(maxsize=cache_size)(lambda placeholder: snapshot()._get(placeholder))
+
+    def get(self, placeholder: str) -> Optional[str]:
+        """The secret of a placeholder, or None."""
+        # The call holds a strong reference to the snapshot, so the cached lookup can
+        # dereference it even if the snapshot is replaced concurrently.
+        return self._cached_get(placeholder)
+
+    def _check_key(self, check: bytes):
+        from cryptography.exceptions import InvalidTag
+        try:
+            self.cipher.open(check, MAGIC)
+        except InvalidTag:
+            raise ValueError(f"Wrong key for the vault snapshot {self.path}") from None
+
+    def _record(self, i: int) -> bytes:
+        offset = self._offsets[i]
+        length, = _LENGTH.unpack_from(self._mm, offset)
+        return self._mm[offset + _LENGTH.size:offset + _LENGTH.size + length]
+
+    def _entry(self, i: int) -> Tuple[str, str]:
+        digest = self._hashes[i].to_bytes(8, "little")
+        placeholder, _, secret = self.cipher.open(self._record(i), digest).decode(
+            "utf-8", "surrogatepass").partition("\0")
+        return placeholder, secret
+
+    def _get(self, placeholder: str) -> Optional[str]:
+        target = int.from_bytes(self.cipher.hash(placeholder), "little")
+        i = bisect_left(self._hashes, target)
+        while i < self.count and self._hashes[i] == target:  # Hash collisions are checked
+            found, secret = self._entry(i)
+            if found == placeholder:
+                return secret
+            i += 1
+        return None
+
+    def items(self, since: Optional["VaultSnapshot"] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Every entry, decrypted one by one. With `since`, an earlier snapshot of the same
+        file, only the entries added after it: records are append-only, so they are the
+        ones past its index.
+        """
+        if since is None or since.cipher.salt != self.cipher.salt:
+            return (self._entry(i) for i in range(self.count))
+        end = since.index_offset
+        return (self._entry(i) for i in range(self.count) if self._offsets[i] >= end)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def write(self, path: str, entries: Dict[str, str]) -> int:
+        """
+        Write this snapshot plus `entries` to `path`, copying the existing records without
+        decrypting them. Entries already in the snapshot are skipped. Returns the number of
+        entries written.
+        """
+        new = sorted(self.cipher.record(p, s) for p, s in entries.items() if self.get(p) is None)
+        records = (self._view[HEADER_SIZE:self.index_offset],)
+        return _write(path, self.cipher, records, self.index_offset, new, self._hashes, self._offsets)
+
+    def close(self):
+        self._cached_get.cache_clear()
+        for view in (self._hashes, self._offsets, self._view):
+            view.release()
+        self._mm.close()
+
+
+def _write(path: str, cipher: _Cipher, old_records, records_end: int, new: List[Tuple[int, bytes]],
+           old_hashes: memoryview = _EMPTY, old_offsets: memoryview = _EMPTY) -> int:
+    hashes, offsets = array("Q"), array("Q")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(bytes(HEADER_SIZE))
+        for region in old_records:
+            for start in range(0, len(region), _COPY_CHUNK):
+                f.write(region[start:start + _COPY_CHUNK])
+        # New records are appended; the index merges their hashes into the sorted old ones.
+        position = records_end
+        previous = 0
+        for value, record in new:
+            i = bisect_left(old_hashes, value, previous)
+            hashes.frombytes(old_hashes[previous:i].cast("B"))
+            offsets.frombytes(old_offsets[previous:i].cast("B"))
+            hashes.append(value)
+            offsets.append(position)
+            f.write(record)
+            position += len(record)
+            previous = i
+        hashes.frombytes(old_hashes[previous:].cast("B"))
+        offsets.frombytes(old_offsets[previous:].cast("B"))
+        index_offset = position + (-position % 8)
+        f.write(bytes(index_offset - position))
+        hashes.tofile(f)
+        offsets.tofile(f)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, len(hashes), index_offset, cipher.salt,
+                             cipher.seal(_KEY_CHECK, MAGIC)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(new)
+
+
+def write_snapshot(path: str, mapping: Dict[str, str], key: Union[str, bytes]) -> int:
+    """
+    Write a placeholder-secret mapping, e.g. `vault.secret_mapping`, to a new snapshot
+    file. The file is replaced atomically. Returns the number of entries.
+    """
+    if sys.byteorder != "little":
+        raise RuntimeError("Vault snapshots are only supported on little-endian machines.")
+    cipher = _Cipher(key, os.urandom(16))
+    new = sorted(cipher.record(placeholder, secret) for placeholder, secret in mapping.items())
+    return _write(path, cipher, (), HEADER_SIZE, new)
+
+
+class MappedSecrets(MutableMapping):
+    """
+    The secret mapping of a `MappedVault`: a snapshot, with an in-memory overlay of the
+    entries added since.
+    """
+
+    def __init__(self, snapshot: Optional[VaultSnapshot] = None):
+        self.snapshot = snapshot
+        self.overlay: Dict[str, str] = {}
+
+    def get(self, placeholder, default=None):
+        secret = self.overlay.get(placeholder)
+        snapshot = self.snapshot  # Read once: `MappedVault` may replace it concurrently
+        if secret is None and snapshot is not None:
+            secret = snapshot.get(placeholder)
+        return default if secret is None else secret
+
+    def __getitem__(self, placeholder):
+        secret = self.get(placeholder)
+        if secret is None:
+            raise KeyError(placeholder)
+        return secret
+
+    def __contains__(self, placeholder):
+        return self.get(placeholder) is not None
+
+    def __setitem__(self, placeholder, secret):
+        self.overlay[placeholder] = secret
+
+    def __delitem__(self, placeholder):
+        raise TypeError("Entries cannot be removed from a vault snapshot; use clear().")
+
+    def __iter__(self):
+        return (placeholder for placeholder, _ in self.items())
+
+    def items(self):
+        """Every entry: those of the snapshot, decrypted one by one, then the overlay."""
+        if self.snapshot is not None:
+            yield from self.snapshot.items()
+        yield from self.overlay.items()
+
+    def values(self):
+        return (secret for _, secret in self.items())
+
+    def __len__(self):
+        return (len(self.snapshot) if self.snapshot is not None else 0) + len(self.overlay)
+
+    def __bool__(self):
+        return bool(self.overlay) or (self.snapshot is not None and self.snapshot.count > 0)
+
+    def clear(self):
+        self.snapshot = None
+        self.overlay.clear()
+
+
+class MappedVault(Vault):
+    """
+    A vault backed by a snapshot file, for workers that restart or fork.
+
+    Placeholders are looked up in the memory-mapped snapshot, and new secrets are kept in
+    memory until the next `checkpoint`, which merges them into the file on disk, including
+    entries written there by other processes since, and maps the result. `refresh` maps
+    the file if another process replaced it. Restart time and per-process memory stay
+    flat as the vault grows: only the index pages touched by lookups are read.
+
+    The known-secrets index (`known_secrets()`) is built lazily: on first use it decrypts
+    every entry of the snapshot, and it then follows the secrets added in this process
+    and the entries of snapshots mapped later, including those of other processes.
+
+    Example:
+    -------
+    ```python
+    vault = MappedVault("/var/lib/app/vault.snap", os.environ["SENTINEL_VAULT_KEY"])
+    checkpointer = VaultCheckpointer(vault, interval=30)
+    session = ScopedSessionContext(app_id="my-app", vault=vault)
+    ```
+    """
+
+    def __init__(self, path: str, key: Union[str, bytes], cache_size: int = 4096, **kwargs):
+        """
+        :param path: The snapshot file; created by the first checkpoint if missing.
+        :param key: The encryption key, e.g. from `sentinel keygen`.
+        :param cache_size: Decrypted entries cached per process.
+        :param kwargs: Passed to `Vault`.
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self.key = key
+        self.cache_size = cache_size
+        self.secret_mapping = MappedSecrets()
+        self._lock = threading.Lock()
+        self._cleared = False
+        self.refresh()
+
+    @property
+    def dirty(self) -> bool:
+        """Whether secrets were added since the last checkpoint."""
+        return bool(self.secret_mapping.overlay) or self._cleared
+
+    def _map(self, snapshot: Optional[VaultSnapshot], written: Dict[str, str]):
+        # The new snapshot holds the written entries before they leave the overlay, so
+        # concurrent lookups always find them. The replaced snapshot is not closed, as a
+        # concurrent lookup may still use it; it is unmapped once the last one returns.
+        previous = self.secret_mapping.snapshot
+        self.secret_mapping.snapshot = snapshot
+        overlay = self.secret_mapping.overlay
+        for placeholder in written:
+            overlay.pop(placeholder, None)
+        if snapshot is not None and self._listeners:
+            # Entries written by other processes were never added here: the listeners,
+            # e.g. the known-secrets index, get them from the file. Types are not stored.
+            for _, secret in snapshot.items(since=previous):
+                for listener in self._listeners:
+                    listener.secret_added(secret, None)
+
+    def _open_current(self) -> Optional[VaultSnapshot]:
+        try:
+            return VaultSnapshot(self.path, self.key, self.cache_size)
+        except FileNotFoundError:
+            return None
+
+    def refresh(self) -> bool:
+        """Map the snapshot file if it was replaced since it was mapped. Returns whether it was."""
+        if self._cleared:
+            return False
+        mapped = self.secret_mapping.snapshot
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if mapped is not None and (stat.st_ino, stat.st_mtime_ns) == (mapped.stat.st_ino, mapped.stat.st_mtime_ns):
+            return False
+        with self._lock:
+            snapshot = self._open_current()
+            if snapshot is None:
+                return False
+            # Copied at once, as in `checkpoint`: secrets are added to the overlay without the lock.
+            overlay = dict(self.secret_mapping.overlay)
+            self._map(snapshot, {p: s for p, s in overlay.items() if snapshot.get(p) == s})
+        return True
+
+    def checkpoint(self) -> int:
+        """
+        Merge the secrets added since the last checkpoint into the snapshot file, and map
+        it. Returns the number of entries written.
+        """
+        with self._lock, _file_lock(f"{self.path}.lock"):
+            written = dict(self.secret_mapping.overlay)
+            base = None if self._cleared else self._open_current()
+            if base is None:
+                count = write_snapshot(self.path, written, self.key)
+            else:
+                try:
+                    count = base.write(self.path, written)
+                finally:
+                    base.close()  # Only used here
+            self._cleared = False
+            self._map(self._open_current(), written)
+        if count:
+            logger.info("Checkpointed %d new vault entries to %s", count, self.path)
+        return count
+
+    def clear_secrets(self):
+        """Clear the vault; the snapshot file is emptied at the next checkpoint."""
+        super().clear_secrets()
+        self._cleared = True
+
+
+class _file_lock:
+    """An exclusive lock on a file, serializing checkpoints across processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+class VaultCheckpointer:
+    """
+    Checkpoints a `MappedVault` from a background thread every `interval` seconds when it
+    has new secrets, and otherwise maps snapshots written by other processes. The last
+    checkpoint is made on `stop`, and at exit.
+    """
+
+    def __init__(self, vault: MappedVault, interval: float = 30.0):
+        self.vault = vault
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sentinel-vault-checkpointer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.vault.dirty:
+                    self.vault.checkpoint()
+                else:
+                    self.vault.refresh()
+            except Exception:
+                logger.warning("Could not checkpoint the vault to %s", self.vault.path, exc_info=True)
+
+    def stop(self, timeout: float = 10.0):
+        """Stop checkpointing, after a last checkpoint."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        atexit.unregister(self.stop)
+        self._thread.join(timeout)
+        if self.vault.dirty:
+            self.vault.checkpoint()
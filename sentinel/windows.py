@@ -0,0 +1,191 @@
+"""
+Windowed detection: send only the suspicious parts of a long text to an expensive detector.
+
+A `CandidateSelector` finds cheap signals that part of a text may hold a secret: regex
+hits, high-entropy tokens, and keywords such as "password". Each signal becomes a window
+of context around it, and overlapping windows are merged. `WindowedDetector` sends the
+windows, deduplicated and joined into one compact text, to a detector such as
+`LLMSecretDetector`, and maps the secrets it finds back to the whole text.
+"""
+import math
+import re
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple, Union
+
+from sentinel.known_secrets import trie_pattern
+from sentinel.sentinel_detectors import FallbackResult, SecretDetector, find_secret_positions
+from sentinel.spans import Span
+
+DEFAULT_KEYWORDS = (
+    "password", "passwd", "pwd", "passphrase", "secret", "token", "api_key", "apikey", "api-key",
+    "access_key", "access key", "private key", "credential", "auth", "bearer", "login", "ssn",
+)
+
+# Runs of characters that make up keys and tokens.
+_TOKEN_CHARS = r"[A-Za-z0-9+/=_\-.:~!@#$%^&*]"
+
+
+def shannon_entropy(token: str) -> float:
+    """Bits per character of the token."""
+    length = len(token)
+    return -sum(count / length * math.log2(count / length) for count in Counter(token).values())
+
+
+class CandidateSelector:
+    """
+    Selects the windows of a text that may hold a secret.
+
+    :param detector: A cheap detector whose hits are candidates; the built-in regex
+                     patterns by default. Pass `False` to disable.
+    :param keywords: Case-insensitive words that often precede a secret.
+    :param min_entropy: Tokens of at least `min_token_length` characters with at least
+                        this many bits per character are candidates.
+    :param context: Characters of context on each side of a candidate.
+    """
+
+    def __init__(self, detector: Union[SecretDetector, None, bool] = None,
+                 keywords: Sequence[str] = DEFAULT_KEYWORDS, min_entropy: float = 3.0,
+                 min_token_length: int = 16, context: int = 80):
+        if detector is None:
+            from sentinel.sentinel_detectors import RegexSecretDetector
+            detector = RegexSecretDetector()
+        self.detector = detector or None
+        # Matched in the lowercased text, which is much faster than a case-insensitive pattern.
+        self.keyword_pattern = trie_pattern(sorted({keyword.lower() for keyword in keywords}))
+        self.min_entropy = min_entropy
+        self.token_pattern = re.compile(f"{_TOKEN_CHARS}{{{min_token_length},}}")
+        self.context = context
+
+    def candidates(self, text: str) -> List[Tuple[int, int]]:
+        """The (start, end) of every candidate, unsorted."""
+        found = []
+        if self.detector is not None:
+            found.extend((span.start, span.end) for span in map(Span.coerce, self.detector.detect(text)))
+        if self.keyword_pattern is not None:
+            lowered = text.lower()
+            if len(lowered) != len(text):  # Lowercasing moved the offsets, e.g. "İ"
+                lowered = "".join(char.lower()[0] for char in text)
+            found.extend(match.span() for match in self.keyword_pattern.finditer(lowered))
+        for match in self.token_pattern.finditer(text):
+            if shannon_entropy(match.group()) >= self.min_entropy:
+                found.append(match.span())
+        return found
+
+    def windows(self, text: str) -> List[Tuple[int, int]]:
+        """Sorted, disjoint windows around the candidates, widened to whole tokens."""
+        merged: List[List[int]] = []
+        for start, end in sorted(self.candidates(text)):
+            start = self._token_start(text, max(0, start - self.context))
+            end = self._token_end(text, min(len(text), end + self.context))
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [(start, end) for start, end in merged]
+
+    @staticmethod
+    def _token_start(text: str, i: int) -> int:
+        # Move left to the start of the token the window would otherwise cut.
+        while i and not text[i - 1].isspace():
+            i -= 1
+        return i
+
+    @staticmethod
+    def _token_end(text: str, i: int) -> int:
+        return _NON_SPACE.match(text, i).end()
+
+
+_NON_SPACE = re.compile(r"\S*")
+
+
+class WindowedDetector(SecretDetector):
+    """
+    Detects secrets in the candidate windows of a text only.
+
+    The windows are deduplicated and joined with `separator` into one compact text, which
+    the wrapped detector sees instead of the whole text. Each secret it finds is then
+    located everywhere in the whole text. Texts without candidates are not sent at all.
+    Short texts, and texts whose windows cover most of them, are sent whole.
+
+    Secrets without any cheap signal (no pattern, keyword or high entropy, e.g. a name)
+    are missed in long texts, so tune the selector for the secrets you care about.
+
+    Example:
+    -------
+    ```python
+    detector = WindowedDetector(LLMSecretDetector(trusted_llm), CandidateSelector(context=120))
+    ```
+    """
+
+    def __init__(self, detector: SecretDetector, selector: Optional[CandidateSelector] = None,
+                 min_length: int = 2000, max_coverage: float = 0.5, separator: str = "\n[...]\n"):
+        """
+        :param detector: The expensive detector, e.g. an `LLMSecretDetector`.
+        :param selector: Selects the windows; a `CandidateSelector` with defaults if not provided.
+        :param min_length: Shorter texts are sent whole.
+        :param max_coverage: Texts whose windows cover more than this fraction are sent whole.
+        :param separator: Joins the windows in the compact text.
+        """
+        self.detector = detector
+        self.selector = selector if selector is not None else CandidateSelector()
+        self.min_length = min_length
+        self.max_coverage = max_coverage
+        self.separator = separator
+        # Characters of input, and characters actually sent to the wrapped detector.
+        self.input_chars = 0
+        self.sent_chars = 0
+
+    def compact(self, text: str) -> Optional[str]:
+        """
+        The text the wrapped detector sees: the text itself, the joined windows, or None
+        if nothing needs detection.
+        """
+        self.input_chars += len(text)
+        if len(text) >= self.min_length:
+            windows = self.selector.windows(text)
+            if not windows:
+                return None
+            if sum(end - start for start, end in windows) <= self.max_coverage * len(text):
+                text = self.separator.join(dict.fromkeys(text[start:end] for start, end in windows))
+        self.sent_chars += len(text)
+        return text
+
+    def _map_back(self, text: str, compact: Optional[str], spans: List) -> List[Span]:
+        if compact is None:
+            return []
+        if compact is text:
+            return spans
+        types = {}
+        for span in map(Span.coerce, spans):
+            if span.secret and self.separator not in span.secret:
+                types.setdefault(span.secret, span.type)
+        found = find_secret_positions(text, list(types))
+        for span in found:
+            span.type = types[span.secret]
+        return FallbackResult(found) if isinstance(spans, FallbackResult) else found
+
+    def detect(self, text: str) -> List[Span]:
+        compact = self.compact(text)
+        return self._map_back(text, compact, self.detector.detect(compact) if compact is not None else [])
+
+    async def adetect(self, text: str) -> List[Span]:
+        compact = self.compact(text)
+        return self._map_back(text, compact, await self.detector.adetect(compact) if compact is not None else [])
+
+    def detect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        compacts = [self.compact(text) for text in texts]
+        pending = [i for i, compact in enumerate(compacts) if compact is not None]
+        results: List[List[Span]] = [[] for _ in texts]
+        if pending:
+            for i, spans in zip(pending, self.detector.detect_batch([compacts[i] for i in pending])):
+                results[i] = self._map_back(texts[i], compacts[i], spans)
+        return results
+
+    async def adetect_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        compacts = [self.compact(text) for text in texts]
+        pending = [i for i, compact in enumerate(compacts) if compact is not None]
+        results: List[List[Span]] = [[] for _ in texts]
+        if pending:
+            for i, spans in zip(pending, await self.detector.adetect_batch([compacts[i] for i in pending])):
+                results[i] = self._map_back(texts[i], compacts[i], spans)
+        return results
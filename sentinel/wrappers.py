@@ -1,6 +1,9 @@
 from sentinel.prompt_sentinel import sentinel
 from sentinel.sentinel_detectors import SecretDetector
 
+# Methods taking a list of inputs and returning one output per input.
+BATCH_METHODS = ('batch', 'abatch')
+
 
 def instrument_model_class(model_class, detector: SecretDetector, methods_to_wrap=None):
     """
@@ -8,9 +11,9 @@ def instrument_model_class(model_class, detector: SecretDetector, methods_to_wra
        enabling automatic detection and sanitization of sensitive data during LLM interactions.
 
        This function creates a deep copy of the provided model class and decorates its key
-       LLM interaction methods (e.g., 'invoke', 'ainvoke', 'stream', 'astream') using the
-       specified `SecretDetector`. This allows the model to sanitize inputs and restore original
-       values transparently, without altering the logic of the core model.
+       LLM interaction methods (e.g., 'invoke', 'ainvoke', 'stream', 'astream', 'batch',
+       'abatch') using the specified `SecretDetector`. This allows the model to sanitize inputs
+       and restore original values transparently, without altering the logic of the core model.
 
        Parameters:
        ----------
@@ -24,7 +27,9 @@ def instrument_model_class(model_class, detector: SecretDetector, methods_to_wra
 
        methods_to_wrap : list of str, optional
            A list of method names to wrap with the Sentinel decorator. If not provided,
-           defaults to ['invoke', 'ainvoke', 'stream', 'astream'].
+           defaults to ['invoke', 'ainvoke', 'stream', 'astream', 'batch', 'abatch'].
+           'batch' and 'abatch' are wrapped in batch mode: the texts of all inputs are
+           deduplicated and detected with one `detect_batch` call.
 
        Returns:
        -------
@@ -44,7 +49,7 @@ def instrument_model_class(model_class, detector: SecretDetector, methods_to_wra
        """
 
     if methods_to_wrap is None:
-        methods_to_wrap = ['invoke', 'ainvoke', 'stream', 'astream']
+        methods_to_wrap = ['invoke', 'ainvoke', 'stream', 'astream', *BATCH_METHODS]
 
     # Create a new subclass with a distinct name
     class_name = f"SentinelPatched{model_class.__name__}"
@@ -55,7 +60,7 @@ def instrument_model_class(model_class, detector: SecretDetector, methods_to_wra
         if hasattr(model_class, method_name):
             original_method = getattr(model_class, method_name)
             if callable(original_method):
-                decorated_method = sentinel(detector)(original_method)
+                decorated_method = sentinel(detector, batch=method_name in BATCH_METHODS)(original_method)
                 setattr(new_model_class, method_name, decorated_method)
 
     # Assign a unique ID to the new class
@@ -0,0 +1,78 @@
+"""
+Synthetic, deterministic prompts and secrets, and a stub trusted LLM, shared by the tests.
+
+The tests do not depend on the `benchmarks` directory, which is not part of the package.
+"""
+import json
+import random
+import re
+import string
+from typing import Dict, List, Optional, Tuple
+
+from sentinel.sentinel_detectors import TrustableLLM
+
+_WORDS = (
+    "the model should summarize deployment logs for the billing service and report "
+    "any failing health checks together with the request ids and latency figures"
+).split()
+
+_SECRET_KINDS = {
+    "aws": lambda rng: "AKIA" + "".join(rng.choices(string.ascii_uppercase + string.digits, k=16)),
+    "openai": lambda rng: "sk-" + "".join(rng.choices(string.ascii_letters + string.digits, k=24)),
+    "password": lambda rng: "password=" + "".join(rng.choices(string.ascii_letters + string.digits + "!@#", k=12)),
+}
+
+# Patterns matching the secrets generated above.
+BASE_PATTERNS = {
+    "aws_api_key": r"AKIA[A-Z0-9]{16}",
+    "openai_api_key": r"sk-[A-Za-z0-9]{24}",
+    "password": r"password=[A-Za-z0-9!@#]{12}",
+}
+
+
+def make_secret(rng: random.Random, kind: Optional[str] = None) -> str:
+    kind = kind or rng.choice(sorted(_SECRET_KINDS))
+    return _SECRET_KINDS[kind](rng)
+
+
+def make_prompt(n_words: int, secret_density: float = 0.0, seed: int = 0) -> str:
+    """A prompt of `n_words` words, of which roughly `secret_density` are secrets."""
+    rng = random.Random(seed)
+    words = []
+    for _ in range(n_words):
+        if secret_density and rng.random() < secret_density:
+            words.append(make_secret(rng))
+        else:
+            words.append(rng.choice(_WORDS))
+    return " ".join(words)
+
+
+def make_prompt_with_secrets(n_words: int, n_secrets: int, seed: int = 0) -> Tuple[str, List[str]]:
+    """A prompt with exactly `n_secrets` secrets spread evenly; returns it and the secrets."""
+    rng = random.Random(seed)
+    words = [rng.choice(_WORDS) for _ in range(n_words)]
+    secrets = [make_secret(rng) for _ in range(n_secrets)]
+    for i, secret in enumerate(secrets):
+        words[(i + 1) * n_words // (n_secrets + 1)] = secret
+    return " ".join(words), secrets
+
+
+def patterns_to_yaml(patterns: Dict[str, str]) -> str:
+    return "\n".join(f"{name}: '{pattern}'" for name, pattern in patterns.items())
+
+
+class StubTrustableLLM(TrustableLLM):
+    """
+    "Finds" every token of the prompt matching one of `BASE_PATTERNS`. `calls` and
+    `chars` count the calls and the prompt characters it was sent.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.chars = 0
+        self._secret_re = re.compile("|".join(f"(?:{p})" for p in BASE_PATTERNS.values()))
+
+    def predict(self, text: str, **kwargs) -> str:
+        self.calls += 1
+        self.chars += len(text)
+        return json.dumps({"secrets": sorted(set(self._secret_re.findall(text)))})
@@ -0,0 +1,151 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sentinel.prompt_sentinel import sentinel
+from sentinel.sentinel_detectors import LLMSecretDetector, SecretDetector, TrustableLLM
+from sentinel.spans import Span
+from sentinel.wrappers import instrument_model_class
+
+SECRET = "hunter2"
+
+
+class BatchCountingDetector(SecretDetector):
+    def __init__(self):
+        self.batches = []
+        self.texts = []
+
+    def detect(self, text):
+        self.texts.append(text)
+        start = text.find(SECRET)
+        return [] if start == -1 else [Span(SECRET, start, start + len(SECRET), "password")]
+
+    def detect_batch(self, texts):
+        self.batches.append(list(texts))
+        return super().detect_batch(texts)
+
+    async def adetect_batch(self, texts):
+        return self.detect_batch(texts)
+
+
+def _echo(inputs):
+    assert all(SECRET not in message["content"] for messages in inputs for message in messages)
+    return [{"content": "echo: " + messages[-1]["content"]} for messages in inputs]
+
+
+class ChatModel:
+    def batch(self, inputs, config=None):
+        return _echo(inputs)
+
+    async def abatch(self, inputs, config=None):
+        return _echo(inputs)
+
+
+def _inputs():
+    system = {"role": "system", "content": "You are a helpful assistant."}
+    return [
+        [system, {"role": "user", "content": f"my password is {SECRET}"}],
+        [system, {"role": "user", "content": "nothing to hide"}],
+        [system, {"role": "user", "content": f"my password is {SECRET}"}],
+    ]
+
+
+def test_batch_detects_distinct_texts_once_and_decodes_each_output():
+    detector = BatchCountingDetector()
+    model = instrument_model_class(ChatModel, detector)()
+    inputs = _inputs()
+    outputs = model.batch(inputs)
+    assert [output["content"] for output in outputs] == [
+        f"echo: my password is {SECRET}", "echo: nothing to hide", f"echo: my password is {SECRET}"]
+    assert detector.batches == [["You are a helpful assistant.", f"my password is {SECRET}", "nothing to hide"]]
+    assert inputs == _inputs()  # The caller's inputs are not modified
+
+
+def test_abatch():
+    detector = BatchCountingDetector()
+    model = instrument_model_class(ChatModel, detector)()
+    outputs = asyncio.run(model.abatch(_inputs()))
+    assert outputs[0]["content"] == f"echo: my password is {SECRET}"
+    assert len(detector.batches) == 1
+
+
+class RunnableModel:
+    """Batches like LangChain's `Runnable`: one `invoke` per input, in threads copying the context."""
+
+    def invoke(self, messages, config=None):
+        return _echo([messages])[0]
+
+    async def ainvoke(self, messages, config=None):
+        return _echo([messages])[0]
+
+    def batch(self, inputs, config=None):
+        with ThreadPoolExecutor(2) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, self.invoke, messages)
+                       for messages in inputs]
+            return [future.result() for future in futures]
+
+    async def abatch(self, inputs, config=None):
+        return await asyncio.gather(*(self.ainvoke(messages) for messages in inputs))
+
+
+def test_invoke_within_batch_is_not_sanitized_again():
+    detector = BatchCountingDetector()
+    model = instrument_model_class(RunnableModel, detector)()
+    outputs = model.batch(_inputs())
+    assert outputs[0]["content"] == f"echo: my password is {SECRET}"
+    assert len(detector.batches) == 1
+    assert sorted(detector.texts) == sorted(detector.batches[0])  # Each distinct text detected once
+    outputs = asyncio.run(model.abatch(_inputs()))
+    assert outputs[2]["content"] == f"echo: my password is {SECRET}"
+    assert len(detector.batches) == 2 and len(detector.texts) == 6
+    assert model.invoke(_inputs()[0])["content"] == f"echo: my password is {SECRET}"
+    assert len(detector.texts) == 8  # Outside a batch, invoke is sanitized as before
+
+
+def test_llm_detector_batch_runs_calls_concurrently():
+    class SlowLLM(TrustableLLM):
+        def __init__(self):
+            self.active = self.peak = 0
+
+        def predict(self, text, **kwargs):
+            with lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(0.02)
+            with lock:
+                self.active -= 1
+            return '{"secrets": ["%s"]}' % SECRET if SECRET in text else '{"secrets": []}'
+
+    lock = threading.Lock()
+    llm = SlowLLM()
+    detector = LLMSecretDetector(llm, batch_concurrency=4)
+    results = detector.detect_batch([f"text {i} {SECRET}" for i in range(8)])
+    assert all(spans[0].secret == SECRET for spans in results)
+    assert 1 < llm.peak <= 4
+    results = asyncio.run(detector.adetect_batch(["a", f"b {SECRET}"]))
+    assert results[0] == [] and results[1][0].secret == SECRET
+
+
+def test_other_wrapped_calls_within_batch_are_sanitized():
+    detector = BatchCountingDetector()
+    received = []
+
+    @sentinel(detector)
+    def tool(text):
+        received.append(text)
+        return text
+
+    class ToolCallingModel(RunnableModel):
+        def invoke(self, messages, config=None):
+            tool(messages[-1]["content"])  # Already sanitized, detected again
+            tool(f"doc: {SECRET}")
+            other.invoke(_inputs()[0])
+            return super().invoke(messages, config)
+
+    model = instrument_model_class(ToolCallingModel, detector)()
+    other = instrument_model_class(RunnableModel, detector)()
+    outputs = model.batch(_inputs())
+    assert outputs[0]["content"] == f"echo: my password is {SECRET}"
+    assert len(received) == 6 and all(SECRET not in text for text in received)
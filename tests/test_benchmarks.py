@@ -0,0 +1,17 @@
+import pytest
+
+# The benchmarks are not part of the package; they are importable from the repository root.
+run = pytest.importorskip("benchmarks.run")
+
+
+def test_benchmark_suite_smoke(capsys):
+    assert run.main(["--quick"]) == 0
+    assert "decode/decode_text[vault=10,placeholders=5]" in capsys.readouterr().out
+
+
+def test_loadtest_smoke(capsys):
+    loadtest = pytest.importorskip("benchmarks.loadtest")
+    for driver in ("threads", "asyncio"):
+        assert loadtest.main(["--driver", driver, "--requests", "40", "--concurrency", "8", "--llm-latency", "0",
+                              "--model-latency", "0", "--distinct-prompts", "5", "--report-server", "--json"]) == 0
+    assert '"leaks": 0' in capsys.readouterr().out
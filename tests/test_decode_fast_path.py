@@ -0,0 +1,67 @@
+from typing import Any, Dict, List
+
+from sentinel.prompt_sentinel import sentinel
+from sentinel.sentinel_detectors import SecretDetector
+from sentinel.session_context import SessionContext
+
+
+class KeywordDetector(SecretDetector):
+    def detect(self, text: str) -> List[Dict[str, Any]]:
+        start = text.find("hunter2")
+        return [] if start == -1 else [{"secret": "hunter2", "start": start, "end": start + 7}]
+
+
+session = SessionContext(app_id="test", server_url=None)
+other_placeholder = session.vault.add_secret_and_get_placeholder("unrelated-secret")
+
+
+@sentinel(detector=KeywordDetector(), session_context=session)
+def echo(messages):
+    response = {"content": " | ".join(m["content"] for m in messages), "meta": {"other": other_placeholder}}
+    echo.last_response = response
+    return response
+
+
+def test_clean_call_returns_response_untouched():
+    result = echo([{"role": "user", "content": "nothing to hide"}])
+    assert result is echo.last_response
+
+
+def test_only_issued_placeholders_are_decoded():
+    result = echo([{"role": "user", "content": "pw hunter2"}])
+    assert result["content"] == "pw hunter2"
+    assert result["meta"]["other"] == other_placeholder  # Not part of this call
+
+
+def test_placeholders_already_in_history_are_decoded():
+    history_placeholder = session.vault.add_secret_and_get_placeholder("from-earlier-turn")
+    result = echo([{"role": "assistant", "content": f"use {history_placeholder}"}])
+    assert result["content"] == "use from-earlier-turn"
+
+
+class HexDetector(SecretDetector):
+    """Matches any run of hex digits, including the body of a placeholder."""
+
+    def __init__(self):
+        self.texts = []
+
+    def detect(self, text):
+        import re
+        self.texts.append(text)
+        return [{"secret": m.group(), "start": m.start(), "end": m.end()} for m in re.finditer(r"[0-9a-f]{6,}", text)]
+
+
+def test_resanitizing_history_is_idempotent_and_skips_placeholders():
+    from sentinel.prompt_sentinel import detect_and_encode_text
+    detector = HexDetector()
+    first = detect_and_encode_text("token deadbeef42", session, detector)
+    assert "deadbeef42" not in first
+    assert detect_and_encode_text(first, session, detector) == first
+    assert all(session.vault.prefix not in text for text in detector.texts)
+
+    placeholder_only = first.split()[-1]
+    calls = len(detector.texts)
+    issued = set()
+    assert detect_and_encode_text(f" {placeholder_only}\n", session, detector, issued) == f" {placeholder_only}\n"
+    assert len(detector.texts) == calls
+    assert issued == {placeholder_only}
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous ceiling for the cumulative `import sentinel` cost reported by
+# `python -X importtime`. Cold imports of requests/yaml/langchain blow far past it.
+IMPORT_TIME_BUDGET_US = 50_000
+
+HEAVY_MODULES = ["requests", "yaml", "langchain", "langchain_core"]
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=PACKAGE_ROOT, capture_output=True, text=True, check=True,
+    )
+
+
+def _loaded_heavy_modules(code: str):
+    probe = code + f"\nimport sys, json\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    return json.loads(_run(probe).stdout.strip().splitlines()[-1])
+
+
+def test_import_does_not_load_heavy_dependencies():
+    assert _loaded_heavy_modules("import sentinel") == []
+
+
+def test_regex_detector_does_not_load_reporting_or_langchain():
+    loaded = _loaded_heavy_modules(
+        "from sentinel import RegexSecretDetector\n"
+        "RegexSecretDetector(yaml_string='K: \"AKIA[A-Z0-9]{16}\"').detect('x')"
+    )
+    assert "requests" not in loaded
+    assert "langchain" not in loaded
+
+
+def test_lazy_public_api():
+    import sentinel
+    assert "RegexSecretDetector" in dir(sentinel)
+    from sentinel import sentinel as decorator, Vault, instrument_model_class
+    assert callable(decorator) and callable(instrument_model_class) and Vault
+    with pytest.raises(AttributeError):
+        sentinel.does_not_exist
+
+
+def test_import_time_budget():
+    stderr = _run("import sentinel", "-X", "importtime").stderr
+    for line in stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == "sentinel":
+            assert int(parts[1]) < IMPORT_TIME_BUDGET_US
+            return
+    pytest.fail("`sentinel` not found in -X importtime output")
@@ -0,0 +1,107 @@
+import asyncio
+import random
+
+from sentinel.incremental import IncrementalDetector, diff_matches
+from sentinel.sentinel_detectors import FallbackResult, RegexSecretDetector, SecretDetector, find_secret_positions
+
+from synthetic import BASE_PATTERNS, make_prompt, make_secret, patterns_to_yaml
+
+
+def _spans(spans):
+    return sorted((span["secret"], span["start"], span["end"]) for span in spans)
+
+
+def _regex():
+    return RegexSecretDetector(yaml_string=patterns_to_yaml(BASE_PATTERNS))
+
+
+def test_diff_matches_finds_unchanged_regions():
+    base = "".join(chr(65 + i % 26) * 10 for i in range(100))
+    text = base[:300] + "INSERTED" + base[300:700] + base[764:]
+    matches = diff_matches(base, text, block_size=16)
+    for base_start, new_start, length in matches:
+        assert base[base_start:base_start + length] == text[new_start:new_start + length]
+    assert sum(length for _, _, length in matches) >= len(base) - 64 - 2 * 16
+
+
+def test_diff_of_dissimilar_texts_gives_up():
+    rng = random.Random(3)
+    base = "".join(rng.choice("abcdef") for _ in range(20_000))
+    text = "".join(rng.choice("uvwxyz") for _ in range(20_000))
+    assert diff_matches(base, text, max_unmatched=10_000) is None
+    assert diff_matches(base, text[:5_000] + base[5_000:], max_unmatched=10_000) is not None
+
+    detector = IncrementalDetector(_regex())
+    detector.detect(base)
+    detector.detect(text)
+    assert detector.full_scans == 2 and detector.incremental_scans == 0
+
+
+def test_append_only_detects_the_new_tail():
+    regex = _regex()
+    detector = IncrementalDetector(regex, margin=64)
+    text = make_prompt(5_000, 0.01)
+    detector.detect(text)
+    appended = text + " next step uses AKIA1234567890ABCDEF now"
+    assert _spans(detector.detect(appended)) == _spans(regex.detect(appended))
+    assert detector.incremental_scans == 1
+    assert detector.detected_chars - len(text) < 200
+
+
+def test_random_edits_match_full_detection():
+    rng = random.Random(7)
+    regex = _regex()
+    detector = IncrementalDetector(regex, margin=48, block_size=32, min_length=0)
+    text = make_prompt(3_000, 0.02, seed=1)
+    for _ in range(60):
+        position = rng.randrange(len(text))
+        kind = rng.random()
+        if kind < 0.4:
+            text = text[:position] + f" {make_secret(rng)} " + text[position:]
+        elif kind < 0.7:
+            text = text[:position] + text[position + rng.randrange(1, 80):]
+        else:
+            text = text[:position] + "x" + text[position + 1:]
+        assert _spans(detector.detect(text)) == _spans(regex.detect(text))
+    assert detector.incremental_scans > 50
+
+
+def test_secret_first_found_in_edit_is_reported_everywhere():
+    class ContextDetector(SecretDetector):
+        """Flags every 'hunter2' once it is called a password, like an LLM might."""
+
+        def detect(self, text):
+            return find_secret_positions(text, ["hunter2"]) if "password hunter2" in text else []
+
+    detector = IncrementalDetector(ContextDetector(), margin=16, min_length=0)
+    text = "hunter2 " + "filler " * 300
+    assert detector.detect(text) == []
+    spans = detector.detect(text + "the password hunter2")
+    assert [span["start"] for span in spans] == [0, len(text) + 13]
+
+
+def test_adetect_matches_detect():
+    regex = _regex()
+    detector = IncrementalDetector(regex, min_length=0)
+    text = make_prompt(2_000, 0.01)
+    asyncio.run(detector.adetect(text))
+    edited = text[:500] + " sk-abcdefghijklmnopqrstuvwx " + text[500:]
+    assert _spans(asyncio.run(detector.adetect(edited))) == _spans(regex.detect(edited))
+    assert detector.incremental_scans == 1
+
+
+def test_fallback_results_are_not_remembered():
+    class Flaky(SecretDetector):
+        failing = True
+
+        def detect(self, text):
+            return FallbackResult([]) if self.failing else find_secret_positions(text, ["AKIA1234567890ABCDEF"])
+
+    inner = Flaky()
+    detector = IncrementalDetector(inner, min_length=0)
+    text = "deploy with AKIA1234567890ABCDEF " * 50
+    assert isinstance(detector.detect(text), FallbackResult)
+    inner.failing = False
+    assert len(detector.detect(text)) == 50 and detector.full_scans == 2  # Detected again, in full
+    inner.failing = True
+    assert isinstance(detector.detect(text + " more"), FallbackResult)  # An incremental scan that failed
@@ -0,0 +1,45 @@
+import logging
+
+from sentinel.instrumentation import (
+    NULL_INSTRUMENTATION, InMemorySink, Instrumentation, LoggingSink,
+)
+from sentinel.prompt_sentinel import sentinel
+from sentinel.sentinel_detectors import RegexSecretDetector
+from sentinel.session_context import SessionContext
+
+
+def test_stage_timers_and_counters(caplog):
+    session = SessionContext(app_id="test", server_url=None)
+    metrics = InMemorySink()
+    detector = RegexSecretDetector(yaml_string='AWS: "AKIA[A-Z0-9]{16}"')
+
+    @sentinel(detector=detector, session_context=session,
+              instrumentation=Instrumentation([metrics, LoggingSink(logging.INFO)]))
+    def echo(msg: str) -> str:
+        return msg
+
+    @sentinel(detector=detector, session_context=session)
+    def other(msg: str) -> str:
+        return msg
+
+    with caplog.at_level(logging.INFO, logger="sentinel"):
+        assert echo("keys AKIA1234567890ABCDEF AKIA1234567890ABCDEG") == \
+            "keys AKIA1234567890ABCDEF AKIA1234567890ABCDEG"
+    assert session.instrumentation is NULL_INSTRUMENTATION  # Not set on the shared context
+    calls = dict(metrics.calls)
+    assert other("key AKIA1234567890ABCDEF") == "key AKIA1234567890ABCDEF"
+    assert metrics.calls == calls  # Other decorated functions are not instrumented
+
+    assert metrics.counts["secrets_found"] == 2
+    assert metrics.counts["placeholders_decoded"] == 2
+    assert {"detect", "encode", "report", "decode"} <= set(metrics.calls)
+    assert "2 secrets were detected" in caplog.text
+    assert "AKIA1234567890ABCDEF" not in caplog.text  # Secrets never reach the logs
+
+
+def test_disabled_instrumentation_is_a_no_op():
+    assert not NULL_INSTRUMENTATION.enabled
+    with NULL_INSTRUMENTATION.timer("detect") as timer:
+        pass
+    assert timer is NULL_INSTRUMENTATION.timer("encode")
+    NULL_INSTRUMENTATION.count("secrets_found", 3)
@@ -0,0 +1,81 @@
+import asyncio
+
+from sentinel.known_secrets import KnownSecretsDetector, blank_spans, trie_pattern
+from sentinel.prompt_sentinel import detect_and_encode_text
+from sentinel.negative_cache import NegativeCacheDetector
+from sentinel.sentinel_detectors import FallbackResult, SecretDetector
+from sentinel.session_context import ScopedSessionContext
+from sentinel.spans import Span
+from sentinel.vault import Vault
+
+
+def test_trie_pattern_matches_the_longest_literal():
+    pattern = trie_pattern(["abc", "abcdef", "abd", "a.c+", "xyz"])
+    assert pattern.findall("abcdefg abcx abd a.c+ abx xyz") == ["abcdef", "abc", "abd", "a.c+", "xyz"]
+    assert trie_pattern([]) is None
+
+
+def test_index_follows_the_vault_incrementally():
+    vault = Vault()
+    vault.add_secret_and_get_placeholder("early-secret", "token")
+    index = vault.known_secrets()
+    secrets = [f"secret-{i:04d}-value" for i in range(300)]
+    for secret in secrets:
+        vault.add_secret_and_get_placeholder(secret, "password")
+    vault.add_secret_and_get_placeholder("abc")  # Too short to index
+    assert len(index._state[0]) > 1
+    text = f"{secrets[0]} early-secret {secrets[150]} abc {secrets[-1]}"
+    spans = index.find(text)
+    assert [span.secret for span in spans] == [secrets[0], "early-secret", secrets[150], secrets[-1]]
+    assert [span.type for span in spans] == ["password", "token", "password", "password"]
+    assert all(text[span.start:span.end] == span.secret for span in spans)
+
+    vault.clear_secrets()
+    assert index.find(text) == [] and len(index) == 0
+
+
+class CountingDetector(SecretDetector):
+    def __init__(self):
+        self.texts = []
+
+    def detect(self, text):
+        self.texts.append(text)
+        start = text.find("sk-live-123456")
+        return [] if start == -1 else [Span("sk-live-123456", start, start + 14, "api_key")]
+
+
+def test_known_secrets_are_found_before_detection():
+    context = ScopedSessionContext(app_id="test")
+    inner = CountingDetector()
+    detector = KnownSecretsDetector(inner, context.vault)
+    first = detect_and_encode_text("my key is sk-live-123456", context, detector)
+    issued = set()
+    second = detect_and_encode_text("use sk-live-123456 again", context, detector, issued)
+    assert first.split()[-1] == second.split()[1] and issued == {second.split()[1]}
+    assert inner.texts[-1] == "use                again"  # The detector only saw the rest
+    inner.texts.clear()
+    assert detector.detect("sk-live-123456") == [Span("sk-live-123456", 0, 14, "api_key")]
+    assert inner.texts == []  # Nothing else to detect
+    results = asyncio.run(detector.adetect_batch(["sk-live-123456", "a sk-live-123456 b"]))
+    assert [[span.start for span in spans] for spans in results] == [[0], [2]]
+    assert inner.texts == ["a                b"]
+
+
+def test_blank_spans_handles_overlaps():
+    spans = [Span("bcd", 1, 4), Span("cd", 2, 4), Span("de", 3, 5)]
+    assert blank_spans("abcdefg", spans) == "a    fg"
+
+
+def test_fallback_results_are_kept_for_outer_caches():
+    class Failing(SecretDetector):
+        def detect(self, text):
+            return FallbackResult([])
+
+    vault = Vault()
+    vault.add_secret_and_get_placeholder("known-secret-1", "token")
+    detector = NegativeCacheDetector(KnownSecretsDetector(Failing(), vault))
+    text = "use known-secret-1 and the new one"
+    result = detector.detect(text)
+    assert isinstance(result, FallbackResult) and [span.secret for span in result] == ["known-secret-1"]
+    assert all(isinstance(r, FallbackResult) for r in detector.detect_batch([text, "clean text"]))
+    assert detector._digest("clean text") not in detector.cache  # The outage is not cached as clean
@@ -0,0 +1,78 @@
+import asyncio
+import os
+
+from sentinel.negative_cache import BloomFilter, NegativeCache, NegativeCacheDetector
+from sentinel.sentinel_detectors import LLMSecretDetector, SecretDetector, TrustableLLM
+from sentinel.spans import Span
+
+
+class CountingDetector(SecretDetector):
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, text):
+        self.calls += 1
+        start = text.find("hunter2")
+        return [] if start == -1 else [Span("hunter2", start, start + 7)]
+
+
+def test_bloom_filter_has_no_false_negatives_and_meets_its_error_rate():
+    bloom = BloomFilter(capacity=20_000, error_rate=1e-3)
+    added = [os.urandom(16) for _ in range(20_000)]
+    for digest in added:
+        bloom.add(digest)
+    assert all(digest in bloom for digest in added)
+    false_positives = sum(os.urandom(16) in bloom for _ in range(20_000))
+    assert false_positives <= 20_000 * 1e-3 * 3
+    assert 0.5e-3 < bloom.false_positive_rate < 2e-3
+
+
+def test_clean_texts_skip_detection_but_secrets_do_not():
+    inner = CountingDetector()
+    detector = NegativeCacheDetector(inner)
+    for _ in range(3):
+        assert detector.detect("a clean system prompt") == []
+        assert detector.detect("pw hunter2")[0].secret == "hunter2"
+    assert inner.calls == 4  # the clean text once, the secret every time
+    assert detector.cache.hits == 2
+
+
+def test_namespaces_do_not_share_clean_results():
+    cache = NegativeCache(capacity=100)
+    first, second = CountingDetector(), CountingDetector()
+    NegativeCacheDetector(first, cache, namespace="v1").detect("clean")
+    NegativeCacheDetector(second, cache, namespace="v2").detect("clean")
+    assert (first.calls, second.calls) == (1, 1)
+
+
+def test_rotation_keeps_one_previous_generation():
+    cache = NegativeCache(capacity=2)
+    detector = NegativeCacheDetector(CountingDetector(), cache)
+    for text in ("a", "b", "c", "d", "e"):
+        detector.detect(text)
+    assert cache.rotations == 2 and len(cache) == 3
+    calls = detector.detector.calls
+    detector.detect("a")  # dropped with the oldest generation
+    detector.detect("e")
+    assert detector.detector.calls == calls + 1
+
+
+def test_failed_llm_detection_is_not_remembered_as_clean():
+    class DownLLM(TrustableLLM):
+        def predict(self, text, **kwargs):
+            raise ConnectionError("down")
+
+    detector = NegativeCacheDetector(LLMSecretDetector(DownLLM()))
+    assert detector.detect("maybe secret") == []
+    assert len(detector.cache) == 0
+
+
+def test_batches():
+    inner = CountingDetector()
+    detector = NegativeCacheDetector(inner)
+    detector.detect("clean")
+    results = detector.detect_batch(["clean", "pw hunter2", "also clean"])
+    assert [len(spans) for spans in results] == [0, 1, 0]
+    assert inner.calls == 3
+    assert asyncio.run(detector.adetect_batch(["also clean", "pw hunter2"]))[1][0].secret == "hunter2"
+    assert inner.calls == 4
@@ -0,0 +1,62 @@
+import asyncio
+from functools import partial
+
+import pytest
+
+from sentinel.parallel import ParallelDetector
+from sentinel.sentinel_detectors import RegexSecretDetector
+
+from synthetic import BASE_PATTERNS, make_prompt, patterns_to_yaml
+
+regex_factory = partial(RegexSecretDetector, yaml_string=patterns_to_yaml(BASE_PATTERNS))
+
+
+def _spans(spans):
+    return [(span.secret, span.start, span.end, span.type) for span in spans]
+
+
+@pytest.fixture(scope="module")
+def detector():
+    with ParallelDetector(regex_factory, processes=2, chunk_size=2_000, overlap=64, min_parallel_size=0) as d:
+        yield d
+
+
+def test_chunked_detection_matches_serial_detection(detector):
+    text = make_prompt(20_000, 0.05)  # ~60 chunks; many secrets straddle a boundary
+    assert _spans(detector.detect(text)) == _spans(sorted(regex_factory().detect(text), key=lambda s: s.start))
+
+
+def test_detect_batch_returns_one_result_per_text(detector):
+    texts = [make_prompt(50, 0.1, seed=i) for i in range(200)] + [""]
+    regex = regex_factory()
+    expected = [_spans(sorted(regex.detect(text), key=lambda s: s.start)) for text in texts]
+    assert [_spans(spans) for spans in detector.detect_batch(texts)] == expected
+
+
+def test_adetect(detector):
+    text = make_prompt(3_000, 0.05)
+    assert _spans(asyncio.run(detector.adetect(text))) == _spans(detector.detect(text))
+
+
+def test_small_texts_are_detected_in_process():
+    detector = ParallelDetector(regex_factory, processes=2)
+    assert _spans(detector.detect("key AKIA1234567890ABCDEF")) == [
+        ("AKIA1234567890ABCDEF", 4, 24, "aws_api_key")]
+    assert detector._pool is None
+
+
+def test_small_texts_are_detected_off_the_event_loop():
+    calls = []
+
+    class AsyncOnly(RegexSecretDetector):
+        def detect(self, text):
+            raise AssertionError("detect must not run on the event loop")
+
+        async def adetect(self, text):
+            calls.append(text)
+            return RegexSecretDetector.detect(self, text)
+
+    detector = ParallelDetector(partial(AsyncOnly, yaml_string=patterns_to_yaml(BASE_PATTERNS)), processes=2)
+    spans = asyncio.run(detector.adetect("key AKIA1234567890ABCDEF"))
+    assert _spans(spans) == [("AKIA1234567890ABCDEF", 4, 24, "aws_api_key")]
+    assert calls == ["key AKIA1234567890ABCDEF"] and detector._pool is None
@@ -0,0 +1,82 @@
+import re
+
+import pytest
+
+from sentinel.pattern_pack import CompiledPack, PatternPack, literal_prefixes
+from sentinel.sentinel_detectors import RegexSecretDetector
+
+YAML = """
+aws_api_key: 'AKIA[0-9A-Z]{16}'
+stripe_key:
+  pattern: '(?:sk|pk)_live_[0-9a-zA-Z]{8}'
+  priority: 10
+password: '(?i)password=\\S+'
+"""
+
+
+def test_literal_prefixes():
+    assert literal_prefixes("AKIA[0-9A-Z]{16}") == ("AKIA",)
+    assert literal_prefixes(r"\b(?:sk|pk)_live_[0-9a-zA-Z]{24}") == ("pk_live_", "sk_live_")
+    assert literal_prefixes("ghp_[A-Za-z0-9]+|gho_[A-Za-z0-9]+") == ("gho_", "ghp_")
+    assert literal_prefixes("(?i)password=\\S+") == ()
+    assert literal_prefixes("[A-Z]{3}key") == ()
+
+
+@pytest.mark.parametrize("attribute, value", [
+    ("_sre_parse", None),  # The private parser could not be imported
+    ("_sre_constants", object()),  # The parsed patterns changed shape
+])
+def test_patterns_that_cannot_be_analyzed_are_not_prefiltered(monkeypatch, attribute, value):
+    import sentinel.pattern_pack as pattern_pack
+
+    monkeypatch.setattr(pattern_pack, attribute, value)
+    assert literal_prefixes("AKIA[0-9A-Z]{16}") == ()
+    pack = PatternPack.from_mapping({f"key_{i}": f"k{i}_[0-9]{{8}}" for i in range(CompiledPack.PREFILTER_MIN_PATTERNS)})
+    assert all(spec.prefixes == () for spec in pack.specs)
+    detector = RegexSecretDetector(pack=pack)
+    assert [span.type for span in detector.detect("use k3_12345678 here")] == ["key_3"]
+
+
+def test_invalid_pattern_sets_are_rejected():
+    with pytest.raises(ValueError, match="broken"):
+        PatternPack.from_mapping({"broken": "([a-z"})
+    with pytest.raises(ValueError, match="priority"):
+        PatternPack.from_mapping({"key": {"pattern": "k[0-9]+", "priority": "high"}})
+    with pytest.raises(ValueError):
+        PatternPack.from_mapping(["not", "a", "mapping"])
+
+
+def test_priority_order_and_shared_compilation():
+    first = RegexSecretDetector(yaml_string=YAML)
+    second = RegexSecretDetector(yaml_string=YAML)
+    assert [spec.type for spec in first.pack.specs] == ["stripe_key", "aws_api_key", "password"]
+    assert first._compiled is second._compiled
+    assert first.fingerprint == second.fingerprint
+
+
+def test_json_round_trip(tmp_path):
+    pack = PatternPack.from_yaml_string(YAML)
+    path = str(tmp_path / "pack.json")
+    pack.save(path)
+    detector = RegexSecretDetector(yaml_path=path)
+    assert detector.fingerprint == pack.fingerprint
+    assert detector.detect("id AKIA0123456789ABCDEF")[0].type == "aws_api_key"
+
+    tampered = pack.to_json().replace("AKIA", "AKIB")
+    with pytest.raises(ValueError, match="fingerprint"):
+        PatternPack.from_json(tampered)
+    tampered = pack.to_json().replace('"AKIA"', '"AKIB"')  # Only the prefix, not the pattern
+    with pytest.raises(ValueError, match="fingerprint"):
+        PatternPack.from_json(tampered)
+
+
+def test_prefilter_matches_plain_regex_scan(monkeypatch):
+    monkeypatch.setattr(CompiledPack, "PREFILTER_MIN_PATTERNS", 1)
+    # Overlapping prefixes ("ab" inside "xab_") must not hide each other.
+    mapping = {"xab": "xab_[0-9]+", "ab": "ab_[0-9]+", "b": "b_[a-z]+", "free": "[0-9]{6}"}
+    detector = RegexSecretDetector(pack=PatternPack.from_mapping(mapping))
+    assert detector._compiled._prefilter is not None
+    text = "xab_12 b_zz 123456 ab_9 nothing"
+    expected = sorted((m.group(), m.start(), t) for t, p in mapping.items() for m in re.finditer(p, text))
+    assert sorted((s.secret, s.start, s.type) for s in detector.detect(text)) == expected
+    assert detector.detect("123456") == [{"secret": "123456", "start": 0, "end": 6, "type": "free"}]
@@ -0,0 +1,124 @@
+import json
+import os
+import sys
+from functools import partial
+
+import pytest
+
+from sentinel.cli import main
+from sentinel.pipeline import (
+    PLACEHOLDER_HASH_LENGTH, VaultConflictError, checkpoint_path, sanitize_file, sanitize_lines,
+)
+from sentinel.sentinel_detectors import RegexSecretDetector
+from sentinel.vault import Vault
+
+PATTERNS = "aws_api_key: 'AKIA[A-Z0-9]{16}'"
+SECRET = "AKIA1234567890ABCDEF"
+
+detector_factory = partial(RegexSecretDetector, yaml_string=PATTERNS)
+
+
+def _write_chats(path, n):
+    with open(path, "w") as f:
+        for i in range(n):
+            record = {"id": i, "messages": [{"role": "user", "content": f"line {i} key {SECRET}"}],
+                      "meta": {"note": SECRET}}
+            f.write(json.dumps(record) + "\n")
+        f.write("not json " + SECRET + "\n")
+
+
+def test_sanitize_lines_only_touches_selected_fields():
+    lines = [json.dumps({"content": f"key {SECRET}", "note": SECRET}).encode() + b"\n", b"{broken " + SECRET.encode()]
+    output, mapping, invalid, secrets = sanitize_lines(lines, "jsonl", ("content",), detector_factory())
+    record = json.loads(output[0])
+    assert SECRET not in record["content"] and record["note"] == SECRET
+    assert SECRET not in output[1].decode() and not output[1].endswith(b"\n")
+    assert invalid == 1 and list(mapping.values()) == [SECRET]
+    assert secrets == 2  # Every occurrence, though both share one placeholder
+
+
+def test_sanitize_lines_sanitizes_top_level_strings():
+    lines = [json.dumps(f"my key is {SECRET}").encode(), json.dumps([f"key {SECRET}", [SECRET], 3]).encode(),
+             json.dumps([{"note": SECRET}]).encode()]
+    output, _, invalid, secrets = sanitize_lines(lines, "jsonl", ("content",), detector_factory())
+    assert invalid == 0 and secrets == 2 + 1
+    assert all(SECRET not in line.decode() for line in output[:2])
+    assert json.loads(output[1])[2] == 3
+    assert json.loads(output[2]) == [{"note": SECRET}]  # Not a selected field
+
+
+def test_placeholders_of_different_batches_never_share_a_secret(tmp_path):
+    output, mapping, _, _ = sanitize_lines([f"key {SECRET}".encode()], "text", detector=detector_factory())
+    placeholder, = mapping
+    assert len(placeholder[:-2].rsplit("_", 1)[1]) == PLACEHOLDER_HASH_LENGTH + Vault.CHECKSUM_LENGTH
+
+    # A vault already mapping that placeholder to another secret, e.g. from a colliding batch.
+    source, target = tmp_path / "in.txt", tmp_path / "out.txt"
+    source.write_text(f"key {SECRET}\n")
+    vault = Vault()
+    vault.merge({placeholder: "another secret"})
+    with pytest.raises(VaultConflictError):
+        sanitize_file(str(source), str(target), detector_factory, processes=0, fmt="text", vault=vault)
+
+
+@pytest.mark.parametrize("processes", [0, 2])
+def test_sanitize_file_preserves_lines_and_collects_vault(tmp_path, processes):
+    source, target = tmp_path / "chats.jsonl", tmp_path / "out.jsonl"
+    _write_chats(source, 50)
+    vault = Vault()
+    stats = sanitize_file(str(source), str(target), detector_factory, processes=processes,
+                          batch_size=8, vault=vault)
+
+    lines = target.read_text().splitlines()
+    assert len(lines) == stats.lines == 51 and stats.invalid_lines == 1
+    assert stats.secrets == 51  # One per line, in the default fields
+    assert [json.loads(line)["id"] for line in lines[:-1]] == list(range(50))
+    assert SECRET not in lines[-1]
+    assert json.loads(lines[0])["meta"]["note"] == SECRET  # Not a default field
+    assert vault.decode(target.read_text()).count(SECRET) == 51 + 50
+    assert stats.offset == os.path.getsize(source)
+
+
+def test_resume_continues_from_checkpoint(tmp_path):
+    source, target = tmp_path / "chats.jsonl", tmp_path / "out.jsonl"
+    _write_chats(source, 30)
+    expected = tmp_path / "expected.jsonl"
+    sanitize_file(str(source), str(expected), detector_factory, processes=0)
+
+    # Simulate a run interrupted after a checkpoint at line 10, with partial output after it.
+    with open(source, "rb") as f:
+        head = b"".join(f.readline() for _ in range(10))
+    written = b"".join(expected.read_bytes().splitlines(keepends=True)[:10])
+    target.write_bytes(written + b'{"id": 10, "partial')
+    with open(checkpoint_path(str(target)), "w") as f:
+        json.dump({"input_offset": len(head), "output_offset": len(written)}, f)
+
+    stats = sanitize_file(str(source), str(target), detector_factory, resume=True, processes=0)
+    assert stats.lines == 21
+    assert target.read_bytes() == expected.read_bytes()
+
+
+def test_cli_writes_encrypted_vault(tmp_path, monkeypatch, capsys):
+    Fernet = pytest.importorskip("cryptography.fernet").Fernet
+
+    source, target, vault_path = tmp_path / "c.txt", tmp_path / "o.txt", tmp_path / "o.vault"
+    source.write_text(f"first {SECRET}\nsecond line\n")
+    patterns = tmp_path / "patterns.yaml"
+    patterns.write_text(PATTERNS)
+    key = Fernet.generate_key().decode()
+    monkeypatch.setenv("SENTINEL_VAULT_KEY", key)
+
+    assert main(["sanitize", str(source), "-o", str(target), "--format", "text", "--patterns", str(patterns),
+                 "--processes", "0", "--vault-out", str(vault_path)]) == 0
+    assert SECRET not in target.read_text()
+    vault = Vault.load_encrypted(str(vault_path), key)
+    assert vault.decode(target.read_text()) == source.read_text()
+    assert "2 lines" in capsys.readouterr().err
+
+
+def test_cli_names_the_crypto_extra_without_cryptography(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "cryptography", None)  # As if it were not installed
+    assert main(["keygen"]) == 2
+    assert main(["sanitize", str(tmp_path / "in.txt"), "-o", str(tmp_path / "out.txt"),
+                 "--vault-out", str(tmp_path / "o.vault")]) == 2
+    assert capsys.readouterr().err.count("pip install prompt-sentinel[crypto]") == 2
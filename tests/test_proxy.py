@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+
+from sentinel.proxy import SanitizingProxy  # noqa: E402
+from sentinel.sentinel_detectors import SecretDetector  # noqa: E402
+from sentinel.spans import Span  # noqa: E402
+
+SECRET = "hunter2"
+
+
+class KeywordDetector(SecretDetector):
+    def detect(self, text):
+        start = text.find(SECRET)
+        return [] if start == -1 else [Span(SECRET, start, start + len(SECRET), "password")]
+
+
+def _stub_upstream(received):
+    """Echoes the last message back, as one completion or streamed 3 characters at a time."""
+    async def completions(request):
+        body = await request.json()
+        received.append(body)
+        text = "echo: " + body["messages"][-1]["content"]
+        if not body.get("stream"):
+            return web.json_response({"id": "c1", "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]})
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        pieces = [text[i:i + 3] for i in range(0, len(text), 3)]
+        for i, piece in enumerate(pieces):
+            chunk = {"id": "c1", "choices": [{"index": 0, "delta": {"content": piece},
+                                              "finish_reason": "stop" if i == len(pieces) - 1 else None}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    return app
+
+
+async def _with_proxy(test):
+    received = []
+    upstream = web.AppRunner(_stub_upstream(received))
+    await upstream.setup()
+    upstream_site = web.TCPSite(upstream, "127.0.0.1", 0)
+    await upstream_site.start()
+    upstream_port = upstream_site._server.sockets[0].getsockname()[1]
+
+    proxy = web.AppRunner(SanitizingProxy(KeywordDetector(), f"http://127.0.0.1:{upstream_port}").build_app())
+    await proxy.setup()
+    proxy_site = web.TCPSite(proxy, "127.0.0.1", 0)
+    await proxy_site.start()
+    url = f"http://127.0.0.1:{proxy_site._server.sockets[0].getsockname()[1]}/v1/chat/completions"
+    try:
+        async with aiohttp.ClientSession() as client:
+            await test(client, url, received)
+    finally:
+        await proxy.cleanup()
+        await upstream.cleanup()
+
+
+def test_completion_is_sanitized_upstream_and_restored():
+    async def test(client, url, received):
+        messages = [{"role": "system", "content": "be brief"},
+                    {"role": "user", "content": [{"type": "text", "text": f"pw {SECRET}"}]},
+                    {"role": "user", "content": f"my password is {SECRET}"}]
+        async with client.post(url, json={"model": "m", "messages": messages}) as response:
+            data = await response.json()
+        assert SECRET not in json.dumps(received[-1])
+        assert data["choices"][0]["message"]["content"] == f"echo: my password is {SECRET}"
+
+    asyncio.run(_with_proxy(test))
+
+
+def test_streamed_completion_restores_split_placeholders():
+    async def test(client, url, received):
+        body = {"model": "m", "stream": True, "messages": [{"role": "user", "content": f"pw {SECRET} ok"}]}
+        async with client.post(url, json=body) as response:
+            events = [line for line in (await response.text()).split("\n") if line.startswith("data: ")]
+        assert SECRET not in json.dumps(received[-1])
+        assert events[-1] == "data: [DONE]"
+        text = "".join(json.loads(event[6:])["choices"][0]["delta"].get("content", "") for event in events[:-1])
+        assert text == f"echo: pw {SECRET} ok"
+
+    asyncio.run(_with_proxy(test))
+
+
+def test_invalid_request_is_rejected():
+    async def test(client, url, received):
+        async with client.post(url, data=b"not json") as response:
+            assert response.status == 400
+            assert "error" in await response.json()
+        assert received == []
+
+    asyncio.run(_with_proxy(test))
@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from sentinel import reporting
+from sentinel.prompt_sentinel import detect_and_encode_text, sentinel
+from sentinel.reporting import Reporter, secret_hash
+from sentinel.sentinel_detectors import RegexSecretDetector
+from sentinel.session_context import ScopedSessionContext, SessionContext
+
+PATTERNS = "pin: 'PIN-[0-9]{6}'\nkey: 'KEY-[0-9]{6}'\n"
+
+
+@pytest.fixture
+def server():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, self.headers.get("Content-Encoding"), body))
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", received
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_reports_are_sent_one_by_one_by_default(server):
+    url, received = server
+    reporter = Reporter(url)
+    context = ScopedSessionContext(app_id="app", server_url=url, reporter=reporter)
+    detector = RegexSecretDetector(yaml_string=PATTERNS)
+    for i in range(2):
+        detect_and_encode_text(f"request {i}: my pin is PIN-12345{i}", context, detector)
+    reporter.close()
+
+    assert [(path, encoding) for path, encoding, _ in received] == [("/api/report", None)] * 2
+    report = json.loads(received[0][2])
+    assert report["prompt"] == "request 0: my pin is PIN-123450" and report["secrets"] == ["PIN-123450"]
+    assert report["sanitized_output"].startswith("request 0: my pin is __SECRET_PIN_")
+    assert set(report) == {"app_id", "session_id", "prompt", "secrets", "sanitized_output", "timestamp"}
+
+
+def test_reports_are_compact_batched_and_compressed(server):
+    url, received = server
+    reporter = Reporter(url, batched=True, flush_interval=60)
+    context = ScopedSessionContext(app_id="app", server_url=url, reporter=reporter)
+    detector = RegexSecretDetector(yaml_string=PATTERNS)
+    for i in range(3):
+        detect_and_encode_text(f"request {i}: my pin is PIN-12345{i}", context, detector)
+    assert received == []  # Queued, not sent on the hot path
+    assert reporter.flush(timeout=5)
+
+    (path, encoding, body), = received
+    assert path == "/api/reports" and encoding == "gzip"
+    reports = json.loads(gzip.decompress(body))
+    assert len(reports) == 3 and b"PIN-" not in gzip.decompress(body)
+    pin_hash = secret_hash("PIN-123450", reporter.hash_key)
+    assert reports[0]["secrets"] == [{"hash": pin_hash, "start": 21, "end": 31, "type": "pin"}]
+    assert reports[0]["length"] == 31 and len(reports[0]["digest"]) == 32
+    assert reports[0]["app_id"] == "app" and reports[0]["session_id"] == context.session_id
+    reporter.close()
+
+
+def test_sampling_by_type_and_full_text(server):
+    url, received = server
+    reporter = Reporter(url, batched=True, sample_rate=0.0, type_sample_rates={"key": 1.0}, full_text=True,
+                        compression=None)
+    context = ScopedSessionContext(app_id="app", server_url=url, reporter=reporter)
+    detector = RegexSecretDetector(yaml_string=PATTERNS)
+    detect_and_encode_text("only PIN-111111", context, detector)
+    detect_and_encode_text("PIN-222222 and KEY-333333", context, detector)
+    reporter.close()
+
+    assert reporter.sampled_out == 1 and reporter.sent == 1
+    (_, encoding, body), = received
+    report, = json.loads(body)
+    assert encoding is None and report["prompt"] == "PIN-222222 and KEY-333333"
+    assert report["sanitized_output"].startswith("__SECRET_PIN_")
+
+
+def test_secret_hashes_are_keyed(monkeypatch):
+    monkeypatch.setenv("PS_REPORT_HASH_KEY", "deployment-key")
+    shared = Reporter("http://127.0.0.1:1"), Reporter("http://127.0.0.1:1")
+    assert shared[0].hash_key == shared[1].hash_key == b"deployment-key"
+    monkeypatch.delenv("PS_REPORT_HASH_KEY")
+    report = Reporter("http://127.0.0.1:1", batched=True).build_report("app", "s", "pin 1234", ["1234"], "", "t")
+    assert report["secrets"][0]["hash"] != hashlib.sha256(b"1234").hexdigest()[:16]
+    assert Reporter("http://127.0.0.1:1").hash_key != Reporter("http://127.0.0.1:1").hash_key
+
+
+def test_nothing_is_reported_without_a_server_url(monkeypatch):
+    monkeypatch.delenv("PS_SERVER_URL", raising=False)
+    monkeypatch.setattr(SessionContext, "_instance", None)  # The decorator creates the singleton
+    shared, threads = dict(reporting._shared), set(threading.enumerate())
+    call = sentinel(RegexSecretDetector(yaml_string=PATTERNS))(lambda text: text)
+    assert call("my pin is PIN-123456") == "my pin is PIN-123456"
+    assert SessionContext._instance.server_url is None
+    assert reporting._shared == shared and set(threading.enumerate()) <= threads
+
+
+def test_flush_and_close_respect_their_timeout_when_the_queue_is_full():
+    release = threading.Event()
+
+    class StuckReporter(Reporter):
+        def _send(self, batch):
+            release.wait()
+
+    reporter = StuckReporter("http://127.0.0.1:1", max_queue=2)
+    reporter.report("app", "s", "pin 0", [], "", "t")
+    time.sleep(0.05)  # Being sent
+    for i in range(1, 4):  # Two wait, one is dropped
+        reporter.report("app", "s", f"pin {i}", [], "", "t")
+    assert reporter._queue.full() and reporter.dropped == 1
+    started = time.monotonic()
+    assert reporter.flush(timeout=0.2) is False
+    reporter.close(timeout=0.2)
+    assert time.monotonic() - started < 1.0
+    release.set()
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+
+from sentinel.prompt_sentinel import decode_response
+from sentinel.response_adapters import fields_adapter, register_response_adapter
+from sentinel.session_context import ScopedSessionContext
+
+
+class Model:
+    """Mimics the parts of a Pydantic v2 model that adapters use."""
+    model_fields = {}
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def model_copy(self, update):
+        return type(self)(**dict(self.__dict__, **update))
+
+
+def _fake(module, name, fields):
+    return type(name, (Model,), {"__module__": module, "__qualname__": name, "model_fields": dict.fromkeys(fields)})
+
+
+ChatCompletion = _fake("openai.types.chat.chat_completion", "ChatCompletion", ["id", "choices", "usage"])
+Choice = _fake("openai.types.chat.chat_completion", "Choice", ["index", "message", "logprobs"])
+Message = _fake("openai.types.chat.chat_completion_message", "ChatCompletionMessage", ["role", "content", "tool_calls"])
+
+
+def test_openai_objects_are_rebuilt_only_where_decoded():
+    context = ScopedSessionContext(app_id="test")
+    placeholder = context.vault.add_secret_and_get_placeholder("hunter2")
+
+    class Usage:
+        def __getattr__(self, name):
+            raise AssertionError("usage is not a text field")
+
+    clean = Choice(index=1, message=Message(role="assistant", content="nothing here", tool_calls=None),
+                   logprobs=None)
+    response = ChatCompletion(id="x", usage=Usage(), choices=[
+        Choice(index=0, message=Message(role="assistant", content=f"it is {placeholder}", tool_calls=None),
+               logprobs=None),
+        clean,
+    ])
+    decoded = decode_response(response, context)
+    assert decoded is not response and decoded.usage is response.usage
+    assert decoded.choices[0].message.content == "it is hunter2"
+    assert decoded.choices[1] is clean
+    assert response.choices[0].message.content == f"it is {placeholder}"  # Not modified
+    assert decode_response(clean, context) is clean
+
+
+def test_registered_adapters_and_fallback():
+    context = ScopedSessionContext(app_id="test")
+    placeholder = context.vault.add_secret_and_get_placeholder("hunter2")
+
+    class Answer:
+        def __init__(self, text, client):
+            self.text, self.client, self._cache = text, client, placeholder
+
+    register_response_adapter(Answer, fields_adapter("text"))
+    client = object()
+    decoded = decode_response(Answer(placeholder, client), context)
+    assert decoded.text == "hunter2" and decoded.client is client and decoded._cache == placeholder
+
+    @dataclass(frozen=True)
+    class Result:
+        summary: str
+        _raw: str
+
+    result = Result(summary=f"[{placeholder}]", _raw=placeholder)
+    decoded = decode_response(result, context)
+    assert decoded == Result(summary="[hunter2]", _raw=placeholder) and result.summary == f"[{placeholder}]"
@@ -73,6 +73,19 @@ def test_class_method():
     assert "apikey-xyz789" in response
 
 
+class PlainLLM:
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        for m in messages:
+            assert "apikey" not in m["content"]
+        return messages[0]['content']
+
+
+def test_bound_method():
+    chat = sentinel(detector=TestDummyDetector())(PlainLLM().chat)
+    response = chat([{"role": "user", "content": "apikey-xyz789"}])
+    assert "apikey-xyz789" in response
+
+
 @sentinel(detector=TestDummyDetector())
 def fake_llm(messages: List[Dict[str, str]]) -> str:
     # Return the obfuscated token in response — decorator should decode it
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sentinel.sentinel_detectors import LLMSecretDetector, TrustableLLM
+from sentinel.singleflight import CoalescedTimeout, SingleFlight
+
+
+class SlowLLM(TrustableLLM):
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def predict(self, text: str, **kwargs) -> str:
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return '{"secrets": ["hunter2"]}'
+
+
+def test_threads_share_one_detection():
+    llm = SlowLLM(0.1)
+    detector = LLMSecretDetector(llm)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: detector.detect("pw hunter2"), range(16)))
+    assert llm.calls == 1
+    assert all(r == results[0] and r[0]["secret"] == "hunter2" for r in results)
+
+
+def test_async_tasks_share_one_detection():
+    llm = SlowLLM(0.1)
+    detector = LLMSecretDetector(llm)
+
+    async def main():
+        return await asyncio.gather(*(detector.adetect("pw hunter2") for _ in range(16)))
+
+    results = asyncio.run(main())
+    assert llm.calls == 1
+    assert all(r[0]["secret"] == "hunter2" for r in results)
+
+
+def test_waiter_timeout_and_error_propagation():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, "k", slow)
+        started.wait()
+        with pytest.raises(CoalescedTimeout):
+            flight.do("k", slow, timeout=0.01)
+        with pytest.raises(ValueError):
+            flight.do("k", slow)
+        with pytest.raises(ValueError):
+            leader.result()
+    assert flight.calls == 1 and flight.shared == 2
+
+
+def test_coalesced_wait_timeout_is_logged_as_such(caplog):
+    llm = SlowLLM(0.2)
+    detector = LLMSecretDetector(llm, coalesce_timeout=0.01)
+
+    async def main():
+        # The leader is not bounded by the timeout; the task waiting for it is.
+        return await asyncio.gather(detector.adetect("pw hunter2"), detector.adetect("pw hunter2"))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(detector.detect, "pw hunter2")
+        time.sleep(0.05)
+        assert detector.detect("pw hunter2") == []  # No fallback detector
+        assert leader.result()[0]["secret"] == "hunter2"
+    assert "waiting for the same text's detection in another thread" in caplog.text
+    assert "Error calling the trusted LLM" not in caplog.text and "hunter2" not in caplog.text
+
+    caplog.clear()
+    detector = LLMSecretDetector(SlowLLM(0.2), coalesce_timeout=0.01)
+    leader, follower = asyncio.run(main())
+    assert leader[0]["secret"] == "hunter2" and follower == []
+    assert "in another task" in caplog.text
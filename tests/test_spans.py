@@ -0,0 +1,50 @@
+from sentinel.prompt_sentinel import detect_and_encode_text
+from sentinel.session_context import ScopedSessionContext
+from sentinel.sentinel_detectors import SecretDetector, find_secret_positions
+from sentinel.spans import Span
+
+
+class FixedDetector(SecretDetector):
+    def __init__(self, spans):
+        self.spans = spans
+
+    def detect(self, text):
+        return list(self.spans)
+
+
+def test_span_reads_like_the_former_dicts():
+    span = Span("hunter2", 3, 10, "password")
+    assert span["start"] == 3 and span.get("type") == "password" and span.get("missing") is None
+    assert dict(span) == {"secret": "hunter2", "start": 3, "end": 10, "type": "password"}
+    assert Span("x", 0, 1) == {"secret": "x", "start": 0, "end": 1}
+    assert "type" not in Span("x", 0, 1)
+    assert Span.coerce({"secret": "x", "start": 0, "end": 1}) == Span("x", 0, 1)
+    assert span.shifted(5) == Span("hunter2", 8, 15, "password")
+
+
+def test_find_secret_positions_is_non_overlapping_and_skips_empty():
+    assert find_secret_positions("aaaa", ["aa", ""]) == [Span("aa", 0, 2), Span("aa", 2, 4)]
+
+
+def test_encode_accepts_dict_results_from_custom_detectors():
+    context = ScopedSessionContext(app_id="test")
+    text = "key=hunter2 and again hunter2"
+    detector = FixedDetector([{"secret": "hunter2", "start": 22, "end": 29},
+                              {"secret": "hunter2", "start": 4, "end": 11}])
+    encoded = detect_and_encode_text(text, context, detector)
+    assert "hunter2" not in encoded
+    assert context.vault.decode(encoded) == text
+
+
+def test_overlapping_spans_are_replaced_together():
+    context = ScopedSessionContext(app_id="test")
+    text = "token AKIAABCDEF0123456789 end"
+    detector = FixedDetector([Span("AKIAABCDEF", 6, 16, "prefix"), Span("ABCDEF0123456789", 10, 26, "body")])
+    issued = set()
+    encoded = detect_and_encode_text(text, context, detector, issued)
+    assert encoded.startswith("token __SECRET_PREFIX_") and encoded.endswith("__ end")
+    assert "0123" not in encoded
+    assert context.vault.decode(encoded) == text
+    # Only the merged secret gets a placeholder, not the spans it was merged from.
+    assert list(context.vault.secret_mapping.values()) == ["AKIAABCDEF0123456789"]
+    assert len(issued) == 1
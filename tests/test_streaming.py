@@ -0,0 +1,141 @@
+import asyncio
+import inspect
+
+from sentinel.prompt_sentinel import StreamDecoder, sentinel
+from sentinel.sentinel_detectors import SecretDetector
+from sentinel.session_context import ScopedSessionContext
+from sentinel.spans import Span
+from sentinel.wrappers import instrument_model_class
+
+SECRET = "hunter2"
+
+
+class KeywordDetector(SecretDetector):
+    def detect(self, text):
+        start = text.find(SECRET)
+        return [] if start == -1 else [Span(SECRET, start, start + len(SECRET), "password")]
+
+
+def _chunks(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_stream_decoder_restores_placeholders_split_anywhere():
+    context = ScopedSessionContext(app_id="test")
+    placeholder = context.vault.add_secret_and_get_placeholder(SECRET, "password")
+    text = f"pw {placeholder}, again {placeholder}_ and __SECRET_ stays"
+    for cut in range(1, len(text)):
+        decoder = StreamDecoder(context)
+        out = decoder.feed(text[:cut]) + decoder.feed(text[cut:]) + decoder.flush()
+        assert out == f"pw {SECRET}, again {SECRET}_ and __SECRET_ stays"
+
+
+def test_stream_decoder_releases_plain_text_immediately():
+    context = ScopedSessionContext(app_id="test")
+    context.vault.add_secret_and_get_placeholder(SECRET)
+    decoder = StreamDecoder(context)
+    assert decoder.feed("no placeholders here") == "no placeholders here"
+    assert decoder.feed(" until __SEC") == " until "
+    assert decoder.feed("OND") == "__SECOND"
+
+
+def test_generator_function_is_sanitized_and_decoded_per_item():
+    context = ScopedSessionContext(app_id="test")
+    seen = []
+
+    @sentinel(KeywordDetector(), session_context=context)
+    def stream(prompt):
+        seen.append(prompt)
+        yield from _chunks(f"echo: {prompt}")
+
+    assert inspect.isgeneratorfunction(stream)
+    chunks = list(stream(f"my password is {SECRET}"))
+    assert SECRET not in seen[0]
+    assert "".join(chunks) == f"echo: my password is {SECRET}"
+    assert all(len(chunk) <= 40 for chunk in chunks)
+
+
+def test_clean_generator_is_passed_through():
+    @sentinel(KeywordDetector(), session_context=ScopedSessionContext(app_id="test"))
+    def stream(prompt):
+        received = yield prompt
+        yield received
+
+    gen = stream("nothing to hide")
+    assert next(gen) == "nothing to hide"
+    assert gen.send("sent") == "sent"
+
+
+def test_async_generator_method_via_instrument_model_class():
+    class ChatModel:
+        async def astream(self, messages):
+            assert SECRET not in messages[0]["content"]
+            for chunk in _chunks(messages[0]["content"], 4):
+                await asyncio.sleep(0)
+                yield {"role": "assistant", "content": chunk}
+
+    Patched = instrument_model_class(ChatModel, KeywordDetector(), methods_to_wrap=["astream"])
+    assert inspect.isasyncgenfunction(Patched.astream)
+
+    async def consume():
+        return [chunk async for chunk in Patched().astream([{"role": "user", "content": f"key {SECRET} end"}])]
+
+    chunks = asyncio.run(consume())
+    assert "".join(chunk["content"] for chunk in chunks) == f"key {SECRET} end"
+
+
+def test_returned_iterators_and_awaitables_are_decoded():
+    context = ScopedSessionContext(app_id="test")
+
+    class Stream:
+        def __init__(self, text):
+            self.items = iter(_chunks(text, 5))
+            self.response = "raw"
+            self.closed = False
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            return next(self.items)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            self.closed = True
+
+    class AsyncStream:
+        def __init__(self, text):
+            self.items = iter(_chunks(text, 5))
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                return next(self.items)
+            except StopIteration:
+                raise StopAsyncIteration
+
+    @sentinel(KeywordDetector(), session_context=context)
+    def create(prompt):
+        return Stream(prompt)
+
+    @sentinel(KeywordDetector(), session_context=context)
+    async def acreate(prompt):
+        return AsyncStream(prompt)
+
+    @sentinel(KeywordDetector(), session_context=context)
+    def create_later(prompt):
+        return acreate.__wrapped__(prompt)
+
+    with create(f"a {SECRET} b") as stream:
+        assert stream.response == "raw"
+        assert "".join(stream) == f"a {SECRET} b"
+
+    async def consume(factory):
+        return "".join([chunk async for chunk in await factory(f"a {SECRET} b")])
+
+    assert asyncio.run(consume(acreate)) == f"a {SECRET} b"
+    assert asyncio.run(consume(create_later)) == f"a {SECRET} b"
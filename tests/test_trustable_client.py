@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from sentinel.sentinel_detectors import LLMSecretDetector, RegexSecretDetector, TrustableLLM
+from sentinel.trustable_client import (
+    CircuitBreaker, CircuitOpenError, ResilientTrustableLLM, TrustableLLMError,
+)
+
+
+class ScriptedLLM(TrustableLLM):
+    """Replays a script: an Exception is raised, a float delays the answer, a str replaces it."""
+
+    def __init__(self, *script, answer='{"secrets": ["hunter2"]}'):
+        self.script = list(script)
+        self.answer = answer
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def predict(self, text: str, **kwargs) -> str:
+        with self.lock:
+            self.calls += 1
+            step = self.script.pop(0) if self.script else None
+        if isinstance(step, Exception):
+            raise step
+        if isinstance(step, str):
+            return step
+        if isinstance(step, float):
+            time.sleep(step)
+        return self.answer
+
+
+def test_retries_until_success():
+    llm = ScriptedLLM(RuntimeError("boom"), RuntimeError("boom"))
+    client = ResilientTrustableLLM(llm, max_retries=2, backoff_base=0.001)
+    assert client.predict("x") == llm.answer
+    assert llm.calls == 3
+
+
+def test_deadline():
+    client = ResilientTrustableLLM(ScriptedLLM(1.0, 1.0), timeout=0.05, max_retries=1, backoff_base=0.001)
+    started = time.monotonic()
+    with pytest.raises(TrustableLLMError):
+        client.predict("x")
+    assert time.monotonic() - started < 0.5
+
+
+def test_hedged_request_wins_over_slow_primary():
+    primary = ScriptedLLM(1.0, answer="slow")
+    hedge = ScriptedLLM(answer="fast")
+    client = ResilientTrustableLLM(primary, hedge_llm=hedge, hedge_delay=0.02, timeout=2.0)
+    started = time.monotonic()
+    assert client.predict("x") == "fast"
+    assert time.monotonic() - started < 0.5
+
+
+def test_hung_calls_do_not_queue_new_attempts():
+    release = threading.Event()
+
+    class HungLLM(TrustableLLM):
+        def predict(self, text: str, **kwargs) -> str:
+            release.wait()
+            return "late"
+
+    client = ResilientTrustableLLM(HungLLM(), timeout=0.05, max_retries=0, max_workers=2,
+                                   circuit_breaker=CircuitBreaker(failure_threshold=100))
+    for _ in range(2):
+        with pytest.raises(TrustableLLMError, match="TimeoutError"):
+            client.predict("x")
+    started = time.monotonic()
+    with pytest.raises(TrustableLLMError, match="busy"):
+        client.predict("x")  # Both workers are still hung: fails without waiting for a deadline
+    assert time.monotonic() - started < 0.04
+    release.set()
+    time.sleep(0.05)
+    assert client.predict("x") == "late"
+    client.close()
+
+
+def test_circuit_opens_and_recovers():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10.0, clock=lambda: now[0])
+    llm = ScriptedLLM(*[RuntimeError("down")] * 2)
+    client = ResilientTrustableLLM(llm, max_retries=0, circuit_breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(TrustableLLMError):
+            client.predict("x")
+    with pytest.raises(CircuitOpenError):
+        client.predict("x")
+    assert llm.calls == 2
+    now[0] = 10.0
+    assert client.predict("x") == llm.answer
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_detector_falls_back_and_does_not_cache_failures():
+    text = "password: hunter2 and key AKIA1234567890ABCDEF"
+    llm = ScriptedLLM(RuntimeError("down"), "not json at all")
+    fallback = RegexSecretDetector(yaml_string='AWS: "AKIA[A-Z0-9]{16}"')
+    detector = LLMSecretDetector(llm, fallback_detector=fallback)
+
+    assert [s["secret"] for s in detector.detect(text)] == ["AKIA1234567890ABCDEF"]
+    assert [s["secret"] for s in detector.detect(text)] == ["AKIA1234567890ABCDEF"]
+    assert [s["secret"] for s in detector.detect(text)] == ["hunter2"]
+    assert [s["secret"] for s in detector.detect(text)] == ["hunter2"]
+    assert llm.calls == 3
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from sentinel.utils import extract_secrets_json
+
+
+def test_plain_object():
+    assert extract_secrets_json('{"secrets": ["a", "b"]}') == {"secrets": ["a", "b"]}
+
+
+def test_nested_object_and_trailing_text():
+    text = 'Sure! {"secrets": ["p@ss{1}"], "meta": {"count": 1}} Let me know if you need more.'
+    assert extract_secrets_json(text) == {"secrets": ["p@ss{1}"], "meta": {"count": 1}}
+
+
+def test_fenced_block_and_stray_braces():
+    text = (
+        "Here is { my analysis of the text.\n"
+        "```json\n{\"secrets\": [\"AKIA123\", \"quote\\\"}\"]}\n```\n"
+        "Done."
+    )
+    assert extract_secrets_json(text) == {"secrets": ["AKIA123", 'quote"}']}
+
+
+def test_secrets_object_nested_in_wrapper():
+    text = '{"result": {"secrets": ["tok"]}, "ok": true}'
+    assert extract_secrets_json(text) == {"secrets": ["tok"]}
+
+
+def test_invalid_output():
+    assert extract_secrets_json("I cannot help with that.") == {"secrets": []}
+    with pytest.raises(json.JSONDecodeError):
+        extract_secrets_json('{"secrets": "not-a-list"}', strict=True)
@@ -0,0 +1,67 @@
+from sentinel.vault import Vault
+
+
+def test_placeholder_is_delimited_typed_and_stable():
+    vault = Vault()
+    placeholder = vault.add_secret_and_get_placeholder("AKIA1234567890ABCDEF", "aws_api_key")
+    assert placeholder.startswith("__SECRET_AWS_API_KEY_") and placeholder.endswith("__")
+    assert vault.add_secret_and_get_placeholder("AKIA1234567890ABCDEF", "aws_api_key") == placeholder
+    assert vault.is_placeholder(placeholder)
+    assert not vault.is_placeholder(placeholder[:-3] + "z__")
+
+
+def test_hash_collision_lengthens_placeholder():
+    vault = Vault(hash_length=1)
+    placeholders = {vault.add_secret_and_get_placeholder(f"secret-{i}") for i in range(64)}
+    assert len(placeholders) == 64
+    for placeholder in placeholders:
+        assert vault.decode(placeholder) == vault.secret_mapping[placeholder]
+
+
+def test_decode_ignores_plain_hex_and_unknown_placeholders():
+    vault = Vault()
+    placeholder = vault.add_secret_and_get_placeholder("hunter2")
+    short_hash = Vault._hash_secret("hunter2")
+    text = f"commit {short_hash}, pw {placeholder}, other __SECRET_0badc0de0__"
+    assert vault.decode(text) == f"commit {short_hash}, pw hunter2, other __SECRET_0badc0de0__"
+
+
+def test_custom_delimiters():
+    vault = Vault(prefix="<<", suffix=">>")
+    placeholder = vault.add_secret_and_get_placeholder("hunter2", "password")
+    assert placeholder.startswith("<<PASSWORD_")
+    assert vault.decode(f"[{placeholder}]") == "[hunter2]"
+
+
+def test_placeholder_lookup_survives_external_mapping_changes():
+    vault = Vault()
+    placeholder = vault.add_secret_and_get_placeholder("hunter2", "password")
+    vault.get_secret_mapping().clear()
+    assert vault.add_secret_and_get_placeholder("hunter2", "password") == placeholder
+    assert vault.secret_mapping == {placeholder: "hunter2"}
+
+
+def test_mask_placeholders_keeps_offsets():
+    vault = Vault()
+    placeholder = vault.add_secret_and_get_placeholder("hunter2", "password")
+    foreign = Vault().add_secret_and_get_placeholder("elsewhere")
+    text = f"a {placeholder} b {foreign} c __SECRET_0badc0de0__"
+    masked, ranges, known = vault.mask_placeholders(text)
+    assert len(masked) == len(text)
+    assert [text[start:end] for start, end in ranges] == [placeholder, foreign]
+    assert known == {placeholder}
+    assert masked.split() == ["a", "b", "c", "__SECRET_0badc0de0__"]  # invalid checksum: not masked
+    assert vault.mask_placeholders("plain") == ("plain", [], set())
+
+
+def test_secrets_are_listed_once_with_their_type():
+    vault = Vault()
+    vault.add_secret_and_get_placeholder("hunter2", "password")
+    vault.merge({"__SECRET_0badc0de0__": "swordfish", "__SECRET_1badc0de0__": "hunter2"})
+    assert list(vault.secrets()) == [("hunter2", "password"), ("swordfish", None)]
+
+
+def test_random_placeholder_shaped_tokens_rarely_pass_the_checksum():
+    vault = Vault()
+    tokens = [f"__SECRET_{i:011x}__" for i in range(0, 40000000, 9973)]
+    assert sum(map(vault.is_placeholder, tokens)) < len(tokens) / 1000
@@ -0,0 +1,83 @@
+import gc
+import weakref
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from cryptography.fernet import Fernet  # noqa: E402
+
+from sentinel.vault import Vault  # noqa: E402
+from sentinel.vault_snapshot import MappedVault, VaultCheckpointer, write_snapshot  # noqa: E402
+
+
+def test_restarted_workers_decode_from_the_snapshot(tmp_path):
+    path, key = str(tmp_path / "vault.snap"), Fernet.generate_key()
+    vault = Vault()
+    placeholders = {vault.add_secret_and_get_placeholder(f"secret-{i}", "key"): f"secret-{i}" for i in range(500)}
+    write_snapshot(path, vault.secret_mapping, key)
+    assert b"secret-1" not in (tmp_path / "vault.snap").read_bytes()
+
+    worker = MappedVault(path, key)
+    assert all(worker.decode(p) == s for p, s in placeholders.items())
+    assert worker.add_secret_and_get_placeholder("secret-7", "key") in placeholders  # Same placeholder
+    assert worker.secret_mapping.overlay == {}
+    fresh = worker.add_secret_and_get_placeholder("fresh")
+    other = MappedVault(path, key)
+    other_fresh = other.add_secret_and_get_placeholder("other")
+
+    assert worker.checkpoint() == 1 and other.checkpoint() == 1  # Merged with the worker's entries
+    assert worker.secret_mapping.overlay == {} and worker.refresh()
+    restarted = MappedVault(path, key)
+    assert restarted.decode(f"{fresh} {other_fresh}") == "fresh other" and len(restarted.secret_mapping) == 502
+    assert dict(restarted.secret_mapping) == dict(placeholders, **{fresh: "fresh", other_fresh: "other"})
+
+    with pytest.raises(ValueError):
+        MappedVault(path, Fernet.generate_key())
+
+
+def test_checkpointer_and_clear(tmp_path):
+    path, key = str(tmp_path / "vault.snap"), Fernet.generate_key()
+    vault = MappedVault(path, key)  # No snapshot yet
+    checkpointer = VaultCheckpointer(vault, interval=60)
+    placeholder = vault.add_secret_and_get_placeholder("hunter2")
+    checkpointer.stop()
+    assert MappedVault(path, key).decode(placeholder) == "hunter2"
+
+    vault.clear_secrets()
+    assert vault.decode(placeholder) == placeholder
+    vault.checkpoint()
+    assert len(MappedVault(path, key).secret_mapping) == 0
+
+
+def test_replaced_snapshots_are_freed_at_once(tmp_path):
+    path, key = str(tmp_path / "vault.snap"), Fernet.generate_key()
+    vault = MappedVault(path, key)
+    placeholder = vault.add_secret_and_get_placeholder("hunter2")
+    vault.checkpoint()
+    assert vault.decode(placeholder) == "hunter2"  # Cached in the first snapshot
+    first = weakref.ref(vault.secret_mapping.snapshot)
+    vault.add_secret_and_get_placeholder("swordfish")
+    gc.disable()
+    try:
+        vault.checkpoint()
+        assert first() is None  # Freed by reference counting, not left to the garbage collector
+    finally:
+        gc.enable()
+    assert vault.decode(placeholder) == "hunter2"
+
+
+def test_known_secrets_index_follows_the_snapshot(tmp_path):
+    path, key = str(tmp_path / "vault.snap"), Fernet.generate_key()
+    vault = MappedVault(path, key)
+    vault.add_secret_and_get_placeholder("hunter2-hunter2")
+    vault.checkpoint()
+
+    restarted = MappedVault(path, key)
+    index = restarted.known_secrets()
+    assert [span.secret for span in index.find("pw hunter2-hunter2")] == ["hunter2-hunter2"]
+    other = MappedVault(path, key)
+    other.add_secret_and_get_placeholder("swordfish-42")
+    other.checkpoint()
+    assert restarted.refresh()
+    assert [span.secret for span in index.find("pw swordfish-42")] == ["swordfish-42"] and len(index) == 2
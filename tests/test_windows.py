@@ -0,0 +1,38 @@
+from sentinel.sentinel_detectors import FallbackResult, LLMSecretDetector, SecretDetector, find_secret_positions
+from sentinel.windows import CandidateSelector, WindowedDetector
+
+from synthetic import StubTrustableLLM, make_prompt, make_prompt_with_secrets
+
+
+def test_only_windows_are_sent_and_mapped_back():
+    llm = StubTrustableLLM()
+    detector = WindowedDetector(LLMSecretDetector(llm))
+    text, secrets = make_prompt_with_secrets(5_000, 10)
+    text = text + " " + secrets[0]  # Found again outside its window
+
+    spans = detector.detect(text)
+    assert sorted({span.secret for span in spans}) == sorted(secrets)
+    assert all(text[span.start:span.end] == span.secret for span in spans)
+    assert len(spans) == 11
+    assert llm.chars < len(text) / 4
+
+    assert detector.detect(make_prompt(5_000)) == []  # No candidates: not sent
+    assert llm.calls == 1
+
+    sent = detector.sent_chars
+    short = "nothing suspicious here"
+    assert detector.detect_batch([short]) == [[]]
+    assert detector.sent_chars == sent + len(short) and llm.calls == 2  # Short texts are sent whole
+
+
+def test_keywords_and_fallback_results():
+    class Fallback(SecretDetector):
+        def detect(self, text):
+            return FallbackResult(find_secret_positions(text, ["hunter2"]))
+
+    selector = CandidateSelector(detector=False, context=10)
+    detector = WindowedDetector(Fallback(), selector, min_length=100)
+    text = "filler words " * 50 + "then my PASSWORD: hunter2 and " + "more filler " * 50
+    assert detector.compact(text) == "words then my PASSWORD: hunter2 and"
+    result = detector.detect(text)
+    assert isinstance(result, FallbackResult) and [span.secret for span in result] == ["hunter2"]